@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+
+'''callbackgoaway()のdriverのbenchmark
+
+同期的に完了するEventをyieldし続けた時の
+- generator内から見たstackの深さ
+- 一秒あたりのresume回数
+を、以前の再帰的なdriverと比較する。
+'''
+
+import sys
+from functools import wraps
+from time import perf_counter
+
+import common_setup
+from callbackgoaway import callbackgoaway, CallbackParameter, Immediate
+
+
+def legacy_callbackgoaway(create_gen):
+    '''比較用。resume_genの中から再帰的にgeneratorを進めていた頃の実装'''
+
+    @wraps(create_gen)
+    def wrapper(*args, **kwargs):
+        gen = create_gen(*args, **kwargs)
+
+        def resume_gen(*args, **kwargs):
+            try:
+                gen.send(CallbackParameter(args, kwargs, ))(resume_gen)
+            except StopIteration:
+                pass
+
+        try:
+            next(gen)(resume_gen)
+        except StopIteration:
+            pass
+
+        return gen
+    return wrapper
+
+
+def stack_depth():
+    frame = sys._getframe(1)
+    depth = 0
+    while frame is not None:
+        depth += 1
+        frame = frame.f_back
+    return depth
+
+
+def measure_stack_depth(decorator, times):
+    '''times回yieldした後のstackの深さと最初のyield前の深さの差を返す'''
+
+    depths = []
+
+    @decorator
+    def func():
+        depths.append(stack_depth())
+        for __ in range(times):
+            yield Immediate()
+        depths.append(stack_depth())
+
+    func()
+    return depths[1] - depths[0]
+
+
+def measure_resumes_per_sec(decorator, times, repeat):
+    @decorator
+    def func():
+        for __ in range(times):
+            yield Immediate()
+
+    start = perf_counter()
+    for __ in range(repeat):
+        func()
+    elapsed = perf_counter() - start
+    return times * repeat / elapsed
+
+
+def run():
+    # 再帰的なdriverはrecursion limitを超えられないので、その範囲で比較する
+    times = 100
+    results = {
+        'stack_growth_after_100_yields': {
+            'legacy': measure_stack_depth(legacy_callbackgoaway, times),
+            'current': measure_stack_depth(callbackgoaway, times),
+        },
+        'stack_growth_after_100000_yields': {
+            'current': measure_stack_depth(callbackgoaway, 100000),
+        },
+        'resumes_per_sec': {
+            'legacy': measure_resumes_per_sec(legacy_callbackgoaway, times, 2000),
+            'current': measure_resumes_per_sec(callbackgoaway, times, 2000),
+        },
+    }
+    return results
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(), indent=2))
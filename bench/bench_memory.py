@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+'''中断中のgenerator一つあたりのmemory使用量のbenchmark
+
+toolkitのclockの代わりにlistを用いたSleepでN個のgeneratorを中断させ、
+tracemallocで測った増加量をNで割る。
+'''
+
+import gc
+import tracemalloc
+
+import common_setup
+from callbackgoaway import callbackgoaway, EventBase, Generator
+
+N = 10000
+
+# toolkitのclockの代わり。resume_genを保持し続ける
+scheduled = []
+
+
+class FakeSleep(EventBase):
+    __slots__ = ('seconds', )
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, resume_gen):
+        scheduled.append(resume_gen)
+
+
+def sprite():
+    while True:
+        yield FakeSleep(1.)
+
+
+def sprite_or():
+    while True:
+        yield FakeSleep(1.) | FakeSleep(2.)
+
+
+def sprite_nested():
+    while True:
+        yield Generator(sprite())
+
+
+def measure(create_gen, n=N):
+    start_gen = callbackgoaway(create_gen)
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    gens = [start_gen() for __ in range(n)]
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del gens
+    scheduled.clear()
+    return (after - before) / n
+
+
+def run():
+    return {
+        'bytes_per_suspended_sleep': measure(sprite),
+        'bytes_per_suspended_or': measure(sprite_or),
+        'bytes_per_suspended_nested': measure(sprite_nested),
+    }
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(), indent=2))
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+'''Generator/GeneratorFunctionの入れ子のbenchmark
+
+一番内側のgeneratorがEventをyieldし続ける時の一秒あたりのresume回数を、入れ
+子の深さを変えて測る。Eventはtoolkitのcallbackと同じく、Eventの外から
+(ここではreadyに溜まったresume_genを順に呼ぶloopから)resume_genを呼ぶ。
+'''
+
+from time import perf_counter
+
+import common_setup
+from callbackgoaway import (
+    callbackgoaway, EventBase, Generator, GeneratorFunction,
+)
+
+DEPTHS = (0, 1, 4, 16, 64, )
+
+ready = []
+
+
+class Deferred(EventBase):
+    '''次にready内のresume_genがまとめて呼ばれる時に起きるEvent'''
+
+    __slots__ = ()
+
+    def __call__(self, resume_gen):
+        ready.append(resume_gen)
+
+
+def drain():
+    while ready:
+        ready.pop()()
+
+
+def innermost(times):
+    for __ in range(times):
+        yield Deferred()
+
+
+def nest_with_Generator(depth, times):
+    if depth == 0:
+        yield from innermost(times)
+    else:
+        yield Generator(nest_with_Generator(depth - 1, times))
+
+
+def nest_with_GeneratorFunction(depth, times):
+    if depth == 0:
+        yield from innermost(times)
+    else:
+        yield GeneratorFunction(nest_with_GeneratorFunction, depth - 1, times)
+
+
+def measure(create_gen, depth, times=1000, repeat=10, rounds=5):
+    '''rounds回測って最も速かった回の値を返す'''
+    start_gen = callbackgoaway(create_gen)
+    elapsed = float('inf')
+    for __ in range(rounds):
+        start = perf_counter()
+        for __ in range(repeat):
+            start_gen(depth, times)
+            drain()
+        elapsed = min(elapsed, perf_counter() - start)
+    return times * repeat / elapsed
+
+
+def run():
+    return {
+        f'depth_{depth}': {
+            'Generator_resumes_per_sec':
+                measure(nest_with_Generator, depth),
+            'GeneratorFunction_resumes_per_sec':
+                measure(nest_with_GeneratorFunction, depth),
+        }
+        for depth in DEPTHS
+    }
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(), indent=2))
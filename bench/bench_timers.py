@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+
+'''各backendのSleepのtimer throughputのbenchmark
+
+kivy, pyglet, tkinterの本物のclockの代わりにVirtualClockを使った代役を用いる
+ので、GUIライブラリもdisplayも要らない。測っているのはcallbackgoaway側の処理
+と、代役であるVirtualClockの処理の合計である。
+'''
+
+import sys
+import importlib
+from contextlib import contextmanager
+from time import perf_counter
+from types import ModuleType
+
+import common_setup
+from callbackgoaway import callbackgoaway
+from callbackgoaway.virtualclock import VirtualClock
+
+NUM_GENS = 500
+NUM_SLEEPS = 50
+
+
+class KivyClockStandIn:
+    '''kivy.clock.Clockの代役'''
+
+    class ClockEvent:
+        __slots__ = ('clock', 'timer', )
+
+        def __init__(self, clock, timer):
+            self.clock = clock
+            self.timer = timer
+
+        def cancel(self):
+            self.clock.cancel(self.timer)
+
+    def __init__(self, clock):
+        self.clock = clock
+
+    def schedule_once(self, callback, timeout=0):
+        clock = self.clock
+        return self.ClockEvent(clock, clock.schedule_once(callback, timeout))
+
+
+class PygletClockStandIn(ModuleType):
+    '''pyglet.clock moduleの代役'''
+
+    def __init__(self, clock):
+        super().__init__('pyglet.clock')
+        self.clock = clock
+        self.timers = {}
+
+    def schedule_once(self, func, delay):
+        timers = self.timers
+
+        def callback(dt):
+            del timers[func]
+            func(dt)
+        timers[func] = self.clock.schedule_once(callback, delay)
+
+    def unschedule(self, func):
+        timer = self.timers.pop(func, None)
+        if timer is not None:
+            self.clock.cancel(timer)
+
+
+class TkWidgetStandIn:
+    '''tkinterのwidgetのafter()とafter_cancel()の代役'''
+
+    def __init__(self, clock):
+        self.clock = clock
+
+    def after(self, ms, func):
+        return self.clock.schedule_once(lambda dt: func(), ms / 1000)
+
+    def after_cancel(self, id):
+        self.clock.cancel(id)
+
+
+@contextmanager
+def stand_in_modules(**modules):
+    '''sys.modulesに代役を入れた状態で、callbackgoawayのbackendを読み込む'''
+    names = tuple(modules) + ('callbackgoaway.kivy', 'callbackgoaway.pyglet', )
+    saved = {name: sys.modules.pop(name, None) for name in names}
+    sys.modules.update(modules)
+    try:
+        yield
+    finally:
+        for name in names:
+            sys.modules.pop(name, None)
+            if saved[name] is not None:
+                sys.modules[name] = saved[name]
+
+
+def load_kivy_backend(clock):
+    kivy = ModuleType('kivy')
+    kivy_clock = ModuleType('kivy.clock')
+    kivy_clock.Clock = KivyClockStandIn(clock)
+    kivy.clock = kivy_clock
+    with stand_in_modules(**{'kivy': kivy, 'kivy.clock': kivy_clock}):
+        return importlib.import_module('callbackgoaway.kivy')
+
+
+def load_pyglet_backend(clock):
+    pyglet = ModuleType('pyglet')
+    pyglet.clock = pyglet_clock = PygletClockStandIn(clock)
+    # Eventは使わないので、読み込むのに要る物だけを用意する
+    pyglet.event = pyglet_event = ModuleType('pyglet.event')
+    pyglet_event.EVENT_UNHANDLED = None
+
+    class EventDispatcher:
+        @classmethod
+        def register_event_type(cls, name):
+            pass
+    pyglet_event.EventDispatcher = EventDispatcher
+    with stand_in_modules(**{
+        'pyglet': pyglet, 'pyglet.clock': pyglet_clock,
+        'pyglet.event': pyglet_event,
+    }):
+        return importlib.import_module('callbackgoaway.pyglet')
+
+
+def measure(clock, create_sleep):
+    '''NUM_GENS個のgeneratorがそれぞれNUM_SLEEPS回Sleepする時の一秒あたりの
+    Sleep回数'''
+
+    @callbackgoaway
+    def sleep(i):
+        for j in range(NUM_SLEEPS):
+            yield create_sleep((i + j) % 10 + 1)
+
+    @callbackgoaway
+    def sleep_or(i):
+        for j in range(NUM_SLEEPS):
+            yield create_sleep((i + j) % 10 + 1) | create_sleep(11)
+
+    results = {}
+    for key, func in (('sleeps_per_sec', sleep),
+                      ('or_sleeps_per_sec', sleep_or), ):
+        start = perf_counter()
+        for i in range(NUM_GENS):
+            func(i)
+        clock.run_until_idle()
+        results[key] = NUM_GENS * NUM_SLEEPS / (perf_counter() - start)
+    return results
+
+
+def run():
+    from callbackgoaway import virtualclock, tkinter
+
+    results = {}
+
+    clock = VirtualClock()
+    results['virtualclock'] = measure(
+        clock, lambda s: virtualclock.Sleep(s, clock=clock))
+
+    clock = VirtualClock()
+    kivy = load_kivy_backend(clock)
+    results['kivy'] = measure(clock, kivy.Sleep)
+
+    clock = VirtualClock()
+    pyglet = load_pyglet_backend(clock)
+    results['pyglet'] = measure(clock, pyglet.Sleep)
+
+    clock = VirtualClock()
+    widget = TkWidgetStandIn(clock)
+    results['tkinter'] = measure(
+        clock, lambda s: tkinter.Sleep(widget, s * 1000))
+
+    return results
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(), indent=2))
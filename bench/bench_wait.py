@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+
+'''And/Or/Waitのfan-inとfan-outのbenchmark
+
+fan-in : 子Eventの数を2から100000まで変えて、子Event一つあたりにかかる時間を
+         測る。
+fan-out: 一つのEventを待っている多数のgeneratorが、そのEventが起きた時に再開
+         するまでのgenerator一つあたりの時間を測る。
+'''
+
+from functools import reduce
+from operator import and_, or_
+from time import perf_counter
+
+import common_setup
+from callbackgoaway import callbackgoaway, EventBase, And, Or
+from callbackgoaway.virtualclock import Event, EventEmitter
+
+SIZES = (2, 10, 100, 1000, 10000, 100000, )
+
+
+class Manual(EventBase):
+    '''外部から起こすまで起きないEvent'''
+
+    def __init__(self):
+        self.resume_gen = None
+
+    def __call__(self, resume_gen):
+        self.resume_gen = resume_gen
+
+    def cancel(self, resume_gen):
+        self.resume_gen = None
+
+
+def measure_and(size, repeat):
+    '''全ての子Eventを一つずつ起こした時の子Event一つあたりの時間(ns)'''
+    elapsed = 0.
+    for __ in range(repeat):
+        events = [Manual() for __ in range(size)]
+
+        @callbackgoaway
+        def func():
+            yield And(*events)
+
+        start = perf_counter()
+        func()
+        for event in events:
+            event.resume_gen()
+        elapsed += perf_counter() - start
+    return elapsed / (size * repeat) * 1e9
+
+
+def measure_or(size, repeat):
+    '''最初の子Eventが起きて残りが取り消されるまでの子Event一つあたりの時間(ns)'''
+    elapsed = 0.
+    for __ in range(repeat):
+        events = [Manual() for __ in range(size)]
+
+        @callbackgoaway
+        def func():
+            yield Or(*events)
+
+        start = perf_counter()
+        func()
+        events[-1].resume_gen()
+        elapsed += perf_counter() - start
+    return elapsed / (size * repeat) * 1e9
+
+
+def measure_operator_chain(size, repeat, op):
+    '''a | b | c ... のように演算子で繋いだ時の子Event一つあたりの時間(ns)'''
+    elapsed = 0.
+    for __ in range(repeat):
+        events = [Manual() for __ in range(size)]
+
+        @callbackgoaway
+        def func():
+            yield reduce(op, events)
+
+        start = perf_counter()
+        func()
+        for event in events:
+            if event.resume_gen is not None:
+                event.resume_gen()
+        elapsed += perf_counter() - start
+    return elapsed / (size * repeat) * 1e9
+
+
+def measure_fan_out(size, repeat):
+    '''size個のgeneratorが同じEventを待ち、一斉に再開するまでの
+    generator一つあたりの時間(ns)'''
+    elapsed = 0.
+    for __ in range(repeat):
+        emitter = EventEmitter()
+
+        @callbackgoaway
+        def func():
+            yield Event(emitter, 'on_fire') | Event(emitter, 'on_other')
+
+        start = perf_counter()
+        for __ in range(size):
+            func()
+        emitter.emit('on_fire')
+        elapsed += perf_counter() - start
+    return elapsed / (size * repeat) * 1e9
+
+
+def run():
+    results = {}
+    for size in SIZES:
+        repeat = max(1, 20000 // size)
+        results[size] = {
+            'and_ns_per_child': measure_and(size, repeat),
+            'or_ns_per_child': measure_or(size, repeat),
+            'fan_out_ns_per_waiter': measure_fan_out(size, repeat),
+        }
+        # 演算子は呼ぶ度にtupleを作り直すので、多数の時はAnd()/Or()を使う
+        if size <= 100:
+            results[size]['and_operator_ns_per_child'] = \
+                measure_operator_chain(size, repeat, and_)
+            results[size]['or_operator_ns_per_child'] = \
+                measure_operator_chain(size, repeat, or_)
+    return results
+
+
+if __name__ == '__main__':
+    import json
+    print(json.dumps(run(), indent=2))
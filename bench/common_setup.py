@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from pathlib import PurePath
+
+sys.path.append(str(PurePath(__file__).parents[1]))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+
+'''全てのbenchmarkを実行し、結果を保存されたbaselineと比較する
+
+使い方:
+    python run.py                   # 実行してbaselineと比較する
+    python run.py --save-baseline   # 実行して結果をbaselineとして保存する
+    python run.py --only driver,wait
+    python run.py --repeat 5        # 各benchmarkを5回実行して最良の値を採る
+
+結果は "<benchmark名>.<key>.<key>..." をkeyとする平坦なJSONで標準出力に出す。
+baselineより tolerance 以上悪化した値があれば終了コードは1になる。
+'''
+
+import gc
+import sys
+import json
+import argparse
+import importlib
+from pathlib import Path
+
+import common_setup
+
+BENCHMARKS = ('driver', 'nesting', 'wait', 'memory', 'timers', )
+BASELINE = Path(__file__).with_name('baseline.json')
+
+# keyの末尾からどちらが良い値なのかを判断する
+HIGHER_IS_BETTER = ('_per_sec', )
+LOWER_IS_BETTER = ('_ns_per_child', '_ns_per_waiter', 'bytes_per_', 'stack_')
+
+
+def flatten(results, prefix):
+    flat = {}
+    for key, value in results.items():
+        key = f'{prefix}.{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, key))
+        else:
+            flat[key] = value
+    return flat
+
+
+def direction(key):
+    '''値が大きい方が良いなら1、小さい方が良いなら-1、どちらでもないなら0'''
+    if any(part in key for part in HIGHER_IS_BETTER):
+        return 1
+    if any(part in key for part in LOWER_IS_BETTER):
+        return -1
+    return 0
+
+
+def run_benchmark(module, name):
+    # timeitと同じく、計測中はGCを止めておく
+    gc.collect()
+    gc.disable()
+    try:
+        return flatten(module.run(), name)
+    finally:
+        gc.enable()
+
+
+def best_of(runs):
+    '''複数回の結果から、keyごとに最も良い値を採る'''
+    best = dict(runs[0])
+    for results in runs[1:]:
+        for key, value in results.items():
+            sign = direction(key)
+            if (sign > 0 and value > best[key]) or \
+                    (sign < 0 and value < best[key]):
+                best[key] = value
+    return best
+
+
+def compare(results, baseline, tolerance):
+    '''悪化した値のlistを返す'''
+    regressions = []
+    for key, value in results.items():
+        old = baseline.get(key)
+        sign = direction(key)
+        if not old or not sign:
+            continue
+        change = (value - old) / old * sign
+        if change < -tolerance:
+            regressions.append((key, old, value, change))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--only', default=','.join(BENCHMARKS),
+                        help='comma separated benchmark names')
+    parser.add_argument('--baseline', type=Path, default=BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=.3,
+                        help='allowed relative regression (default: 0.3)')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='run each benchmark N times and keep the best')
+    args = parser.parse_args(argv)
+
+    results = {}
+    for name in args.only.split(','):
+        module = importlib.import_module(f'bench_{name}')
+        runs = [run_benchmark(module, name) for __ in range(args.repeat)]
+        results.update(best_of(runs))
+    print(json.dumps(results, indent=2, sort_keys=True))
+
+    if args.save_baseline:
+        args.baseline.write_text(
+            json.dumps(results, indent=2, sort_keys=True) + '\n')
+        return 0
+    if not args.baseline.exists():
+        return 0
+    baseline = json.loads(args.baseline.read_text())
+    regressions = compare(results, baseline, args.tolerance)
+    for key, old, new, change in regressions:
+        print(f'REGRESSION {key}: {old:.6g} -> {new:.6g} ({change:+.1%})',
+              file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
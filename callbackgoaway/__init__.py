@@ -1,110 +1,1059 @@
 # -*- coding: utf-8 -*-
 
 __all__ = (
-    'callbackgoaway', 'EventBase', 'Never', 'Immediate', 'Wait', 'And', 'Or',
-    'Generator', 'GeneratorFunction',
+    'callbackgoaway', 'start', 'Task', 'TaskState', 'InvalidStateError',
+    'Nursery', 'Signal', 'Deadline', 'DeadlineExceeded', 'Hooks',
+    'set_hooks', 'add_hooks', 'remove_hooks', 'get_hooks', 'EventBase',
+    'Never', 'Immediate', 'Wait', 'And', 'Or', 'Generator',
+    'GeneratorFunction',
 )
 
-from functools import wraps, partial
-from collections import namedtuple
+from enum import Enum
+from functools import wraps
+from collections import namedtuple, deque
+from types import MappingProxyType
+from weakref import WeakKeyDictionary
 
 CallbackParameter = namedtuple('CallbackParameter', ('args', 'kwargs', ))
 
+# 引数無しでresume_genが呼ばれた時に送る値。毎回作らずに使い回す
+# Sent when resume_gen is called without arguments, instead of allocating a
+# new one every time. (kwargs is read-only because it is shared.)
+EMPTY_PARAMETER = CallbackParameter((), MappingProxyType({}))
+
 
 def callbackgoaway(create_gen):
     @wraps(create_gen)
     def wrapper(*args, **kwargs):
         gen = create_gen(*args, **kwargs)
+        _Driver(gen).run(None)
+        return gen
+    return wrapper
+
+
+class Hooks:
+    '''generatorの進み具合を観察する為のhook。必要なmethodだけを上書きする
+
+    set_hooks()やadd_hooks()で設定した物は、それ以降に開始されたgeneratorに加
+    え、それ以降に再開された全てのgeneratorについて呼ばれる。enable()と
+    disable()、又はwith文で他のHooksを外さずに付け外しできる。
+    '''
+
+    __slots__ = ()
+
+    def on_spawn(self, gen):
+        '''genが開始される直前(Driverに委譲された時も含む)'''
+
+    def on_resume(self, gen):
+        '''genに値(又は例外)が送られる直前'''
+
+    def on_suspend(self, gen, event):
+        '''genがeventをyieldして停まった直後'''
+
+    def on_finish(self, gen):
+        '''genが終わった(戻った, 例外を起こした, 閉じられた)直後'''
+
+    def enable(self):
+        add_hooks(self)
+
+    def disable(self):
+        remove_hooks(self)
+
+    def __enter__(self):
+        self.enable()
+        return self
+
+    def __exit__(self, *args):
+        self.disable()
+
+
+class _ChainedHooks(Hooks):
+    '''複数のHooksを順に呼ぶ
+
+    後から加えられたHooksほどgeneratorの近くで呼ばれるよう、on_spawn()と
+    on_resume()は加えられた順に、on_suspend()とon_finish()はその逆順に呼ぶ。
+    なので後から加えたProfilerの測る時間には、先に加えられたHooksの処理は含
+    まれない。
+    '''
+
+    __slots__ = ('hooks', 'reversed_hooks', )
+
+    def __init__(self, hooks):
+        self.hooks = tuple(hooks)
+        self.reversed_hooks = self.hooks[::-1]
+
+    def on_spawn(self, gen):
+        for hooks in self.hooks:
+            hooks.on_spawn(gen)
+
+    def on_resume(self, gen):
+        for hooks in self.hooks:
+            hooks.on_resume(gen)
+
+    def on_suspend(self, gen, event):
+        for hooks in self.reversed_hooks:
+            hooks.on_suspend(gen, event)
+
+    def on_finish(self, gen):
+        for hooks in self.reversed_hooks:
+            hooks.on_finish(gen)
+
+
+class _RecordingHooks(Hooks):
+    '''観察中のgenerator毎の記録を持つHooks。ProfilerとRegistryの共通部分
+
+    終わらないまま捨てられたgeneratorを生かし続けないよう、記録は弱参照で持
+    つ。派生classは_new_record(gen)で新しい記録を作って返す。
+    '''
+
+    __slots__ = ('_live', )
+
+    def __init__(self):
+        # {generator: 記録}
+        self._live = WeakKeyDictionary()
+
+    def _new_record(self, gen):
+        raise NotImplementedError()
+
+    def _record(self, gen):
+        '''genの記録を返す。有効にする前に開始されていたgeneratorの記録はこ
+        こで作られる'''
+        record = self._live.get(gen)
+        if record is None:
+            record = self._live[gen] = self._new_record(gen)
+        return record
+
+
+# Driverが呼ぶHooks。設定されているHooksが一つならそれ自身、複数なら
+# _ChainedHooks
+_hooks = None
+# 設定されているHooks。加えられた順
+_hooks_list = []
+
+
+def _update_hooks():
+    global _hooks
+    if not _hooks_list:
+        _hooks = None
+    elif len(_hooks_list) == 1:
+        _hooks = _hooks_list[0]
+    else:
+        _hooks = _ChainedHooks(_hooks_list)
+
+
+def set_hooks(hooks):
+    '''Hooksを設定する。既に設定されているHooksは全て外れる。Noneを渡すと外
+    すだけ
+
+    設定されていない間は、Driverの再開一回毎に一度Noneか否かを調べるだけで済
+    む。
+    '''
+    _hooks_list.clear()
+    if hooks is not None:
+        _hooks_list.append(hooks)
+    _update_hooks()
+
+
+def add_hooks(hooks):
+    '''既に設定されているHooksを外さずにhooksを加える'''
+    if hooks not in _hooks_list:
+        _hooks_list.append(hooks)
+        _update_hooks()
+
+
+def remove_hooks(hooks):
+    '''add_hooks()やset_hooks()で設定したhooksだけを外す'''
+    if hooks in _hooks_list:
+        _hooks_list.remove(hooks)
+        _update_hooks()
+
+
+def get_hooks():
+    '''Driverが呼ぶHooksを返す。複数設定されている時はそれらを順に呼ぶ
+    Hooks'''
+    return _hooks
+
+
+_run_queue = None
+
+
+def _set_run_queue(run_queue):
+    '''外部からの再開をすぐに行わずにrun_queue.push(driver, value)に渡すよう
+    にする。Noneを渡すと元に戻す
+
+    run_queueは、push()された時に待っていたEventをdriverがまだ待っていれば
+    driver.run(value) を呼ぶ事で再開させる。FrameBudgetが使う。
+    '''
+    global _run_queue
+    _run_queue = run_queue
+
+
+class _Driver:
+    '''generatorを進める役
+
+    Eventが同期的にresume_genを呼んだ(Immediateなど)としても再帰はせず、その再
+    入を検出してloopで処理する。なので同期的に完了するEventが何千回続いても
+    stackは伸びない。
+    If an event calls resume_gen synchronously, the resume is not performed
+    recursively but is handed back to the loop in run().
 
-        def resume_gen(*args, **kwargs):
-            try:
-                gen.send(CallbackParameter(args, kwargs, ))(resume_gen)
-            except StopIteration:
-                pass
+    Generatorを直接yieldされた時は子generatorの為に別のDriverを作らず、親を
+    _stackに積んで子を直接進める(委譲)。Eventからの再開は常に一番内側の
+    generatorへ直接届くので、入れ子の深さは再開の手間に影響しない。
+    '''
 
+    __slots__ = (
+        'gen', 'on_finish', 'event', '_running', '_pending', '_stack',
+    )
+
+    def __init__(self, gen, on_finish=None):
+        self.gen = gen
+        self.on_finish = on_finish
+        self.event = None
+        self._running = False
+        self._pending = None
+        # 委譲中の親generatorたち。必要になるまで作らない
+        self._stack = None
+        if _hooks is not None:
+            _hooks.on_spawn(gen)
+
+    @property
+    def root_gen(self):
+        '''委譲中であっても一番外側のgenerator'''
+        stack = self._stack
+        return stack[0] if stack else self.gen
+
+    # Eventにはbound methodではなくこのobject自体をresume_genとして渡す。
+    # そうすればEventを待つ度にbound methodを作らずに済む。
+    def __call__(self, *args, **kwargs):
+        value = CallbackParameter(args, kwargs, ) if args or kwargs \
+            else EMPTY_PARAMETER
+        if self._running:
+            # 再入。loopに任せる
+            if self._pending is not _CANCEL:
+                self._pending = value
+            return
+        if _run_queue is not None:
+            # 後でまとめて再開する
+            _run_queue.push(self, value)
+            return
+        self.run(value)
+
+    def run(self, value, exception=None):
+        '''generatorにvalueを送って(exceptionがあればそれを投げ込んで)進める'''
+        if _hooks is not None:
+            return self._run_with_hooks(value, _hooks, exception)
+        gen = self.gen
+        self._running = True
         try:
-            next(gen)(resume_gen)
-        except StopIteration:
-            pass
+            while True:
+                try:
+                    if exception is None:
+                        self.event = event = gen.send(value)
+                    else:
+                        self.event = event = gen.throw(exception)
+                        exception = None
+                except StopIteration as e:
+                    # 待っていたEventは既にgeneratorへ届いているので、この後
+                    # _close()されても取り消さない
+                    self.event = None
+                    stack = self._stack
+                    if not stack:
+                        result = e.value
+                        break
+                    if self._pending is _CANCEL:
+                        # 子generatorの中で取り消された
+                        self._close()
+                        return
+                    # 子generatorが終わったので、戻り値を親に送る
+                    self.gen = gen = stack.pop()
+                    value = _return_value(e.value)
+                    continue
+                except BaseException as e:
+                    stack = self._stack
+                    if not stack:
+                        raise
+                    # yield fromと同じく子の例外は親へ伝える
+                    self.gen = gen = stack.pop()
+                    exception = e
+                    continue
+                event(self)
+                value = self._pending
+                if value is None:
+                    return
+                self._pending = None
+                if value is _START:
+                    # eventがdelegate()した
+                    value = None
+                    gen = self.gen
+                elif value is _CANCEL:
+                    # generatorを進めている最中にcancel()された
+                    self._close()
+                    return
+                elif value.__class__ is _Throw:
+                    # eventがthrow()した
+                    exception = value.exception
+                    value = None
+        except BaseException as e:
+            self.event = None
+            if not self._fail(e):
+                raise
+            return
+        finally:
+            self._running = False
+        self._finish(result)
 
-        return gen
-    return wrapper
+    def _run_with_hooks(self, value, hooks, exception=None):
+        '''run()にhookの呼び出しを加えた物'''
+        gen = self.gen
+        self._running = True
+        try:
+            while True:
+                hooks.on_resume(gen)
+                try:
+                    if exception is None:
+                        self.event = event = gen.send(value)
+                    else:
+                        self.event = event = gen.throw(exception)
+                        exception = None
+                except StopIteration as e:
+                    hooks.on_finish(gen)
+                    self.event = None
+                    stack = self._stack
+                    if not stack:
+                        result = e.value
+                        break
+                    if self._pending is _CANCEL:
+                        self._close()
+                        return
+                    self.gen = gen = stack.pop()
+                    value = _return_value(e.value)
+                    continue
+                except BaseException as e:
+                    hooks.on_finish(gen)
+                    stack = self._stack
+                    if not stack:
+                        raise
+                    self.gen = gen = stack.pop()
+                    exception = e
+                    continue
+                hooks.on_suspend(gen, event)
+                event(self)
+                value = self._pending
+                if value is None:
+                    return
+                self._pending = None
+                if value is _START:
+                    value = None
+                    gen = self.gen
+                elif value is _CANCEL:
+                    self._close()
+                    return
+                elif value.__class__ is _Throw:
+                    exception = value.exception
+                    value = None
+        except BaseException as e:
+            self.event = None
+            if not self._fail(e):
+                raise
+            return
+        finally:
+            self._running = False
+        self._finish(result)
+
+    def delegate(self, gen):
+        '''現在のgeneratorの代わりにgenを進め、終わったらその戻り値で現在の
+        generatorを再開する。Eventの__call__()の中からのみ呼べる'''
+        stack = self._stack
+        if stack is None:
+            stack = self._stack = []
+        stack.append(self.gen)
+        self.gen = gen
+        if self._pending is not _CANCEL:
+            self._pending = _START
+        if _hooks is not None:
+            _hooks.on_spawn(gen)
+
+    def throw(self, exception):
+        '''待機中のEventを取り消し、一番内側のgeneratorにexceptionを投げ込んで
+        進める'''
+        event = self.event
+        self.event = None
+        if event is not None:
+            cancel_event(event, self)
+        if self._running:
+            # 再入。loopに任せる
+            if self._pending is not _CANCEL:
+                self._pending = _Throw(exception)
+            return
+        self.run(None, exception)
+
+    def _finish(self, result):
+        on_finish = self.on_finish
+        if on_finish is not None:
+            self.on_finish = None
+            if result is None:
+                on_finish()
+            else:
+                on_finish(result)
+
+    def _fail(self, exception):
+        '''generatorから例外が漏れた時に呼ばれる。真を返せば例外はそこで処理
+        された物とし、再開させた側へは送出しない'''
+        return False
+
+    def cancel(self):
+        '''待機中のEventを取り消してから、内側から順にgeneratorを閉じる
+
+        generatorを進めている最中(generatorやそれが起こしたEventの中から呼ば
+        れた時)は、その一歩が終わってから行う。
+        '''
+        self.on_finish = None
+        if self._running:
+            self._pending = _CANCEL
+            return
+        self._close()
+
+    def _close(self):
+        event = self.event
+        self.event = None
+        if event is not None:
+            cancel_event(event, self)
+        hooks = _hooks
+        self.gen.close()
+        if hooks is not None:
+            hooks.on_finish(self.gen)
+        stack = self._stack
+        while stack:
+            self.gen = gen = stack.pop()
+            gen.close()
+            if hooks is not None:
+                hooks.on_finish(gen)
+        # 閉じている間に起きた再開は捨てる
+        self._pending = None
+
+
+# 委譲先のgeneratorを開始する時に_pendingに入れる印。generatorにはNoneを送る
+_START = object()
+# 進めている最中にcancel()された時に_pendingに入れる印
+_CANCEL = object()
+
+
+class _Throw:
+    '''throw()が再入した時に_pendingに入れる物'''
+
+    __slots__ = ('exception', )
+
+    def __init__(self, exception):
+        self.exception = exception
+
+
+def _return_value(value):
+    '''子generatorの戻り値を親に送る形にする。Noneなら今まで通り引数無し'''
+    return EMPTY_PARAMETER if value is None \
+        else CallbackParameter((value, ), {})
+
+
+def cancel_event(event, resume_gen):
+    '''eventに渡したresume_genを取り消す。cancel()を持たないcallableは何もしない'''
+    cancel = getattr(event, 'cancel', None)
+    if cancel is not None:
+        cancel(resume_gen)
 
 
 class EventBase:
 
+    __slots__ = ()
+
+    # a & b & c が And(And(a, b), c) ではなく And(a, b, c) になるよう平坦化する
     def __and__(self, event):
-        return And(self, event)
+        return And(*_operands(And, self), *_operands(And, event))
 
     def __or__(self, event):
-        return Or(self, event)
+        return Or(*_operands(Or, self), *_operands(Or, event))
 
     def __call__(self, resume_gen):
         raise NotImplementedError()
 
+    def cancel(self, resume_gen):
+        '''__call__()に渡されたresume_genがもう呼ばれないようにする
+
+        Or等で他のEventが先に起きた時に呼ばれる。bindしたcallbackやscheduleし
+        たtimerを外すのはここで行う。既に起きた後のEventに対して呼ばれても良い
+        ように実装すること。
+        Called when the event is no longer waited for. Detach whatever
+        __call__() registered. Must be safe to call after the event fired.
+        '''
+        pass
+
 
 class Never(EventBase):
+    __slots__ = ()
+
     def __call__(self, resume_gen):
         pass
 
 
 class Immediate(EventBase):
+    __slots__ = ()
+
     def __call__(self, resume_gen):
         resume_gen()
 
 
+def _operands(cls, event):
+    return event.events if type(event) is cls else (event, )
+
+
+class _WaitChild:
+    '''Waitの子Event一つ分の記録。その子Eventに渡すresume_genも兼ねる
+
+    子Event毎にpartialとCallbackParameterのlistの要素を持つ代わりにこれ一つで
+    済ませる。
+    '''
+
+    __slots__ = ('wait', 'event', 'param', )
+
+    def __init__(self, wait, event):
+        self.wait = wait
+        self.event = event
+        self.param = None
+
+    def __call__(self, *args, **kwargs):
+        wait = self.wait
+        if wait.done or self.param is not None:
+            return
+        self.param = CallbackParameter(args, kwargs) if args or kwargs \
+            else EMPTY_PARAMETER
+        wait.num_left -= 1
+        if wait.num_left == 0:
+            wait.on_satisfied()
+
+
 class Wait(EventBase):
 
+    __slots__ = ('events', 'num_left', 'children', 'done', 'resume_gen', )
+
     def __init__(self, *, events, n=None):
         super().__init__()
-        self.events = tuple(events)
-        num_events = len(self.events)
-        self.num_left = n if n is not None else num_events
-        self.callbackparameter_list = [None, ] * num_events
+        self.events = events = tuple(events)
+        self.num_left = n if n is not None else len(events)
+        self.children = []
+        self.done = False
 
     def __call__(self, resume_gen):
         self.resume_gen = resume_gen
-        for event_id, event in enumerate(self.events):
-            event(partial(self.on_child_event, event_id))
+        children = self.children
+        append = children.append
+        for event in self.events:
+            if self.done:
+                # 条件は既に満たされているので残りのEventは開始しない
+                break
+            child = _WaitChild(self, event)
+            append(child)
+            event(child)
 
-    def on_child_event(self, event_id, *args, **kwargs):
-        cp_list = self.callbackparameter_list
-        if cp_list[event_id] is None:
-            cp_list[event_id] = CallbackParameter(args, kwargs)
-            self.num_left -= 1
-            if self.num_left == 0:
-                self.resume_gen(*cp_list)
+    def on_satisfied(self):
+        self.cancel_children()
+        params = [child.param for child in self.children]
+        params.extend((None, ) * (len(self.events) - len(params)))
+        self.resume_gen(*params)
+
+    def cancel_children(self):
+        '''まだ起きていない子Eventを全て取り消す'''
+        self.done = True
+        for child in self.children:
+            if child.param is None:
+                cancel_event(child.event, child)
+
+    def cancel(self, resume_gen):
+        if not self.done:
+            self.cancel_children()
 
 
 class And(Wait):
 
+    __slots__ = ()
+
     def __init__(self, *events):
         super().__init__(events=events)
 
 
 class Or(Wait):
+    __slots__ = ()
+
     def __init__(self, *events):
         super().__init__(events=events, n=1)
 
 
 class Generator(EventBase):
+    '''generatorが終わるまで待つEvent
+
+    generatorの戻り値があれば、それを引数にして再開する。直接yieldされた時は
+    待っている側のDriverに委譲するので、入れ子にしても再開の手間は増えない。
+    Or等の子として使われた時は専用のDriverで進める。
+    '''
+
+    __slots__ = ('gen', 'driver', )
 
     def __init__(self, gen):
         super().__init__()
         self.gen = gen
+        self.driver = None
 
     def __call__(self, resume_gen):
-        gen = self.gen
+        if isinstance(resume_gen, _Driver):
+            resume_gen.delegate(self.gen)
+            return
+        self.driver = driver = _Driver(self.gen, resume_gen)
+        driver.run(None)
 
-        def internal_resume_gen(*args, **kwargs):
-            try:
-                next(gen)(internal_resume_gen)
-            except StopIteration:
-                resume_gen()
-        internal_resume_gen()
+    def cancel(self, resume_gen):
+        driver = self.driver
+        if driver is not None:
+            driver.cancel()
 
 
 class GeneratorFunction(Generator):
 
+    __slots__ = ()
+
     def __init__(self, create_gen, *args, **kwargs):
         super().__init__(create_gen(*args, **kwargs))
+
+
+class DeadlineExceeded(TimeoutError):
+    '''Deadlineのtimerが起きた時にgeneratorへ投げ込まれる例外'''
+
+
+class _DeadlineDriver(_Driver):
+    '''generatorの終わり方をDeadlineに伝えるDriver'''
+
+    __slots__ = ('deadline', )
+
+    def __init__(self, gen, deadline):
+        super().__init__(gen)
+        self.deadline = deadline
+
+    def _finish(self, result):
+        self.deadline._on_done(result, None)
+
+    def _fail(self, exception):
+        return self.deadline._on_done(None, exception)
+
+
+class Deadline(EventBase):
+    '''genが終わるまで待つEvent。但しtimerが先に起きたらgenに
+    DeadlineExceededを投げ込む
+
+    timerには各backendのSleepなど、期限に起きるEventを渡す。genの中で直接
+    yieldされたGeneratorはgenと同じDriverで進むので、入れ子の深さによらず一つ
+    のtimerが中の全ての待機を律する。期限を迎えると一番内側のgeneratorが待って
+    いるEventを取り消し(内側のDeadlineならその中身ごと閉じる)、そこへ例外を投
+    げ込む。genがそれを捕まえて終われば、その戻り値で再開する。
+
+    genから漏れた例外は、待っている側がDriverならそのgeneratorへ伝える。Or等の
+    子として使った場合は再開させた側へ送出する。
+    '''
+
+    __slots__ = ('timer', 'gen', 'driver', 'resume_gen', 'expired',
+                 'timer_callback', )
+
+    def __init__(self, timer, gen):
+        super().__init__()
+        self.timer = timer
+        self.gen = gen
+        self.driver = None
+        self.expired = False
+        self.timer_callback = None
+
+    def __call__(self, resume_gen):
+        assert self.driver is None  # You can't re-use this instance
+        self.resume_gen = resume_gen
+        self.driver = driver = _DeadlineDriver(self.gen, self)
+        driver.run(None)
+        if self.driver is not None:
+            # genが待機に入ったので期限を設ける
+            self.timer_callback = callback = self._expire
+            self.timer(callback)
+
+    def _expire(self, *args):
+        driver = self.driver
+        if driver is None:
+            return
+        self.expired = True
+        self.timer_callback = None
+        driver.throw(DeadlineExceeded())
+
+    def _on_done(self, result, exception):
+        self.driver = None
+        callback = self.timer_callback
+        if callback is not None:
+            self.timer_callback = None
+            cancel_event(self.timer, callback)
+        resume_gen = self.resume_gen
+        if exception is not None:
+            if isinstance(resume_gen, _Driver):
+                resume_gen.throw(exception)
+                return True
+            return False
+        if result is None:
+            resume_gen()
+        else:
+            resume_gen(result)
+
+    def cancel(self, resume_gen):
+        driver = self.driver
+        if driver is None:
+            return
+        self.driver = None
+        callback = self.timer_callback
+        if callback is not None:
+            self.timer_callback = None
+            cancel_event(self.timer, callback)
+        driver.cancel()
+
+
+class _TaskDriver(_Driver):
+    '''generatorの終わり方をTaskに伝えるDriver'''
+
+    __slots__ = ('task', )
+
+    def __init__(self, gen, task):
+        super().__init__(gen)
+        self.task = task
+
+    def _finish(self, result):
+        # generatorが自分のTaskを止めた後に終わった時は、止めた事を優先する
+        if self.task._state is TaskState.STARTED:
+            self.task._set_done(TaskState.FINISHED, result, None)
+
+    def _fail(self, exception):
+        if self.task._state is TaskState.STARTED:
+            self.task._set_done(TaskState.FAILED, None, exception)
+
+
+def start(gen):
+    '''generatorを開始し、それを管理するTaskを返す'''
+    task = Task(gen)
+    task._driver.run(None)
+    return task
+
+
+class TaskState(Enum):
+    STARTED = 'STARTED'  # 開始されていて、まだ終わっていない
+    FINISHED = 'FINISHED'  # generatorが最後まで進んだ
+    CANCELLED = 'CANCELLED'  # cancel()で止められた
+    FAILED = 'FAILED'  # generatorが例外を起こした
+
+
+class InvalidStateError(Exception):
+    '''終わっていないTaskの結果を取り出そうとした'''
+
+
+class Task(EventBase):
+    '''start()が返す、generatorを管理するobject
+
+    Task自体もEventなので、他のgeneratorから yield task でそれが終わるのを待
+    てる。その時generatorはTaskを引数にして再開するので、結果はresultで取り出
+    す事。Orなどによって待つのを取り消されても、Task自体は止まらない。
+
+    generatorが起こした例外はexceptionに記録された上で、今まで通りgeneratorを
+    再開させた側へ伝わる。
+    '''
+
+    __slots__ = (
+        '_driver', '_state', '_result', '_exception', '_callbacks',
+    )
+
+    def __init__(self, gen):
+        super().__init__()
+        self._driver = _TaskDriver(gen, self)
+        self._state = TaskState.STARTED
+        self._result = None
+        self._exception = None
+        # 値を使わないdictを順序付きの集合として使う。必要になるまで作らない
+        self._callbacks = None
+
+    @property
+    def gen(self):
+        return self._driver.root_gen
+
+    @property
+    def state(self):
+        return self._state
+
+    @property
+    def done(self):
+        '''終わった(FINISHED, CANCELLED, FAILEDのいずれか)か否か'''
+        return self._state is not TaskState.STARTED
+
+    @property
+    def cancelled(self):
+        return self._state is TaskState.CANCELLED
+
+    @property
+    def result(self):
+        '''generatorの戻り値
+
+        generatorが例外を起こしていたらその例外を、最後まで進んでいなければ
+        InvalidStateErrorを送出する。
+        '''
+        state = self._state
+        if state is TaskState.FINISHED:
+            return self._result
+        if state is TaskState.FAILED:
+            raise self._exception
+        raise InvalidStateError(f"Task is {state.name}")
+
+    @property
+    def exception(self):
+        '''generatorが起こした例外。起こしていなければNone'''
+        return self._exception
+
+    def add_done_callback(self, callback):
+        '''Taskが終わった時にcallback(task)を呼ぶ。既に終わっていればすぐ呼ぶ
+
+        同じcallbackは一度しか登録されない。
+        '''
+        if self._state is not TaskState.STARTED:
+            callback(self)
+            return
+        callbacks = self._callbacks
+        if callbacks is None:
+            callbacks = self._callbacks = {}
+        callbacks[callback] = None
+
+    def remove_done_callback(self, callback):
+        callbacks = self._callbacks
+        if callbacks is not None:
+            callbacks.pop(callback, None)
+
+    def __call__(self, resume_gen):
+        # Eventとして待たれた
+        self.add_done_callback(resume_gen)
+
+    def cancel(self, resume_gen=None):
+        '''Taskを止める
+
+        Eventとして待たれていたのを取り消す時(resume_genが渡された時)は、待つ
+        のを止めるだけでTask自体は止めない。
+        '''
+        if resume_gen is not None:
+            self.remove_done_callback(resume_gen)
+            return
+        if self._state is not TaskState.STARTED:
+            return
+        self._driver.cancel()
+        self._set_done(TaskState.CANCELLED, None, None)
+
+    def _set_done(self, state, result, exception):
+        self._state = state
+        self._result = result
+        self._exception = exception
+        callbacks = self._callbacks
+        if callbacks:
+            self._callbacks = None
+            for callback in callbacks:
+                callback(self)
+
+
+class Nursery:
+    '''子generatorたちをまとめて開始し、まとめて止める為のobject
+
+    with文と共に使えば、親generatorが閉じられた時に生きている子generatorを全
+    て止める(待機中のEventも取り消す)。子の追加も、子が終わった時の後始末も
+    子の数によらない。
+
+        with Nursery() as nursery:
+            for label in labels:
+                nursery.start(animate(label))
+            yield nursery.wait_all()
+    '''
+
+    __slots__ = ('_children', '_waiters', '_closed', )
+
+    def __init__(self):
+        # 共に値を使わないdictを順序付きの集合として使う
+        self._children = {}
+        self._waiters = {}
+        self._closed = False
+
+    def __len__(self):
+        '''生きている子の数'''
+        return len(self._children)
+
+    @property
+    def children(self):
+        '''生きている子のTaskのtuple'''
+        return tuple(self._children)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def start(self, gen):
+        '''子generatorを開始し、そのTaskを返す'''
+        if self._closed:
+            raise RuntimeError("Nursery is already closed")
+        task = Task(gen)
+        self._children[task] = None
+        task.add_done_callback(self._on_child_done)
+        task._driver.run(None)
+        return task
+
+    def wait_all(self):
+        '''生きている子が居なくなるまで待つEvent'''
+        return _NurseryWait(self, False)
+
+    def wait_any(self):
+        '''次にどれかの子が終わるまで待つEvent。終わった子のTaskを引数に再開する'''
+        return _NurseryWait(self, True)
+
+    def cancel(self):
+        '''生きている子を全て止める'''
+        for task in tuple(self._children):
+            task.cancel()
+
+    def close(self):
+        '''生きている子を全て止め、以降は子を開始できなくする
+
+        閉じる前にこのNurseryを待っていたgeneratorは再開しない。
+        '''
+        self._closed = True
+        self._waiters = {}
+        self.cancel()
+
+    def _on_child_done(self, task):
+        children = self._children
+        if task not in children:
+            return
+        del children[task]
+        waiters = self._waiters
+        if not waiters:
+            return
+        all_done = not children
+        for waiter in tuple(waiters):
+            if waiter.any:
+                del waiters[waiter]
+                waiter.resume_gen(task)
+            elif all_done:
+                del waiters[waiter]
+                waiter.resume_gen()
+
+
+class _NurseryWait(EventBase):
+
+    __slots__ = ('nursery', 'any', 'resume_gen', )
+
+    def __init__(self, nursery, any):
+        super().__init__()
+        self.nursery = nursery
+        self.any = any
+
+    def __call__(self, resume_gen):
+        nursery = self.nursery
+        if not (self.any or nursery._children):
+            resume_gen()
+            return
+        self.resume_gen = resume_gen
+        nursery._waiters[self] = None
+
+    def cancel(self, resume_gen):
+        self.nursery._waiters.pop(self, None)
+
+
+class Signal(EventBase):
+    '''何個のgeneratorからでも yield signal で待てる、GUIライブラリに依らな
+    いEvent
+
+    fire()はその時点で待っている全てのgeneratorを、待ち始めた順に、fire()に渡
+    された引数で再開させる。待っているresume_genは値を使わないdictに順序付きの
+    集合として入れておくので、待つのも取り消すのも待っている数によらない。
+    '''
+
+    __slots__ = ('_waiters', '_firing', )
+
+    def __init__(self):
+        super().__init__()
+        self._waiters = {}
+        # fire()の最中に再開を待っているresume_genたち
+        self._firing = None
+
+    def __len__(self):
+        '''待っているgeneratorの数'''
+        return len(self._waiters)
+
+    def __call__(self, resume_gen):
+        self._waiters[resume_gen] = None
+
+    def cancel(self, resume_gen):
+        self._waiters.pop(resume_gen, None)
+        firing = self._firing
+        if firing is not None:
+            firing.pop(resume_gen, None)
+
+    def fire(self, *args, **kwargs):
+        waiters = self._waiters
+        if not waiters:
+            return
+        # 再開したgeneratorが再び待った場合は次のfire()で再開させる
+        self._waiters = {}
+        previous = self._firing
+        self._firing = waiters
+        try:
+            pop = waiters.pop
+            for resume_gen in tuple(waiters):
+                # 先に再開したgeneratorによって取り消されているかもしれない
+                if pop(resume_gen, _MISSING) is not _MISSING:
+                    resume_gen(*args, **kwargs)
+        finally:
+            self._firing = previous
+
+
+_MISSING = object()
+
+
+class _WaiterQueue:
+    '''FIFOで並んで待つEventたち
+
+    取り消されたEventはすぐには取り除かずresume_genをNoneにしておき、順番が回
+    ってきた時に捨てる。なので並ぶのも取り消すのも待っている数によらない。取り
+    消された物が半分を超えたら詰め直すので、取り消しが続いても溜まり続けはしな
+    い。Eventはresume_genという属性を持つ事。
+    '''
+
+    __slots__ = ('_deque', '_num_cancelled', )
+
+    def __init__(self):
+        self._deque = deque()
+        self._num_cancelled = 0
+
+    def __len__(self):
+        '''取り消されていないEventの数'''
+        return len(self._deque) - self._num_cancelled
+
+    def append(self, event):
+        self._deque.append(event)
+
+    def popleft(self):
+        '''先頭の取り消されていないEventを取り出す。無ければNone'''
+        d = self._deque
+        while d:
+            event = d.popleft()
+            if event.resume_gen is not None:
+                return event
+            self._num_cancelled -= 1
+        return None
+
+    def cancel(self, event):
+        if event.resume_gen is None:
+            return
+        event.resume_gen = None
+        self._num_cancelled += 1
+        d = self._deque
+        if self._num_cancelled > 16 and self._num_cancelled * 2 > len(d):
+            self._deque = deque(e for e in d if e.resume_gen is not None)
+            self._num_cancelled = 0
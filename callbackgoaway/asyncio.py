@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+
+'''asyncioのevent loopの上でgeneratorを動かす為のmodule
+
+generatorはevent loopのcallbackの中で進むので、threadを使わずに一つのevent
+loopの上で多数のgeneratorを同時に動かせる。loopを省略した場合は実行中のevent
+loopを使うので、generatorはevent loopの中から開始すること。
+'''
+
+__all__ = ('Sleep', 'Event', 'as_future', 'RunInThread',
+           'RunInProcess', )
+
+import asyncio
+
+from . import EventBase, _Driver
+from .offload import RunInThreadBase, RunInProcessBase
+
+
+def _get_loop(loop):
+    return asyncio.get_running_loop() if loop is None else loop
+
+
+class Sleep(EventBase):
+    '''loop.call_later()用のWrapper'''
+
+    __slots__ = ('seconds', 'loop', 'handle', )
+
+    def __init__(self, seconds, *, loop=None):
+        super().__init__()
+        self.seconds = seconds
+        self.loop = loop
+        self.handle = None
+
+    def __call__(self, resume_gen):
+        self.handle = _get_loop(self.loop).call_later(self.seconds, resume_gen)
+
+    def cancel(self, resume_gen):
+        handle = self.handle
+        if handle is not None:
+            self.handle = None
+            handle.cancel()
+
+
+class Event(EventBase):
+    '''asyncio.Event又はasyncio.Future用のWrapper
+
+    Eventがsetされるか、Futureが完了した時にそのobjectを引数にして再開する。
+    Futureの結果はresult()で取り出す事。
+    '''
+
+    __slots__ = ('target', 'loop', 'future', 'resume_gen', )
+
+    def __init__(self, target, *, loop=None):
+        super().__init__()
+        self.target = target
+        self.loop = loop
+        self.future = None
+
+    def __call__(self, resume_gen):
+        target = self.target
+        if isinstance(target, asyncio.Event):
+            if target.is_set():
+                resume_gen(target)
+                return
+            # asyncio.Eventにはcallbackを登録する手段が無いのでwait()を待つ
+            # Taskを作る
+            future = _get_loop(self.loop).create_task(target.wait())
+        else:
+            future = target
+        self.resume_gen = resume_gen
+        self.future = future
+        future.add_done_callback(self.callback)
+
+    def callback(self, future):
+        if self.future is None:
+            return
+        self.future = None
+        if future is not self.target and future.cancelled():
+            # wait()を待っていたTaskが外部から止められた
+            return
+        self.resume_gen(self.target)
+
+    def cancel(self, resume_gen):
+        future = self.future
+        if future is None:
+            return
+        self.future = None
+        future.remove_done_callback(self.callback)
+        if future is not self.target:
+            future.cancel()
+
+
+def _wait_event(event):
+    return (yield event)
+
+
+def _capture(gen, future):
+    try:
+        result = yield from gen
+    except GeneratorExit:
+        raise
+    except Exception as e:
+        if not future.done():
+            future.set_exception(e)
+    else:
+        if not future.done():
+            future.set_result(result)
+
+
+def as_future(target, *, loop=None):
+    '''generator又はEventをasyncio.Futureに包む
+
+    generatorならその戻り値が、EventならそのEventが再開時に送る
+    CallbackParameterがFutureの結果になる。generator内で起きた例外はFutureに
+    設定される。Futureをcancelするとgeneratorは閉じられる。
+
+        result = await as_future(some_gen())
+    '''
+    future = _get_loop(loop).create_future()
+    gen = target if hasattr(target, 'send') else _wait_event(target)
+    driver = _Driver(_capture(gen, future))
+
+    def on_done(future):
+        if future.cancelled():
+            driver.cancel()
+    future.add_done_callback(on_done)
+    driver.run(None)
+    return future
+
+
+class RunInThread(RunInThreadBase):
+    '''fn(*args, **kwargs)を共有のthread poolで実行し、終わったらその
+    concurrent.futures.Futureを引数にしてevent loopのthreadで再開する'''
+
+    __slots__ = ('loop', )
+
+    def __init__(self, fn, *args, loop=None, **kwargs):
+        super().__init__(fn, *args, **kwargs)
+        self.loop = loop
+
+    def __call__(self, resume_gen):
+        self.loop = _get_loop(self.loop)
+        super().__call__(resume_gen)
+
+    def call_soon_threadsafe(self, callback):
+        self.loop.call_soon_threadsafe(callback)
+
+
+class RunInProcess(RunInProcessBase, RunInThread):
+    '''fn(*args, **kwargs)を共有のprocess poolで実行し、終わったらその
+    concurrent.futures.Futureを引数にしてevent loopのthreadで再開する'''
+
+    __slots__ = ()
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+'''generatorの再開を1frameあたりの時間内に収める為のrun queue
+
+各backendの enable_frame_budget() を呼ぶと、Eventによるgeneratorの再開は
+toolkitのcallbackの中ですぐには行われず、このqueueに溜められる。queueは
+frame毎に一度、予算の時間を使い切るまで溜まった順に再開させ、残りは次の
+frameに持ち越す。なので多数のEventが同じframeに起きてもframeは落ちにくくな
+る代わりに、再開が後のframeにずれる事がある。
+'''
+
+__all__ = ('FrameBudget', )
+
+from collections import deque
+from time import perf_counter
+
+from . import _set_run_queue
+
+
+class FrameBudget:
+    '''1frameあたりbudgetの時間だけgeneratorを再開させるrun queue
+
+    schedule_drain(drain)はdrainを次のframeで一度呼ぶよう予約する関数。
+    budgetとnow()の単位は揃える事。
+
+    counters:
+        resumed: 再開させた数
+        deferred: 予算が尽きて次のframeに持ち越した延べ数
+        frames: drainした回数
+        max_length: queueの最大の長さ
+    '''
+
+    __slots__ = (
+        'budget', '_schedule_drain', '_now', '_queue', '_scheduled',
+        'resumed', 'deferred', 'frames', 'max_length',
+    )
+
+    def __init__(self, budget, *, schedule_drain, now=perf_counter):
+        self.budget = budget
+        self._schedule_drain = schedule_drain
+        self._now = now
+        self._queue = deque()
+        self._scheduled = False
+        self.resumed = 0
+        self.deferred = 0
+        self.frames = 0
+        self.max_length = 0
+
+    def __len__(self):
+        return len(self._queue)
+
+    def enable(self):
+        _set_run_queue(self)
+
+    def disable(self):
+        '''run queueとして使うのを止め、溜まっている分を全て再開させる'''
+        _set_run_queue(None)
+        self.flush()
+
+    def push(self, driver, value):
+        queue = self._queue
+        # どのEventによる再開かを覚えておく
+        queue.append((driver, value, driver.event, ))
+        if len(queue) > self.max_length:
+            self.max_length = len(queue)
+        if not self._scheduled:
+            self._scheduled = True
+            self._schedule_drain(self.drain)
+
+    def drain(self, *args):
+        '''toolkitから呼ばれる。予算を使い切るまで再開させる'''
+        self._scheduled = False
+        self.frames += 1
+        now = self._now
+        deadline = now() + self.budget
+        queue = self._queue
+        popleft = queue.popleft
+        try:
+            while queue:
+                driver, value, event = popleft()
+                # 待っている間に取り消されたり、throw()されて別のEventを待っ
+                # ているかもしれない
+                if driver.event is event:
+                    self.resumed += 1
+                    driver.run(value)
+                if now() >= deadline:
+                    break
+        finally:
+            if queue:
+                self.deferred += len(queue)
+                if not self._scheduled:
+                    self._scheduled = True
+                    self._schedule_drain(self.drain)
+
+    def flush(self):
+        '''予算に関わらず溜まっている分を全て再開させる'''
+        queue = self._queue
+        popleft = queue.popleft
+        while queue:
+            driver, value, event = popleft()
+            if driver.event is event:
+                self.resumed += 1
+                driver.run(value)
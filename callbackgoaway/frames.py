@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+'''NextFrameとFramesの待機を一つのtoolkitのcallbackでまとめて扱う為のmodule
+
+Sleep(0)で次のframeを待つとtoolkitのtimerが待機毎に作られるので、毎frame何千
+ものgeneratorが待つとその分のtimerが毎frame作られて消される。各backendの
+NextFrameとFramesは代わりにFrameClockの共有のlistに入り、frame毎に一度だけ呼
+ばれるtoolkitのcallbackがそのlistを新しい物と入れ替えてから再開させる。
+'''
+
+__all__ = ('FrameClock', 'FramesBase', )
+
+from time import perf_counter
+
+from . import EventBase
+
+
+class FrameClock:
+    '''frame毎にtick()を呼ばれ、frameを待っているEventたちを再開させる
+
+    start_ticking(tick)はtickをframe毎に呼ぶtoolkitのtimerを開始してその
+    handleを返す関数、stop_ticking(handle)はそれを止める関数。待っている
+    Eventが無い間はtoolkitのtimerは止めておく。
+    '''
+
+    __slots__ = (
+        '_start_ticking', '_stop_ticking', '_now', '_ticking', '_last',
+        '_waiters',
+    )
+
+    def __init__(self, *, start_ticking, stop_ticking, now=perf_counter):
+        self._start_ticking = start_ticking
+        self._stop_ticking = stop_ticking
+        self._now = now
+        self._ticking = None
+        self._last = None
+        self._waiters = []
+
+    @property
+    def ticking(self):
+        return self._ticking is not None
+
+    def __len__(self):
+        '''frameを待っているEventの数'''
+        return sum(1 for event in self._waiters
+                   if event.resume_gen is not None)
+
+    def add(self, event):
+        self._waiters.append(event)
+        if self._ticking is None:
+            self._last = self._now()
+            self._ticking = self._start_ticking(self.tick)
+
+    def tick(self, *args):
+        '''toolkitのtimerから呼ばれる。待っているEventのframeを一つ進める'''
+        now = self._now()
+        dt = now - self._last
+        self._last = now
+        waiters = self._waiters
+        # 再開したgeneratorが再び待つ時は新しいlistに入り、次のframeを待つ
+        self._waiters = still_waiting = []
+        for event in waiters:
+            resume_gen = event.resume_gen
+            if resume_gen is None:
+                # 取り消されたか、先に再開したgeneratorによって取り消された
+                continue
+            event.elapsed += dt
+            event.remaining -= 1
+            if event.remaining:
+                still_waiting.append(event)
+                continue
+            event.resume_gen = None
+            resume_gen(event.elapsed)
+        if not self._waiters and self._ticking is not None:
+            self._stop_ticking(self._ticking)
+            self._ticking = None
+
+
+class FramesBase(EventBase):
+    '''n frame待つEvent。その間に経過した時間を引数にして再開する
+
+    派生classはget_frame_clock()でbackendのFrameClockを返す。
+    '''
+
+    __slots__ = ('n', 'remaining', 'elapsed', 'resume_gen', )
+
+    def __init__(self, n):
+        if n < 1:
+            raise ValueError("'n' must be 1 or greater")
+        super().__init__()
+        self.n = n
+        self.resume_gen = None
+
+    def get_frame_clock(self):
+        raise NotImplementedError()
+
+    def __call__(self, resume_gen):
+        self.remaining = self.n
+        self.elapsed = 0
+        self.resume_gen = resume_gen
+        self.get_frame_clock().add(self)
+
+    def cancel(self, resume_gen):
+        # listからはすぐには取り除かず、次のframeで捨てる
+        self.resume_gen = None
@@ -1,21 +1,87 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ('Sleep', 'Event', )
+__all__ = (
+    'Sleep', 'Event', 'enable_timer_wheel', 'disable_timer_wheel',
+    'enable_frame_budget', 'disable_frame_budget', 'RunInThread',
+    'RunInProcess', 'create_tween_engine', 'NextFrame', 'Frames',
+)
 
 from functools import partial
+from weakref import WeakKeyDictionary, ref
 
 from kivy.clock import Clock
 schedule_once = Clock.schedule_once
 
 from . import EventBase
+from .timerwheel import TimerWheel
+from .framebudget import FrameBudget
+from .frames import FrameClock, FramesBase
+from .offload import RunInThreadBase, RunInProcessBase
+
+_timer_wheel = None
+_frame_budget = None
+
+
+def enable_timer_wheel(resolution=1 / 60):
+    '''以降のSleepが個別にClock.schedule_once()する代わりに、resolution秒毎に
+    動く一つのtimerを共有するようにする'''
+    global _timer_wheel
+    _timer_wheel = TimerWheel(
+        resolution,
+        # Sleepと同じく、Clockが弱参照しか持たないのでpartial()で包む
+        start_ticking=lambda tick: Clock.schedule_interval(
+            partial(tick), resolution),
+        stop_ticking=lambda clock_event: clock_event.cancel(),
+    )
+
+
+def disable_timer_wheel():
+    global _timer_wheel
+    _timer_wheel = None
+
+
+def enable_frame_budget(budget=0.004):
+    '''以降のgeneratorの再開をqueueに溜め、1frameあたりbudget秒を使い切るまで
+    再開させ、残りは次のframeに持ち越すようにする。戻り値のFrameBudgetから再
+    開や持ち越しの数を得られる'''
+    global _frame_budget
+    disable_frame_budget()
+    _frame_budget = FrameBudget(
+        budget,
+        schedule_drain=lambda drain: Clock.schedule_once(drain, 0),
+    )
+    _frame_budget.enable()
+    return _frame_budget
+
+
+def disable_frame_budget():
+    '''溜まっている再開を全て行い、以降は再びすぐに再開させる'''
+    global _frame_budget
+    if _frame_budget is not None:
+        _frame_budget.disable()
+        _frame_budget = None
+
+
+def create_tween_engine():
+    '''tweenがある間Clock.schedule_interval()で毎frame進むTweenEngineを作る。
+    numpyが必要'''
+    from .tween import TweenEngine
+    return TweenEngine(
+        # Sleepと同じく、Clockが弱参照しか持たないのでpartial()で包む
+        start_ticking=lambda tick: Clock.schedule_interval(partial(tick), 0),
+        stop_ticking=lambda clock_event: clock_event.cancel(),
+    )
 
 
 class Sleep(EventBase):
     '''kivy,clock.Clock.schedule_once()用のWrapper'''
 
+    __slots__ = ('seconds', 'clock_event', )
+
     def __init__(self, seconds):
         super().__init__()
         self.seconds = seconds
+        self.clock_event = None
 
     def __call__(self, resume_gen):
         # The partial() here looks meaningless. But this is needed in order
@@ -23,24 +89,182 @@ class Sleep(EventBase):
         # このpartial()は無意味に見えますが、これをしないとresume_genの弱参照が作ら
         # れる可能性があり、それによってresume_genが呼ばれない事がある。
         # (例えばresume_genが一時オブジェクトのinstance methodの時)
-        schedule_once(partial(resume_gen), self.seconds)
+        timer_wheel = _timer_wheel
+        if timer_wheel is None:
+            self.clock_event = schedule_once(partial(resume_gen), self.seconds)
+        else:
+            self.clock_event = timer_wheel.add(self.seconds, resume_gen)
+
+    def cancel(self, resume_gen):
+        clock_event = self.clock_event
+        if clock_event is not None:
+            self.clock_event = None
+            clock_event.cancel()
+
+
+class _Multiplexer:
+    '''一つの(EventDispatcher, Event名)に一つだけcallbackをbindし、そのEventを
+    待っているEventたちに配る
+
+    待っているEventは値を使わないdictに順序付きの集合として入れておくので、追
+    加も取り除くのも待っている数によらない。Eventが起きると集合ごと新しい物と
+    入れ替えてから、待っていた順に再開させる。
+
+    kivyは後からbindされたcallbackから順に呼び、Trueを返すcallbackが居るとそ
+    こで止める。待っているEventが居なかった所へ最初のEventが加わる時にbindし直
+    して、後からbindされたcallbackより先に呼ばれるようにする。
+
+    bindされるのはbound methodではなくこのobject自身なので、これを持ち続けるの
+    はEventDispatcherのbindingだけになる。なのでEventDispatcherが捨てられれば、
+    待っていたEventとgeneratorも一緒に回収される。
+    '''
+
+    __slots__ = ('name', 'bind_id', 'waiters', '__weakref__', )
+
+    def __init__(self, name):
+        # EventDispatcherを強参照しないよう、edは覚えずにadd()の度に受け取る
+        self.name = name
+        self.bind_id = 0
+        self.waiters = {}
+
+    def add(self, ed, event):
+        waiters = self.waiters
+        if not waiters:
+            name = self.name
+            bind_id = self.bind_id
+            if bind_id:
+                ed.unbind_uid(name, bind_id)
+            self.bind_id = bind_id = ed.fbind(name, self)
+            assert bind_id > 0  # check if binding succeeded
+        waiters[event] = None
+
+    def __call__(self, ed, *args, **kwargs):
+        waiters = self.waiters
+        if not waiters:
+            return
+        self.waiters = {}
+        for event in waiters:
+            # 先に再開したgeneratorによって取り消されているかもしれない
+            if event.multiplexer is self:
+                event.multiplexer = None
+                event.resume_gen(ed, *args, **kwargs)
+
+
+# {EventDispatcher: {Event名: _Multiplexerへの弱参照}}。_Multiplexerは待って
+# いるEventを通してEventDispatcherを強参照するので、ここからは弱参照しか持たな
+# い
+_multiplexers = WeakKeyDictionary()
+
+
+def _get_multiplexer(ed, name):
+    '''弱参照を作れないEventDispatcherに対してはNoneを返す'''
+    try:
+        multiplexers = _multiplexers[ed]
+    except KeyError:
+        multiplexers = _multiplexers[ed] = {}
+    except TypeError:
+        return None
+    multiplexer_ref = multiplexers.get(name)
+    multiplexer = None if multiplexer_ref is None else multiplexer_ref()
+    if multiplexer is None:
+        multiplexer = _Multiplexer(name)
+        multiplexers[name] = ref(multiplexer)
+    return multiplexer
 
 
 class Event(EventBase):
-    '''kivy.event.EventDispatcher用のWrapper'''
+    '''kivy.event.EventDispatcher用のWrapper
+
+    同じ(EventDispatcher, Event名)を待つ全てのEventは、共有のcallbackを通して
+    再開する。bindし直すのは誰も待っていなかった所へ待ち始める時だけなので、待
+    っている数によらずkivyのobserverのlistはほとんど触らない。同時に起きた場合
+    は待ち始めた順に再開する。
+    '''
+
+    __slots__ = ('ed', 'name', 'bind_id', 'multiplexer', 'resume_gen', )
 
     def __init__(self, ed, name):
         super().__init__()
         self.bind_id = None
+        self.multiplexer = None
         self.ed = ed
         self.name = name
 
     def __call__(self, resume_gen):
         assert self.bind_id is None  # You can't re-use this instance
-        self.bind_id = bind_id = self.ed.fbind(self.name, self.callback)
-        assert bind_id > 0  # check if binding succeeded
+        self.bind_id = 0
         self.resume_gen = resume_gen
+        ed = self.ed
+        name = self.name
+        multiplexer = _get_multiplexer(ed, name)
+        if multiplexer is None:
+            # 共有のcallbackを使えないので待つ度にbindする
+            self.bind_id = bind_id = ed.fbind(name, self.callback)
+            assert bind_id > 0  # check if binding succeeded
+        else:
+            self.multiplexer = multiplexer
+            multiplexer.add(ed, self)
 
     def callback(self, ed, *args, **kwargs):
-        ed.unbind_uid(self.name, self.bind_id)
+        self.unbind()
         self.resume_gen(ed, *args, **kwargs)
+
+    def cancel(self, resume_gen):
+        multiplexer = self.multiplexer
+        if multiplexer is not None:
+            self.multiplexer = None
+            multiplexer.waiters.pop(self, None)
+        else:
+            self.unbind()
+
+    def unbind(self):
+        bind_id = self.bind_id
+        if bind_id:
+            # 0にしておく事で再利用の禁止と二重のunbindの防止を兼ねる
+            self.bind_id = 0
+            self.ed.unbind_uid(self.name, bind_id)
+
+
+class RunInThread(RunInThreadBase):
+    '''fn(*args, **kwargs)を共有のthread poolで実行し、終わったらそのFuture
+    を引数にして再開する'''
+
+    __slots__ = ()
+
+    def call_soon_threadsafe(self, callback):
+        # Clock.schedule_once()はどのthreadから呼んでも良い
+        schedule_once(partial(callback), 0)
+
+
+class RunInProcess(RunInProcessBase, RunInThread):
+    '''fn(*args, **kwargs)を共有のprocess poolで実行し、終わったらそのFuture
+    を引数にして再開する'''
+
+    __slots__ = ()
+
+
+_frame_clock = FrameClock(
+    start_ticking=lambda tick: Clock.schedule_interval(tick, 0),
+    stop_ticking=lambda clock_event: clock_event.cancel(),
+)
+
+
+class Frames(FramesBase):
+    '''n frame待つ。その間に経過した秒数を引数にして再開する
+
+    待っている全てのFramesは毎frame呼ばれる一つのClockのcallbackを共有する。
+    '''
+
+    __slots__ = ()
+
+    def get_frame_clock(self):
+        return _frame_clock
+
+
+class NextFrame(Frames):
+    '''次のframeまで待つ。前のframeからの秒数を引数にして再開する'''
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
@@ -0,0 +1,205 @@
+# -*- coding: utf-8 -*-
+
+'''同時に動く処理の数を制限する為のLock, Semaphore, CapacityLimiter
+
+GUIライブラリに依らず、timerも使わない。取得はyieldで待ち、待っている
+generatorは並んだ順に再開する。
+
+    limiter = CapacityLimiter(4)
+
+    def load(path):
+        yield limiter.acquire(path)
+        try:
+            ...
+        finally:
+            limiter.release(path)
+'''
+
+__all__ = ('Lock', 'Semaphore', 'CapacityLimiter', )
+
+from . import EventBase, _WaiterQueue
+
+
+class _Acquire(EventBase):
+
+    __slots__ = ('owner', 'borrower', 'resume_gen', 'granted', )
+
+    def __init__(self, owner, borrower=None):
+        super().__init__()
+        self.owner = owner
+        self.borrower = borrower
+        self.resume_gen = None
+        # 待っている間に渡された。再開がrun queueで後回しにされていると、
+        # generatorが受け取る前に取り消される事がある
+        self.granted = False
+
+    def __call__(self, resume_gen):
+        owner = self.owner
+        # 既に並んでいるgeneratorを追い越さない
+        if not owner._waiters and owner._try_acquire(self.borrower):
+            resume_gen()
+        else:
+            self.resume_gen = resume_gen
+            owner._waiters.append(self)
+
+    def cancel(self, resume_gen):
+        if self.granted:
+            # 渡されたがgeneratorには届かなかったので返す
+            self.granted = False
+            self.owner._give_back(self.borrower)
+        else:
+            self.owner._waiters.cancel(self)
+
+
+class Semaphore:
+    '''同時にvalue個まで取得できるsemaphore'''
+
+    __slots__ = ('_value', '_waiters', )
+
+    def __init__(self, value=1):
+        if value < 0:
+            raise ValueError("'value' must be non-negative")
+        self._value = value
+        self._waiters = _WaiterQueue()
+
+    @property
+    def value(self):
+        '''今すぐ取得できる数'''
+        return self._value
+
+    @property
+    def num_waiting(self):
+        return len(self._waiters)
+
+    def acquire(self):
+        '''取得するEvent。取得できるまで待つ'''
+        return _Acquire(self)
+
+    def acquire_nowait(self):
+        '''取得できたか否かを返す。待たない'''
+        if self._waiters:
+            return False
+        return self._try_acquire(None)
+
+    def release(self):
+        '''取得した物を返す。待っているgeneratorが居れば直接渡して再開させる'''
+        waiter = self._waiters.popleft()
+        if waiter is None:
+            self._value += 1
+            return
+        resume_gen = waiter.resume_gen
+        waiter.resume_gen = None
+        waiter.granted = True
+        resume_gen()
+
+    def _give_back(self, borrower):
+        self.release()
+
+    def _try_acquire(self, borrower):
+        if self._value:
+            self._value -= 1
+            return True
+        return False
+
+
+class Lock(Semaphore):
+    '''一度に一つしか取得できないSemaphore'''
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
+
+    @property
+    def locked(self):
+        return not self._value
+
+    def release(self):
+        if self._value:
+            raise RuntimeError("release() was called on an unlocked Lock")
+        super().release()
+
+
+class CapacityLimiter:
+    '''同時に借りられる数がtotal_tokens個までのtoken置き場
+
+    Semaphoreと違って誰(borrower)が借りているかを記録するので、同じborrower
+    が二重に借りたり、借りていないborrowerが返したりすると例外を送出する。ま
+    たtotal_tokensは後から変えられる。borrowerはhash可能な任意のobject。
+    '''
+
+    __slots__ = ('_total_tokens', '_borrowers', '_waiters', )
+
+    def __init__(self, total_tokens):
+        self._borrowers = set()
+        self._waiters = _WaiterQueue()
+        self._total_tokens = 0
+        self.total_tokens = total_tokens
+
+    @property
+    def total_tokens(self):
+        return self._total_tokens
+
+    @total_tokens.setter
+    def total_tokens(self, value):
+        if value < 1:
+            raise ValueError("'total_tokens' must be at least 1")
+        self._total_tokens = value
+        # 増えた分だけ待っているgeneratorに貸す
+        self._lend_to_waiters()
+
+    @property
+    def borrowed_tokens(self):
+        return len(self._borrowers)
+
+    @property
+    def available_tokens(self):
+        return max(self._total_tokens - len(self._borrowers), 0)
+
+    @property
+    def num_waiting(self):
+        return len(self._waiters)
+
+    def acquire(self, borrower):
+        '''borrowerとしてtokenを借りるEvent。借りられるまで待つ'''
+        if borrower in self._borrowers:
+            raise RuntimeError(f"{borrower!r} already holds a token")
+        return _Acquire(self, borrower)
+
+    def acquire_nowait(self, borrower):
+        '''借りられたか否かを返す。待たない'''
+        if borrower in self._borrowers:
+            raise RuntimeError(f"{borrower!r} already holds a token")
+        if self._waiters:
+            return False
+        return self._try_acquire(borrower)
+
+    def release(self, borrower):
+        '''borrowerが借りているtokenを返す'''
+        try:
+            self._borrowers.remove(borrower)
+        except KeyError:
+            raise RuntimeError(f"{borrower!r} holds no token") from None
+        self._lend_to_waiters()
+
+    _give_back = release
+
+    def _try_acquire(self, borrower):
+        borrowers = self._borrowers
+        if len(borrowers) < self._total_tokens:
+            borrowers.add(borrower)
+            return True
+        return False
+
+    def _lend_to_waiters(self):
+        waiters = self._waiters
+        borrowers = self._borrowers
+        while len(borrowers) < self._total_tokens:
+            waiter = waiters.popleft()
+            if waiter is None:
+                return
+            borrowers.add(waiter.borrower)
+            resume_gen = waiter.resume_gen
+            waiter.resume_gen = None
+            waiter.granted = True
+            resume_gen()
@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+
+'''重い処理を別のthread又はprocessに任せ、終わったらGUIのthreadでgeneratorを再
+開させる為のmodule
+
+generatorはGUIライブラリのcallbackの中で進むので、その中でfileの読み書きなど
+の時間のかかる関数を呼ぶとその間GUIが固まる。RunInThreadはそういった関数を共有
+のThreadPoolExecutorで実行し、終わったら各backendのthread-safeな手段でGUIの
+threadに戻ってからgeneratorを再開させる。GILを手放さない計算にはRunInProcess
+を使えば共有のProcessPoolExecutorで実行できる。RunInThreadとRunInProcess自体
+は各backendのmoduleにある。
+'''
+
+__all__ = (
+    'RunInThreadBase', 'RunInProcessBase', 'set_max_workers', 'get_executor',
+    'stats', 'OffloadStats', 'set_max_processes', 'get_process_executor',
+    'shared', 'SharedResult',
+)
+
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from threading import Lock
+from weakref import finalize
+
+from . import EventBase
+
+OffloadStats = namedtuple('OffloadStats', (
+    'max_workers', 'queued', 'running', 'completed', 'max_queued',
+))
+OffloadStats.__doc__ = '''thread poolの様子
+
+queued: 投入されてまだ始まっていない数
+running: 実行中の数
+completed: 終わった数
+max_queued: queuedの最大値
+'''
+
+_executor = None
+_max_workers = None
+_lock = Lock()
+_queued = _running = _completed = _max_queued = 0
+
+
+def set_max_workers(max_workers):
+    '''thread poolのthreadの数を変える。Noneなら
+    ThreadPoolExecutorの既定値。既に動いている処理はそのまま続く'''
+    global _executor, _max_workers
+    with _lock:
+        executor = _executor
+        _executor = None
+        _max_workers = max_workers
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def get_executor():
+    '''共有のThreadPoolExecutorを返す。無ければ作る'''
+    global _executor
+    with _lock:
+        executor = _executor
+        if executor is None:
+            executor = _executor = ThreadPoolExecutor(
+                max_workers=_max_workers,
+                thread_name_prefix='callbackgoaway',
+            )
+        return executor
+
+
+def stats():
+    with _lock:
+        max_workers = _executor._max_workers if _executor is not None \
+            else _max_workers
+        return OffloadStats(
+            max_workers, _queued, _running, _completed, _max_queued)
+
+
+def _run(fn, args, kwargs):
+    global _queued, _running, _completed
+    with _lock:
+        _queued -= 1
+        _running += 1
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        with _lock:
+            _running -= 1
+            _completed += 1
+
+
+def _submit(fn, args, kwargs):
+    global _queued, _max_queued
+    executor = get_executor()
+    with _lock:
+        _queued += 1
+        if _queued > _max_queued:
+            _max_queued = _queued
+    try:
+        future = executor.submit(_run, fn, args, kwargs)
+    except BaseException:
+        with _lock:
+            _queued -= 1
+        raise
+    return future
+
+
+def _on_cancelled(future):
+    global _queued
+    # 始まる前に取り消された
+    with _lock:
+        _queued -= 1
+
+
+_process_executor = None
+_max_processes = None
+
+
+def set_max_processes(max_processes):
+    '''process poolのprocessの数を変える。NoneならProcessPoolExecutorの既定
+    値。既に動いている処理はそのまま続く'''
+    global _process_executor, _max_processes
+    with _lock:
+        executor = _process_executor
+        _process_executor = None
+        _max_processes = max_processes
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+def get_process_executor():
+    '''共有のProcessPoolExecutorを返す。無ければ作る'''
+    global _process_executor
+    with _lock:
+        executor = _process_executor
+        if executor is None:
+            executor = _process_executor = ProcessPoolExecutor(
+                max_workers=_max_processes)
+        return executor
+
+
+class RunInThreadBase(EventBase):
+    '''fn(*args, **kwargs)を共有のthread poolで実行し、終わったらそのFutureを
+    引数にしてGUIのthreadで再開する
+
+    fnの戻り値はFutureのresult()で取り出す事。fnが例外を起こしていた場合は
+    result()がそれを送出する。取り消された時は、まだ始まっていなければ実行を
+    取り止め、始まっていれば結果を捨てる。
+
+    backend毎にcall_soon_threadsafe(callback)を実装する。これは任意のthread
+    から呼ばれ、GUIのthreadでcallback()を呼ぶよう予約する。
+    '''
+
+    __slots__ = ('fn', 'args', 'kwargs', 'future', 'resume_gen', )
+
+    def __init__(self, fn, *args, **kwargs):
+        super().__init__()
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = None
+
+    def __call__(self, resume_gen):
+        self.resume_gen = resume_gen
+        self.future = future = self._submit()
+        future.add_done_callback(self._on_done)
+
+    def _submit(self):
+        return _submit(self.fn, self.args, self.kwargs)
+
+    def _on_cancelled(self, future):
+        _on_cancelled(future)
+
+    def _on_done(self, future):
+        # worker thread(又は取り消したthread)から呼ばれる
+        if future.cancelled():
+            self._on_cancelled(future)
+            return
+        self.call_soon_threadsafe(partial(self._resume, future))
+
+    def _resume(self, future, *args):
+        # GUIのthreadから呼ばれる
+        if self.future is not future:
+            # 取り消された
+            return
+        self.future = None
+        self.resume_gen(future)
+
+    def cancel(self, resume_gen):
+        future = self.future
+        if future is not None:
+            self.future = None
+            future.cancel()
+
+    def call_soon_threadsafe(self, callback):
+        raise NotImplementedError()
+
+
+class RunInProcessBase(RunInThreadBase):
+    '''fn(*args, **kwargs)を共有のprocess poolで実行し、終わったらそのFuture
+    を引数にしてGUIのthreadで再開する
+
+    fnと引数と戻り値はpickle出来なければならない。大きなbytesや配列を返すなら
+    fnをshared()で包めば、pickleの代わりにshared memoryを通して受け取れる。
+    '''
+
+    __slots__ = ()
+
+    def _submit(self):
+        return get_process_executor().submit(self.fn, *self.args, **self.kwargs)
+
+    def _on_cancelled(self, future):
+        pass
+
+
+# shared memoryはWindowsでは最後のhandleが閉じた時点で消えてしまうので、子
+# processが閉じた後に親が開く事が出来ない
+_can_share = os.name == 'posix'
+
+
+class shared:
+    '''RunInProcessに渡す関数を包み、その戻り値(bytes, bytearray,
+    memoryview, numpy.ndarrayのいずれか)をshared memoryを通して返させる
+
+    generatorはFutureのresult()からSharedResultを受け取る。戻り値がそれら以外
+    の型か、shared memoryを使えない環境では戻り値をそのまま返す。
+
+        param = yield RunInProcess(shared(render_texture), 512, 512)
+        with param.args[0].result() as result:
+            texture.blit_buffer(result.buf, ...)
+    '''
+
+    __slots__ = ('fn', )
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __getstate__(self):
+        return self.fn
+
+    def __setstate__(self, fn):
+        self.fn = fn
+
+    def __call__(self, *args, **kwargs):
+        # 子processで呼ばれる
+        result = self.fn(*args, **kwargs)
+        if not _can_share:
+            return result
+        if isinstance(result, (bytes, bytearray, memoryview)):
+            view = memoryview(result).cast('B')
+            shape = dtype = None
+        elif type(result).__module__ == 'numpy' and hasattr(result, 'dtype'):
+            import numpy
+            result = numpy.ascontiguousarray(result)
+            view = memoryview(result).cast('B')
+            shape = result.shape
+            dtype = result.dtype.str
+        else:
+            return result
+        return SharedResult._create(view, shape, dtype)
+
+
+def _release(shm):
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+    try:
+        shm.close()
+    except BufferError:
+        # bufのviewがまだ使われている。mapはprocessが終わる時に外れる
+        pass
+
+
+class SharedResult:
+    '''shared memoryを通して受け取った、shared()で包んだ関数の戻り値
+
+    bufはshared memoryをそのまま指すmemoryviewで、複製はされない。numpyの配
+    列だった場合はarrayで同じく複製せずに配列として見られる。shared memory
+    はrelease()を呼ぶか、with文を抜けるか、このobjectが捨てられた時(例えば受
+    け取ったgeneratorが終わった時)に解放される。
+    '''
+
+    __slots__ = ('name', 'nbytes', 'shape', 'dtype', '_shm', '_finalizer',
+                 '__weakref__', )
+
+    @classmethod
+    def _create(cls, view, shape, dtype):
+        # 子processで呼ばれる
+        from multiprocessing import shared_memory, resource_tracker
+        nbytes = view.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+        shm.buf[:nbytes] = view
+        # 解放するのは親processの役目なので、子processの終了時に消されない
+        # ようにする
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        self = cls.__new__(cls)
+        self.name = shm.name
+        self.nbytes = nbytes
+        self.shape = shape
+        self.dtype = dtype
+        self._shm = None
+        self._finalizer = None
+        shm.close()
+        return self
+
+    def __reduce__(self):
+        return (_attach, (self.name, self.nbytes, self.shape, self.dtype))
+
+    @property
+    def buf(self):
+        shm = self._shm
+        if shm is None:
+            raise ValueError("SharedResult is already released")
+        return shm.buf[:self.nbytes]
+
+    @property
+    def array(self):
+        import numpy
+        return numpy.ndarray(
+            self.shape, dtype=self.dtype, buffer=self.buf)
+
+    def tobytes(self):
+        return self.buf.tobytes()
+
+    def release(self):
+        self._shm = None
+        finalizer = self._finalizer
+        if finalizer is not None:
+            self._finalizer = None
+            finalizer()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.release()
+
+
+def _attach(name, nbytes, shape, dtype):
+    # 親processで戻り値をunpickleする時に呼ばれる
+    from multiprocessing import shared_memory
+    self = SharedResult.__new__(SharedResult)
+    self.name = name
+    self.nbytes = nbytes
+    self.shape = shape
+    self.dtype = dtype
+    self._shm = shm = shared_memory.SharedMemory(name=name)
+    # 受け取る前に取り消された場合もこのobjectが捨てられれば解放される
+    self._finalizer = finalize(self, _release, shm)
+    return self
@@ -0,0 +1,160 @@
+# -*- coding: utf-8 -*-
+
+'''どのgeneratorがどれだけ時間を使っているかを調べる為のprofiler
+
+Hooksを使ってgeneratorが一回進む(step)毎にかかったCPU時間と、Eventを待って
+停まっていた時間を、generator関数毎とEventの型毎に集計する。
+
+    profiler = Profiler()
+    with profiler:
+        ...
+    print(profiler.format_stats())
+'''
+
+__all__ = ('Profiler', 'FunctionStats', 'EventStats', )
+
+from time import perf_counter, thread_time
+
+from . import _RecordingHooks
+
+
+class FunctionStats:
+    '''一つのgenerator関数の集計結果'''
+
+    __slots__ = (
+        'name', 'spawned', 'finished', 'steps', 'step_time',
+        'max_step_time', 'suspended_time',
+    )
+
+    def __init__(self, name):
+        self.name = name
+        self.spawned = 0
+        self.finished = 0
+        self.steps = 0
+        self.step_time = 0.
+        self.max_step_time = 0.
+        self.suspended_time = 0.
+
+    @property
+    def mean_step_time(self):
+        return self.step_time / self.steps if self.steps else 0.
+
+
+class EventStats:
+    '''一つのEventの型の集計結果'''
+
+    __slots__ = ('name', 'waits', 'suspended_time', )
+
+    def __init__(self, name):
+        self.name = name
+        self.waits = 0
+        self.suspended_time = 0.
+
+
+def _function_key(gen):
+    code = gen.gi_code
+    return (code.co_filename, code.co_firstlineno, gen.__qualname__)
+
+
+class Profiler(_RecordingHooks):
+    '''generator関数毎とEventの型毎に時間を集計するHooks
+
+    stepにかかった時間はcpu_timer(既定ではthread_time)で、停まっていた時間は
+    wall_timer(既定ではperf_counter)で測る。
+    '''
+
+    __slots__ = ('functions', 'events', 'cpu_timer', 'wall_timer', )
+
+    def __init__(self, *, cpu_timer=thread_time, wall_timer=perf_counter):
+        # _liveにはgenerator毎に [FunctionStats, stepの開始時刻, 停まった時
+        # 刻, 待っているEventのEventStats] を記録する
+        super().__init__()
+        # {(filename, firstlineno, qualname): FunctionStats}
+        self.functions = {}
+        # {Eventの型: EventStats}
+        self.events = {}
+        self.cpu_timer = cpu_timer
+        self.wall_timer = wall_timer
+
+    def clear(self):
+        self.functions.clear()
+        self.events.clear()
+        self._live.clear()
+
+    def _new_record(self, gen):
+        key = _function_key(gen)
+        stats = self.functions.get(key)
+        if stats is None:
+            stats = self.functions[key] = FunctionStats(gen.__qualname__)
+        return [stats, None, None, None]
+
+    def on_spawn(self, gen):
+        self._record(gen)[0].spawned += 1
+
+    def on_resume(self, gen):
+        record = self._record(gen)
+        suspended_at = record[2]
+        if suspended_at is not None:
+            elapsed = self.wall_timer() - suspended_at
+            record[0].suspended_time += elapsed
+            event_stats = record[3]
+            if event_stats is not None:
+                event_stats.suspended_time += elapsed
+            record[2] = record[3] = None
+        record[1] = self.cpu_timer()
+
+    def on_suspend(self, gen, event):
+        record = self._record(gen)
+        self._end_step(record)
+        cls = type(event)
+        event_stats = self.events.get(cls)
+        if event_stats is None:
+            event_stats = self.events[cls] = EventStats(cls.__qualname__)
+        event_stats.waits += 1
+        record[3] = event_stats
+        record[2] = self.wall_timer()
+
+    def on_finish(self, gen):
+        record = self._live.pop(gen, None)
+        if record is None:
+            return
+        self._end_step(record)
+        record[0].finished += 1
+
+    def _end_step(self, record):
+        started_at = record[1]
+        if started_at is None:
+            return
+        record[1] = None
+        elapsed = self.cpu_timer() - started_at
+        stats = record[0]
+        stats.steps += 1
+        stats.step_time += elapsed
+        if elapsed > stats.max_step_time:
+            stats.max_step_time = elapsed
+
+    def format_stats(self, *, sort='step_time', limit=None):
+        '''集計結果を表にした文字列を返す。sortはFunctionStatsの属性名'''
+        functions = sorted(
+            self.functions.values(),
+            key=lambda stats: getattr(stats, sort), reverse=True)
+        if limit is not None:
+            functions = functions[:limit]
+        lines = [
+            f"{'function':<40} {'steps':>8} {'cpu(ms)':>10} "
+            f"{'mean(us)':>10} {'max(us)':>10} {'suspended(s)':>12}",
+        ]
+        for s in functions:
+            lines.append(
+                f"{s.name[:40]:<40} {s.steps:>8} {s.step_time * 1e3:>10.3f} "
+                f"{s.mean_step_time * 1e6:>10.1f} "
+                f"{s.max_step_time * 1e6:>10.1f} {s.suspended_time:>12.3f}")
+        lines.append('')
+        lines.append(f"{'event':<40} {'waits':>8} {'suspended(s)':>12}")
+        events = sorted(
+            self.events.values(),
+            key=lambda stats: stats.suspended_time, reverse=True)
+        for s in events:
+            lines.append(
+                f"{s.name[:40]:<40} {s.waits:>8} {s.suspended_time:>12.3f}")
+        return '\n'.join(lines)
@@ -1,38 +1,311 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ('Sleep', 'Event', )
+__all__ = (
+    'Sleep', 'Event', 'enable_timer_wheel', 'disable_timer_wheel',
+    'enable_frame_budget', 'disable_frame_budget', 'RunInThread',
+    'RunInProcess', 'create_tween_engine', 'NextFrame', 'Frames',
+)
 
 from functools import partial
+from weakref import WeakKeyDictionary, ref
 
 from pyglet import clock
 schedule_once = clock.schedule_once
+unschedule = clock.unschedule
+from pyglet.event import EVENT_UNHANDLED, EventDispatcher
 
 from . import EventBase
+from .timerwheel import TimerWheel
+from .framebudget import FrameBudget
+from .frames import FrameClock, FramesBase
+from .offload import RunInThreadBase, RunInProcessBase
+
+_timer_wheel = None
+_frame_budget = None
+
+
+def enable_timer_wheel(resolution=1 / 60):
+    '''以降のSleepが個別にclock.schedule_once()する代わりに、resolution秒毎に
+    動く一つのtimerを共有するようにする'''
+    global _timer_wheel
+
+    def start_ticking(tick):
+        clock.schedule_interval(tick, resolution)
+        return tick
+    _timer_wheel = TimerWheel(
+        resolution, start_ticking=start_ticking, stop_ticking=unschedule)
+
+
+def disable_timer_wheel():
+    global _timer_wheel
+    _timer_wheel = None
+
+
+def enable_frame_budget(budget=0.004):
+    '''以降のgeneratorの再開をqueueに溜め、1frameあたりbudget秒を使い切るまで
+    再開させ、残りは次のframeに持ち越すようにする。戻り値のFrameBudgetから再
+    開や持ち越しの数を得られる'''
+    global _frame_budget
+    disable_frame_budget()
+    _frame_budget = FrameBudget(
+        budget,
+        schedule_drain=lambda drain: schedule_once(drain, 0),
+    )
+    _frame_budget.enable()
+    return _frame_budget
+
+
+def disable_frame_budget():
+    '''溜まっている再開を全て行い、以降は再びすぐに再開させる'''
+    global _frame_budget
+    if _frame_budget is not None:
+        _frame_budget.disable()
+        _frame_budget = None
+
+
+def create_tween_engine():
+    '''tweenがある間clock.schedule()で毎frame進むTweenEngineを作る。numpyが
+    必要'''
+    from .tween import TweenEngine
+
+    def start_ticking(tick):
+        clock.schedule(tick)
+        return tick
+    return TweenEngine(start_ticking=start_ticking, stop_ticking=unschedule)
 
 
 class Sleep(EventBase):
     '''pyglet.clock.Clock.schedule_once()用のWrapper'''
 
+    __slots__ = ('seconds', 'scheduled', 'timer', )
+
     def __init__(self, seconds):
         super().__init__()
         self.seconds = seconds
+        self.scheduled = None
+        self.timer = None
 
     def __call__(self, resume_gen):
-        schedule_once(partial(resume_gen), self.seconds)
+        timer_wheel = _timer_wheel
+        if timer_wheel is None:
+            self.scheduled = scheduled = partial(resume_gen)
+            schedule_once(scheduled, self.seconds)
+        else:
+            self.timer = timer_wheel.add(self.seconds, resume_gen)
+
+    def cancel(self, resume_gen):
+        scheduled = self.scheduled
+        if scheduled is not None:
+            self.scheduled = None
+            unschedule(scheduled)
+        timer = self.timer
+        if timer is not None:
+            self.timer = None
+            timer.cancel()
+
+
+class _Multiplexer:
+    '''一つの(EventDispatcher, Event名)に一つだけhandlerをpushし、そのEventを
+    待っているEventたちに配る
+
+    待っているEventは値を使わないdictに順序付きの集合として入れておくので、追
+    加も取り除くのも待っている数によらない。Eventが起きると集合ごと新しい物と
+    入れ替えてから、待っていた順に再開させる。
+
+    pygletは上のframeのhandlerから順に呼び、EVENT_HANDLEDを返すhandlerが居る
+    とそこで止める。待っているEventが居なかった所へ最初のEventが加わる時に自分
+    のframeを積み直して、後からpushされたhandlerより先に呼ばれるようにする。そ
+    の時にpop_handlers()やset_handler()で外されていた場合も積み直される。
+
+    pygletはbound methodを弱参照でしか持たないので、handlerとしてこのobject自
+    身をpushする。これを持ち続けるのはEventDispatcherのhandler stackだけになる
+    ので、EventDispatcherが捨てられれば待っていたEventとgeneratorも一緒に回収
+    される。
+    '''
+
+    __slots__ = ('name', 'frame', 'waiters', '__weakref__', )
+
+    def __init__(self, name):
+        # EventDispatcherを強参照しないよう、edは覚えずにadd()の度に受け取る
+        self.name = name
+        # 自分がpushしたframe(handler stackの要素のdict)
+        self.frame = None
+        self.waiters = {}
+
+    def add(self, ed, event):
+        waiters = self.waiters
+        if not waiters:
+            self.remove_frame(ed)
+            ed.push_handlers(**{self.name: self})
+            self.frame = ed._event_stack[0]
+        waiters[event] = None
+
+    def remove_frame(self, ed):
+        frame = self.frame
+        if frame is None:
+            return
+        self.frame = None
+        # set_handler()で上書きされていたら、それはもう自分のhandlerではない
+        name = self.name
+        if frame.get(name) is not self:
+            return
+        del frame[name]
+        # 他のhandlerがset_handler()で足されていたらframeは残す
+        if frame:
+            return
+        stack = ed._event_stack
+        for i, f in enumerate(stack):
+            if f is frame:
+                del stack[i]
+                break
+
+    def __call__(self, *args, **kwargs):
+        waiters = self.waiters
+        if waiters:
+            self.waiters = {}
+            for event in waiters:
+                # 先に再開したgeneratorによって取り消されているかもしれない
+                if event.multiplexer is self:
+                    event.multiplexer = None
+                    event.resume_gen(*args, **kwargs)
+        # 待っていたgeneratorの有無に関わらずEventは握りつぶさず、下のhandler
+        # にも伝える
+        return EVENT_UNHANDLED
+
+
+# {EventDispatcher: {Event名: _Multiplexerへの弱参照}}。_Multiplexerは待って
+# いるEventを通してEventDispatcherを強参照するので、ここからは弱参照しか持たな
+# い
+_multiplexers = WeakKeyDictionary()
+
+
+def _get_multiplexer(ed, name):
+    '''弱参照を作れないEventDispatcherに対してはNoneを返す'''
+    try:
+        multiplexers = _multiplexers[ed]
+    except KeyError:
+        multiplexers = _multiplexers[ed] = {}
+    except TypeError:
+        return None
+    multiplexer_ref = multiplexers.get(name)
+    multiplexer = None if multiplexer_ref is None else multiplexer_ref()
+    if multiplexer is None:
+        multiplexer = _Multiplexer(name)
+        multiplexers[name] = ref(multiplexer)
+    return multiplexer
 
 
 class Event(EventBase):
-    '''pyglet.event.EventDispatcher用のWrapper'''
+    '''pyglet.event.EventDispatcher用のWrapper
+
+    同じ(EventDispatcher, Event名)を待つ全てのEventは、一つの共有のhandlerを
+    通して再開する。そのhandlerのframeは待っているEventが居なかった所へ待ち始め
+    る時にstackの一番上へ積み直され、それ以外の時は待つ事も取り消す事もhandler
+    stackを触らないので、待っている数が増えてもstackは深くならない。共有の
+    handlerはEVENT_UNHANDLEDを返すので、Eventは下のhandlerにも伝わる。同時に起
+    きた場合は待ち始めた順に再開する。
+    '''
+
+    # 共有のhandlerを使えない時はbound methodをpushするので__weakref__が要る
+    __slots__ = (
+        'ed', 'name', 'pushed', 'multiplexer', 'resume_gen', '__weakref__',
+    )
 
     def __init__(self, ed, name):
         super().__init__()
         self.ed = ed
         self.name = name
+        self.pushed = False
+        self.multiplexer = None
 
     def __call__(self, resume_gen):
         self.resume_gen = resume_gen
-        self.ed.push_handlers(**{self.name: self.callback})
+        multiplexer = _get_multiplexer(self.ed, self.name)
+        if multiplexer is None:
+            # 共有のhandlerを使えないので待つ度にpushする
+            self.pushed = True
+            self.ed.push_handlers(**{self.name: self.callback})
+        else:
+            self.multiplexer = multiplexer
+            multiplexer.add(self.ed, self)
 
     def callback(self, *args, **kwargs):
-        self.ed.remove_handler(self.name, self.callback)
+        self.remove_handler()
         self.resume_gen(*args, **kwargs)
+
+    def cancel(self, resume_gen):
+        multiplexer = self.multiplexer
+        if multiplexer is not None:
+            self.multiplexer = None
+            multiplexer.waiters.pop(self, None)
+        else:
+            self.remove_handler()
+
+    def remove_handler(self):
+        if self.pushed:
+            self.pushed = False
+            self.ed.remove_handler(self.name, self.callback)
+
+
+class _Waker(EventDispatcher):
+    '''他のthreadからpyglet.appのevent loopにcallbackを渡す為の物'''
+
+    def on_call_soon(self, callback):
+        callback()
+
+
+_Waker.register_event_type('on_call_soon')
+_waker = _Waker()
+
+
+class RunInThread(RunInThreadBase):
+    '''fn(*args, **kwargs)を共有のthread poolで実行し、終わったらそのFuture
+    を引数にして再開する
+
+    結果はpyglet.app.platform_event_loop.post_event()でGUIのthreadに戻すので、
+    pyglet.app.run()でevent loopを動かしている事。
+    '''
+
+    __slots__ = ()
+
+    def call_soon_threadsafe(self, callback):
+        from pyglet import app
+        # post_event()はどのthreadから呼んでも良い
+        app.platform_event_loop.post_event(_waker, 'on_call_soon', callback)
+
+
+class RunInProcess(RunInProcessBase, RunInThread):
+    '''fn(*args, **kwargs)を共有のprocess poolで実行し、終わったらそのFuture
+    を引数にして再開する'''
+
+    __slots__ = ()
+
+
+def _start_ticking(tick):
+    clock.schedule(tick)
+    return tick
+
+
+_frame_clock = FrameClock(
+    start_ticking=_start_ticking, stop_ticking=unschedule)
+
+
+class Frames(FramesBase):
+    '''n frame待つ。その間に経過した秒数を引数にして再開する
+
+    待っている全てのFramesはclock.schedule()した一つのcallbackを共有する。
+    '''
+
+    __slots__ = ()
+
+    def get_frame_clock(self):
+        return _frame_clock
+
+
+class NextFrame(Frames):
+    '''次のframeまで待つ。前のframeからの秒数を引数にして再開する'''
+
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__(1)
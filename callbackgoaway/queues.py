@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+
+'''generator同士で値を受け渡す為のQueue
+
+GUIライブラリに依らない。値が入ればそれを待っていたgeneratorはすぐに再開す
+るので、Sleep(0)で様子を見続ける必要は無い。容量を決めておけば、一杯の間は
+putしたgeneratorが停まる。
+
+    queue = Queue(capacity=10)
+
+    def producer():
+        while True:
+            yield queue.put(make_item())
+
+    def consumer():
+        while True:
+            param = yield queue.get()
+            item = param.args[0]
+'''
+
+__all__ = ('Queue', 'QueueEmpty', 'QueueFull', )
+
+from collections import deque
+
+from . import EventBase, _WaiterQueue
+
+
+class QueueEmpty(Exception):
+    '''空のQueueからget_nowait()しようとした'''
+
+
+class QueueFull(Exception):
+    '''一杯のQueueにput_nowait()しようとした'''
+
+
+class Queue:
+    '''FIFOのQueue。capacityがNoneなら容量に限りは無い'''
+
+    __slots__ = ('capacity', '_items', '_getters', '_putters', )
+
+    def __init__(self, capacity=None):
+        if capacity is not None and capacity < 1:
+            raise ValueError("'capacity' must be at least 1")
+        self.capacity = capacity
+        self._items = deque()
+        self._getters = _WaiterQueue()
+        self._putters = _WaiterQueue()
+
+    def __len__(self):
+        '''入っている値の数'''
+        return len(self._items)
+
+    @property
+    def empty(self):
+        return not self._items
+
+    @property
+    def full(self):
+        capacity = self.capacity
+        return capacity is not None and len(self._items) >= capacity
+
+    def put(self, item):
+        '''itemを入れるEvent。一杯なら空きが出来るまで待つ'''
+        return _Put(self, item)
+
+    def get(self):
+        '''値を一つ取り出すEvent。取り出した値を引数にして再開する'''
+        return _Get(self)
+
+    def get_many(self, max_items=None):
+        '''入っている値をmax_items個まで(Noneなら全て)まとめて取り出すEvent
+
+        取り出した値のlistを引数にして再開する。空なら値が入るまで待つので、
+        listが空になる事は無い。
+        '''
+        return _GetMany(self, max_items)
+
+    def put_nowait(self, item):
+        '''generatorの外からでも使えるput()。一杯ならQueueFullを送出する'''
+        if self._hand_over(item):
+            return
+        if self.full:
+            raise QueueFull()
+        self._items.append(item)
+
+    def get_nowait(self):
+        '''generatorの外からでも使えるget()。空ならQueueEmptyを送出する'''
+        items = self._items
+        if not items:
+            raise QueueEmpty()
+        item = items.popleft()
+        self._accept_putters()
+        return item
+
+    def _hand_over(self, item):
+        # 待っているgetterが居るなら(その時は必ず空なので)直接渡す
+        getter = self._getters.popleft()
+        if getter is None:
+            return False
+        resume_gen = getter.resume_gen
+        getter.resume_gen = None
+        getter.granted = True
+        getter.item = item
+        resume_gen(getter.wrap(item))
+        return True
+
+    def _accept_putters(self):
+        # 空きが出来た分だけ待っているputterの値を受け入れ、再開させる
+        putters = self._putters
+        items = self._items
+        while putters and not self.full:
+            putter = putters.popleft()
+            items.append(putter.item)
+            resume_gen = putter.resume_gen
+            putter.resume_gen = None
+            putter.granted = True
+            resume_gen()
+
+
+class _Put(EventBase):
+
+    __slots__ = ('queue', 'item', 'resume_gen', 'granted', )
+
+    def __init__(self, queue, item):
+        super().__init__()
+        self.queue = queue
+        self.item = item
+        self.resume_gen = None
+        # 待っている間に値を受け入れられた。再開がrun queueで後回しにされてい
+        # ると、generatorが受け取る前に取り消される事がある
+        self.granted = False
+
+    def __call__(self, resume_gen):
+        queue = self.queue
+        if queue._hand_over(self.item):
+            resume_gen()
+        elif queue.full:
+            self.resume_gen = resume_gen
+            queue._putters.append(self)
+        else:
+            queue._items.append(self.item)
+            resume_gen()
+
+    def cancel(self, resume_gen):
+        if not self.granted:
+            self.queue._putters.cancel(self)
+            return
+        # 受け入れられた事がgeneratorに届かなかったので値を取り除く。既に取り
+        # 出されていれば届いた物とする
+        self.granted = False
+        queue = self.queue
+        items = queue._items
+        for i, item in enumerate(items):
+            if item is self.item:
+                del items[i]
+                queue._accept_putters()
+                return
+
+
+class _Get(EventBase):
+
+    __slots__ = ('queue', 'resume_gen', 'granted', 'item', )
+
+    def __init__(self, queue):
+        super().__init__()
+        self.queue = queue
+        self.resume_gen = None
+        # 待っている間に値を渡された(Putの物と同じ)。渡された値はitemに持つ
+        self.granted = False
+        self.item = None
+
+    def __call__(self, resume_gen):
+        queue = self.queue
+        if queue._items:
+            value = self.take(queue._items)
+            queue._accept_putters()
+            resume_gen(value)
+        else:
+            self.resume_gen = resume_gen
+            queue._getters.append(self)
+
+    def take(self, items):
+        return items.popleft()
+
+    def wrap(self, item):
+        return item
+
+    def cancel(self, resume_gen):
+        if not self.granted:
+            self.queue._getters.cancel(self)
+            return
+        # 渡された値がgeneratorに届かなかったので、次のgetterに渡すか先頭に
+        # 戻す
+        self.granted = False
+        item = self.item
+        self.item = None
+        queue = self.queue
+        if not queue._hand_over(item):
+            queue._items.appendleft(item)
+
+
+class _GetMany(_Get):
+
+    __slots__ = ('max_items', )
+
+    def __init__(self, queue, max_items):
+        super().__init__(queue)
+        self.max_items = max_items
+
+    def take(self, items):
+        max_items = self.max_items
+        if max_items is None or max_items >= len(items):
+            taken = list(items)
+            items.clear()
+            return taken
+        popleft = items.popleft
+        return [popleft() for __ in range(max_items)]
+
+    def wrap(self, item):
+        return [item]
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+
+'''停まったまま終わらないgeneratorを見つける為のregistry
+
+Hooksを使って生きているgeneratorを弱参照で記録し、それぞれがどの型のEventを
+いつから待っているかを調べられるようにする。snapshot()同士のdiff()を取れば、
+長時間の試験の間に溜まっていくgeneratorを見つけられる。
+
+    registry = Registry()
+    registry.enable()
+    before = registry.snapshot()
+    ...
+    for coro in registry.snapshot().diff(before):
+        print(coro.name, coro.event_type, coro.waiting_for,
+              coro.retained_size)
+'''
+
+__all__ = ('Registry', 'Snapshot', 'LiveCoroutine', )
+
+import sys
+from collections import namedtuple
+from itertools import count
+from time import perf_counter
+from weakref import ref
+
+from . import _RecordingHooks
+
+LiveCoroutine = namedtuple('LiveCoroutine', (
+    'serial', 'name', 'event_type', 'event', 'waiting_for', 'retained_size',
+    'gen_ref',
+))
+LiveCoroutine.__doc__ = '''snapshot()を取った時点で生きていたgenerator一つ分の情報
+
+serial: registryが付けた通し番号。idと違って使い回されない
+name: generator関数の__qualname__
+event_type: 待っているEventの型。進んでいる最中ならNone
+event: 待っているEvent。弱参照を作れないEventの時はNone
+waiting_for: Eventを待ち始めてからの秒数
+retained_size: generatorのframeの局所変数と(eventが分かる時は)eventが抱えて
+    いるおおよそのbyte数
+gen_ref: generatorへの弱参照
+'''
+
+
+class Snapshot:
+    '''ある時点で生きていたgeneratorたち'''
+
+    __slots__ = ('taken_at', 'coroutines', )
+
+    def __init__(self, taken_at, coroutines):
+        self.taken_at = taken_at
+        # {serial: LiveCoroutine}
+        self.coroutines = coroutines
+
+    def __len__(self):
+        return len(self.coroutines)
+
+    def __iter__(self):
+        return iter(self.coroutines.values())
+
+    @property
+    def retained_size(self):
+        return sum(c.retained_size for c in self.coroutines.values())
+
+    def diff(self, earlier):
+        '''earlierの後に開始されて、まだ生きているgeneratorのlistを返す'''
+        old = earlier.coroutines
+        return [c for serial, c in self.coroutines.items()
+                if serial not in old]
+
+    def by_name(self):
+        '''{generator関数名: 生きている数}'''
+        counts = {}
+        for c in self.coroutines.values():
+            counts[c.name] = counts.get(c.name, 0) + 1
+        return counts
+
+
+def _estimate_size(gen, event):
+    getsizeof = sys.getsizeof
+    size = getsizeof(gen)
+    frame = gen.gi_frame
+    if frame is not None:
+        size += getsizeof(frame)
+        for value in frame.f_locals.values():
+            size += getsizeof(value)
+    if event is not None:
+        size += getsizeof(event)
+        slots = getattr(type(event), '__slots__', ())
+        for name in ((slots, ) if isinstance(slots, str) else slots):
+            value = getattr(event, name, None)
+            if value is not None:
+                size += getsizeof(value)
+    return size
+
+
+class Registry(_RecordingHooks):
+    '''生きているgeneratorを記録するHooks
+
+    generatorは弱参照で持つので、registryがあってもgeneratorの寿命は変わらな
+    い。待っているEventはresume_genを通してgeneratorを強参照するので、Eventも
+    型と弱参照(作れる時だけ)しか持たない。有効にする前に開始されていたgeneratorも、次に再開された時から記録され
+    る。
+    '''
+
+    __slots__ = ('clock', '_serials', )
+
+    def __init__(self, *, clock=perf_counter):
+        # _liveにはgenerator毎に [通し番号, 待っているEventの型, Eventへの弱
+        # 参照, 待ち始めた時刻] を記録する
+        super().__init__()
+        self.clock = clock
+        self._serials = count()
+
+    def __len__(self):
+        return len(self._live)
+
+    def _new_record(self, gen):
+        return [next(self._serials), None, None, None]
+
+    def on_spawn(self, gen):
+        self._record(gen)
+
+    def on_resume(self, gen):
+        record = self._record(gen)
+        record[1] = record[2] = record[3] = None
+
+    def on_suspend(self, gen, event):
+        record = self._record(gen)
+        record[1] = type(event)
+        try:
+            record[2] = ref(event)
+        except TypeError:
+            record[2] = None
+        record[3] = self.clock()
+
+    def on_finish(self, gen):
+        self._live.pop(gen, None)
+
+    def snapshot(self):
+        now = self.clock()
+        coroutines = {}
+        for gen, record in list(self._live.items()):
+            serial, event_type, event_ref, suspended_at = record
+            event = None if event_ref is None else event_ref()
+            coroutines[serial] = LiveCoroutine(
+                serial, gen.__qualname__, event_type, event,
+                0. if suspended_at is None else now - suspended_at,
+                _estimate_size(gen, event), ref(gen),
+            )
+        return Snapshot(now, coroutines)
@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+
+'''多数のSleepを一つのtoolkitのtimerでまとめて扱う為の階層型timer wheel
+
+各backendの enable_timer_wheel() を呼ぶと、そのbackendのSleepはtoolkitに個別
+にtimerを登録する代わりにここに登録されるようになる。wheelはresolution秒毎に
+動く一つのtoolkitのtimerで時間を進め、期限を迎えたtimerをまとめて呼ぶ。その為
+Sleepの精度はresolution程度に落ちる。
+'''
+
+__all__ = ('TimerWheel', 'WheelTimer', )
+
+from math import ceil
+from time import perf_counter
+
+
+class WheelTimer:
+    '''TimerWheel.add()が返すhandle'''
+
+    __slots__ = ('wheel', 'deadline', 'callback', 'scheduled_at', )
+
+    def __init__(self, wheel, deadline, callback, scheduled_at):
+        self.wheel = wheel
+        self.deadline = deadline
+        self.callback = callback
+        self.scheduled_at = scheduled_at
+
+    def cancel(self):
+        # slotからはすぐには取り除かず、順番が回ってきた時に捨てる
+        if self.callback is not None:
+            self.callback = None
+            self.wheel._num_alive -= 1
+
+
+class TimerWheel:
+    '''階層型timer wheel
+
+    時間はresolution秒を1tickとして数える。level 0は1tick幅のslotを
+    slots_per_level個、level 1はslots_per_level tick幅のslotを
+    slots_per_level個...と持ち、遠い期限のtimerは上のlevelに置かれ、期限が
+    近づくにつれて下のlevelへ移される。なのでtimerの追加, 取り消し, 1tick分の
+    時間経過はどれもtimerの数によらない。
+
+    start_ticking(tick)はtickをresolution秒毎に呼ぶtoolkitのtimerを開始してそ
+    のhandleを返す関数、stop_ticking(handle)はそれを止める関数。timerが無い間
+    はtoolkitのtimerは止めておく。
+    pass_elapsedが真ならtimerのcallbackには登録してから実際に経過した秒数を渡
+    す。
+    '''
+
+    __slots__ = (
+        'resolution', 'pass_elapsed', '_now', '_start_ticking',
+        '_stop_ticking', '_ticking', '_origin', '_tick', '_levels', '_bits',
+        '_mask', '_max_span', '_num_alive',
+    )
+
+    def __init__(self, resolution, *, start_ticking, stop_ticking,
+                 pass_elapsed=True, now=perf_counter, slots_per_level=64,
+                 num_levels=4):
+        if slots_per_level & (slots_per_level - 1):
+            raise ValueError("'slots_per_level' must be a power of 2")
+        super().__init__()
+        self.resolution = resolution
+        self.pass_elapsed = pass_elapsed
+        self._now = now
+        self._start_ticking = start_ticking
+        self._stop_ticking = stop_ticking
+        self._ticking = None
+        self._origin = now()
+        self._tick = 0
+        self._levels = [[[] for __ in range(slots_per_level)]
+                        for __ in range(num_levels)]
+        self._bits = slots_per_level.bit_length() - 1
+        self._mask = slots_per_level - 1
+        self._max_span = slots_per_level ** num_levels
+        self._num_alive = 0
+
+    def __len__(self):
+        return self._num_alive
+
+    def add(self, delay, callback):
+        '''delay秒後(の後の最初のtick)にcallbackを呼ぶ'''
+        now = self._now()
+        if self._ticking is None:
+            self._resync(now)
+            self._ticking = self._start_ticking(self.tick)
+        deadline = max(
+            self._tick + 1,
+            ceil((now + delay - self._origin) / self.resolution),
+        )
+        timer = WheelTimer(self, deadline, callback, now)
+        self._insert(timer)
+        self._num_alive += 1
+        return timer
+
+    def tick(self, *args):
+        '''toolkitのtimerから呼ばれる。期限を迎えたtimerをまとめて呼ぶ'''
+        now = self._now()
+        target = int((now - self._origin) / self.resolution)
+        expired = []
+        while self._tick < target and self._num_alive:
+            self._tick += 1
+            self._advance(expired)
+        if self._tick < target:
+            # 生きているtimerが無いなら一気に進めてよい
+            self._tick = target
+        pass_elapsed = self.pass_elapsed
+        for timer in expired:
+            # 先に呼ばれたcallbackによって取り消されているかもしれない
+            callback = timer.callback
+            if callback is None:
+                continue
+            timer.callback = None
+            self._num_alive -= 1
+            if pass_elapsed:
+                callback(now - timer.scheduled_at)
+            else:
+                callback()
+        if not self._num_alive and self._ticking is not None:
+            self._stop_ticking(self._ticking)
+            self._ticking = None
+
+    def _resync(self, now):
+        # 止まっている間にslotに残った取り消し済みのtimerを捨て、時間を合わせる
+        for level in self._levels:
+            for slot in level:
+                slot.clear()
+        self._origin = now
+        self._tick = 0
+
+    def _insert(self, timer):
+        tick = self._tick
+        bits = self._bits
+        deadline = timer.deadline
+        # 遠すぎる期限は一番上のlevelの届く範囲に仮置きし、下りてくる度に置き
+        # 直す
+        place = min(deadline, tick + self._max_span - 1)
+        delta = place - tick
+        level = 0
+        while delta >> (bits * (level + 1)):
+            level += 1
+        self._levels[level][(place >> (bits * level)) & self._mask] \
+            .append(timer)
+
+    def _advance(self, expired):
+        tick = self._tick
+        bits = self._bits
+        mask = self._mask
+        levels = self._levels
+        # level 0が一周したら上のlevelの次のslotの中身を下ろす
+        level = 0
+        while not (tick >> (bits * level)) & mask and level + 1 < len(levels):
+            level += 1
+            slot = levels[level][(tick >> (bits * level)) & mask]
+            timers = slot[:]
+            slot.clear()
+            for timer in timers:
+                if timer.callback is not None:
+                    self._insert(timer)
+        slot = levels[0][tick & mask]
+        timers = slot[:]
+        slot.clear()
+        for timer in timers:
+            if timer.callback is None:
+                continue
+            if timer.deadline <= tick:
+                expired.append(timer)
+            else:
+                self._insert(timer)
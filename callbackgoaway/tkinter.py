@@ -1,41 +1,346 @@
 # -*- coding: utf-8 -*-
 
-__all__ = ('Sleep', 'Event', 'patch_unbind')
+__all__ = (
+    'Sleep', 'Event', 'patch_unbind', 'enable_timer_wheel',
+    'disable_timer_wheel', 'enable_frame_budget', 'disable_frame_budget',
+    'RunInThread', 'RunInProcess', 'create_tween_engine', 'NextFrame',
+    'Frames',
+)
 
+from queue import SimpleQueue, Empty
+from time import perf_counter
+from weakref import WeakKeyDictionary, ref
 
 from . import EventBase
+from .timerwheel import TimerWheel
+from .framebudget import FrameBudget
+from .frames import FrameClock, FramesBase
+from .offload import RunInThreadBase, RunInProcessBase
+
+_timer_wheel = None
+_frame_budget = None
+
+
+class _Ticker:
+    '''widget.after()を繰り返してtickをmilliseconds毎に呼ぶ'''
+
+    __slots__ = ('widget', 'milliseconds', 'tick', 'after_id', )
+
+    def __init__(self, widget, milliseconds):
+        self.widget = widget
+        self.milliseconds = milliseconds
+        self.tick = None
+        self.after_id = None
+
+    def start(self, tick):
+        self.tick = tick
+        self.after_id = self.widget.after(self.milliseconds, self.on_timer)
+        return self
+
+    def on_timer(self):
+        self.after_id = self.widget.after(self.milliseconds, self.on_timer)
+        self.tick()
+
+    def stop(self, __):
+        after_id = self.after_id
+        if after_id is not None:
+            self.after_id = None
+            self.widget.after_cancel(after_id)
+
+
+def enable_timer_wheel(widget, milliseconds=16):
+    '''以降のSleepが個別にwidget.after()する代わりに、milliseconds毎に動く一つ
+    のtimerを共有するようにする。timerにはwidgetのafter()を使う'''
+    global _timer_wheel
+    ticker = _Ticker(widget, milliseconds)
+    _timer_wheel = TimerWheel(
+        milliseconds,
+        start_ticking=ticker.start,
+        stop_ticking=ticker.stop,
+        pass_elapsed=False,
+        now=lambda: perf_counter() * 1000,
+    )
+
+
+def disable_timer_wheel():
+    global _timer_wheel
+    _timer_wheel = None
+
+
+def enable_frame_budget(widget, milliseconds=4):
+    '''以降のgeneratorの再開をqueueに溜め、widgetのafter_idle()で呼ばれる度に
+    millisecondsミリ秒を使い切るまで再開させ、残りは次に持ち越すようにする。
+    戻り値のFrameBudgetから再開や持ち越しの数を得られる'''
+    global _frame_budget
+    disable_frame_budget()
+    _frame_budget = FrameBudget(
+        milliseconds,
+        schedule_drain=widget.after_idle,
+        now=lambda: perf_counter() * 1000,
+    )
+    _frame_budget.enable()
+    return _frame_budget
+
+
+def disable_frame_budget():
+    '''溜まっている再開を全て行い、以降は再びすぐに再開させる'''
+    global _frame_budget
+    if _frame_budget is not None:
+        _frame_budget.disable()
+        _frame_budget = None
+
+
+def create_tween_engine(widget, milliseconds=16):
+    '''tweenがある間widget.after()でmillisecondsミリ秒毎に進むTweenEngineを作
+    る。tweenの長さはミリ秒で表す。numpyが必要'''
+    from .tween import TweenEngine
+    ticker = _Ticker(widget, milliseconds)
+    return TweenEngine(
+        start_ticking=ticker.start,
+        stop_ticking=ticker.stop,
+        now=lambda: perf_counter() * 1000,
+    )
 
 
 class Sleep(EventBase):
     '''tkinterのwidgetのafter()用のWrapper'''
 
+    __slots__ = ('widget', 'milliseconds', 'after_id', 'timer', )
+
     def __init__(self, widget, milliseconds):
         super().__init__()
         self.widget = widget
         self.milliseconds = milliseconds
+        self.after_id = None
+        self.timer = None
 
     def __call__(self, resume_gen):
-        self.widget.after(self.milliseconds, resume_gen)
+        timer_wheel = _timer_wheel
+        if timer_wheel is None:
+            self.after_id = self.widget.after(self.milliseconds, resume_gen)
+        else:
+            self.timer = timer_wheel.add(self.milliseconds, resume_gen)
+
+    def cancel(self, resume_gen):
+        after_id = self.after_id
+        if after_id is not None:
+            self.after_id = None
+            self.widget.after_cancel(after_id)
+        timer = self.timer
+        if timer is not None:
+            self.timer = None
+            timer.cancel()
+
+
+class _Multiplexer:
+    '''一つの(widget, sequence)に一つだけcallbackをbindし、そのEventを待って
+    いるEventたちに配る
+
+    待っているEventは値を使わないdictに順序付きの集合として入れておくので、追
+    加も取り除くのも待っている数によらない。Eventが起きると集合ごと新しい物と
+    入れ替えてから、待っていた順に再開させる。
+
+    '+'無しのbind()やunbind(sequence)はsequenceのbindingを丸ごと置き換えるの
+    で、共有のcallbackも一緒に外れてしまう。なので待っているEventが居なかった
+    所へ最初のEventが加わる時だけ、Tclのbinding scriptに自分のcommandが残って
+    いるかを確かめ、無ければbindし直す。それ以外の時は待つ事もTclを触らない。
+    '''
+
+    __slots__ = ('name', 'funcid', 'waiters', '__weakref__', )
+
+    def __init__(self, name):
+        # widgetを強参照しないよう、widgetは覚えずにadd()の度に受け取る
+        self.name = name
+        self.funcid = None
+        self.waiters = {}
+
+    def add(self, widget, event):
+        waiters = self.waiters
+        if not waiters:
+            name = self.name
+            funcid = self.funcid
+            if funcid is None or funcid not in widget.bind(name):
+                if funcid is not None:
+                    # 外されたbindingのcommandはTclに残ったままなので消す
+                    widget.deletecommand(funcid)
+                self.funcid = widget.bind(name, self.dispatch, '+')
+        waiters[event] = None
+
+    def dispatch(self, event):
+        waiters = self.waiters
+        if not waiters:
+            return
+        self.waiters = {}
+        for e in waiters:
+            # 先に再開したgeneratorによって取り消されているかもしれない
+            if e.multiplexer is self:
+                e.multiplexer = None
+                e.resume_gen(event)
+
+
+# {widget: {sequence: _Multiplexerへの弱参照}}。_Multiplexerは待っているEvent
+# を通してwidgetを強参照するので、ここからは弱参照しか持たない。_Multiplexerを
+# 持ち続けるのはbind()で登録されたTclのcommandで、widgetが破棄されると一緒に消
+# される
+_multiplexers = WeakKeyDictionary()
+
+
+def _get_multiplexer(widget, name):
+    '''弱参照を作れないwidgetに対してはNoneを返す'''
+    try:
+        multiplexers = _multiplexers[widget]
+    except KeyError:
+        multiplexers = _multiplexers[widget] = {}
+    except TypeError:
+        return None
+    multiplexer_ref = multiplexers.get(name)
+    multiplexer = None if multiplexer_ref is None else multiplexer_ref()
+    if multiplexer is None:
+        # 利用者が自分のcallbackをunbind()した時に共有のcallbackまで外れて、
+        # 待っているgeneratorが再開しなくならないようにする
+        patch_unbind()
+        multiplexer = _Multiplexer(name)
+        multiplexers[name] = ref(multiplexer)
+    return multiplexer
 
 
 class Event(EventBase):
-    '''tkinterのwidgetのbind()用のWrapper'''
+    '''tkinterのwidgetのbind()用のWrapper
+
+    同じ(widget, sequence)を待つ全てのEventは、unbindされない共有のcallbackを
+    通して再開する。Tclを触るのは誰も待っていなかった所へ待ち始める時にその
+    bindingが残っているかを確かめる時だけで、外されていればbindし直す。待ち始
+    める時にはpatch_unbind()を当てる。同時に起きた場合は待ち始めた順に再開す
+    る。
+    '''
+
+    __slots__ = ('widget', 'name', 'bind_id', 'multiplexer', 'resume_gen', )
 
     def __init__(self, widget, name):
         super().__init__()
         self.bind_id = None
+        self.multiplexer = None
         self.widget = widget
         self.name = name
 
     def __call__(self, resume_gen):
         assert self.bind_id is None  # You can't re-use this instance
-        self.bind_id = self.widget.bind(self.name, self.callback, '+')
+        self.bind_id = ''
         self.resume_gen = resume_gen
+        widget = self.widget
+        name = self.name
+        multiplexer = _get_multiplexer(widget, name)
+        if multiplexer is None:
+            # 共有のcallbackを使えないので待つ度にbindする。このcallbackを
+            # unbind()した時に他のcallbackまで外れないようpatchを当てておく
+            patch_unbind()
+            self.bind_id = widget.bind(name, self.callback, '+')
+        else:
+            self.multiplexer = multiplexer
+            multiplexer.add(widget, self)
 
     def callback(self, event):
-        self.widget.unbind(self.name, self.bind_id)
+        self.unbind()
         self.resume_gen(event)
 
+    def cancel(self, resume_gen):
+        multiplexer = self.multiplexer
+        if multiplexer is not None:
+            self.multiplexer = None
+            multiplexer.waiters.pop(self, None)
+        else:
+            self.unbind()
+
+    def unbind(self):
+        bind_id = self.bind_id
+        if bind_id:
+            # 空文字にしておく事で再利用の禁止と二重のunbindの防止を兼ねる
+            self.bind_id = ''
+            self.widget.unbind(self.name, bind_id)
+
+
+class _Poller:
+    '''他のthreadから渡されたcallbackを、widget.after()で定期的に取り出して
+    呼ぶ
+
+    tkinterは他のthreadから触れないので、callbackは一旦thread-safeなqueueに入
+    れる。待っているRunInThreadが無い間はafter()を止めておく。
+    '''
+
+    __slots__ = ('queue', 'num_waiting', 'widget', 'after_id', )
+
+    def __init__(self):
+        self.queue = SimpleQueue()
+        self.num_waiting = 0
+        self.widget = None
+        self.after_id = None
+
+    def add(self, widget):
+        self.num_waiting += 1
+        if self.after_id is None:
+            self.widget = widget
+            self.after_id = widget.after(POLL_INTERVAL, self.poll)
+
+    def remove(self):
+        self.num_waiting -= 1
+
+    def poll(self):
+        self.after_id = None
+        get_nowait = self.queue.get_nowait
+        try:
+            while True:
+                try:
+                    callback = get_nowait()
+                except Empty:
+                    break
+                callback()
+        finally:
+            if self.num_waiting and self.after_id is None:
+                self.after_id = self.widget.after(POLL_INTERVAL, self.poll)
+
+
+# RunInThreadの結果を調べる間隔(ミリ秒)
+POLL_INTERVAL = 10
+_poller = _Poller()
+
+
+class RunInThread(RunInThreadBase):
+    '''fn(*args, **kwargs)を共有のthread poolで実行し、終わったらそのFuture
+    を引数にして再開する
+
+    結果はPOLL_INTERVALミリ秒毎にwidget.after()で調べる。
+    '''
+
+    __slots__ = ('widget', )
+
+    def __init__(self, widget, fn, *args, **kwargs):
+        super().__init__(fn, *args, **kwargs)
+        self.widget = widget
+
+    def __call__(self, resume_gen):
+        super().__call__(resume_gen)
+        _poller.add(self.widget)
+
+    def call_soon_threadsafe(self, callback):
+        _poller.queue.put(callback)
+
+    def _resume(self, future, *args):
+        if self.future is future:
+            _poller.remove()
+        super()._resume(future)
+
+    def cancel(self, resume_gen):
+        if self.future is not None:
+            _poller.remove()
+        super().cancel(resume_gen)
+
+
+class RunInProcess(RunInProcessBase, RunInThread):
+    '''fn(*args, **kwargs)を共有のprocess poolで実行し、終わったらそのFuture
+    を引数にして再開する'''
+
+    __slots__ = ()
+
 
 _old_unbind = None
 
@@ -53,9 +358,54 @@ def _new_unbind(self, sequence, funcid=None):
 
 
 def patch_unbind():
+    '''Misc.unbind()がfuncidを指定しても全てのcallbackを外してしまう不具合を
+    直す
+
+    利用者が自分でbindしたcallbackをunbind()した時に、Eventの共有のcallback
+    まで外してしまわないよう、Eventは待ち始める時にこのpatchを当てる。
+    '''
     from tkinter import Misc
 
     global _old_unbind
     if _old_unbind is None:
         _old_unbind = Misc.unbind
         Misc.unbind = _new_unbind
+
+
+# Framesにとっての1frameの長さ(ミリ秒)
+FRAME_INTERVAL = 16
+_frame_ticker = _Ticker(None, FRAME_INTERVAL)
+_frame_clock = FrameClock(
+    start_ticking=_frame_ticker.start,
+    stop_ticking=_frame_ticker.stop,
+    now=lambda: perf_counter() * 1000,
+)
+
+
+class Frames(FramesBase):
+    '''n frame待つ。その間に経過したミリ秒数を引数にして再開する
+
+    tkinterにframeは無いので、FRAME_INTERVALミリ秒毎にwidget.after()で動く一
+    つのtimerを全てのFramesで共有し、その一回を1frameとする。
+    '''
+
+    __slots__ = ('widget', )
+
+    def __init__(self, widget, n):
+        super().__init__(n)
+        self.widget = widget
+
+    def get_frame_clock(self):
+        if not _frame_clock.ticking:
+            # timerはその時に待ち始めたwidgetのafter()で動かす
+            _frame_ticker.widget = self.widget
+        return _frame_clock
+
+
+class NextFrame(Frames):
+    '''次のframeまで待つ。前のframeからのミリ秒数を引数にして再開する'''
+
+    __slots__ = ()
+
+    def __init__(self, widget):
+        super().__init__(widget, 1)
@@ -0,0 +1,365 @@
+# -*- coding: utf-8 -*-
+
+'''多数の値のtweenをnumpyの配列でまとめて計算するengine
+
+kivy.animation.Animationの様にtween一つ毎にobjectとcallbackを持つと、値が何
+千個もある時にはframe毎のPythonの処理が重くなる。TweenEngineは動いている全て
+のtweenの開始値, 終了値, 経過時間, 長さ, easingの番号をnumpyの配列に入れてお
+き、frame毎に一度の配列演算で全ての値を求め、書き込み先のnumpyの配列へまとめ
+て書き戻す。generatorはTweenをyieldすればtweenが終わるまで待てる。
+
+numpyが必要。
+'''
+
+__all__ = ('TweenEngine', 'Tween', 'EASINGS', )
+
+from time import perf_counter
+
+import numpy
+
+from . import EventBase
+
+
+def _in_out(f):
+    # 前半はfを、後半はそれを反転させた物を使う
+    def in_out(t):
+        return numpy.where(t < .5, f(t * 2) / 2, 1 - f((1 - t) * 2) / 2)
+    return in_out
+
+
+def _in_quad(t):
+    return t * t
+
+
+def _in_cubic(t):
+    return t * t * t
+
+
+def _in_sine(t):
+    return 1 - numpy.cos(t * (numpy.pi / 2))
+
+
+# {easingの名前: t(0から1の配列)を進み具合に写す関数}。順番がeasingの番号
+EASINGS = {
+    'linear': lambda t: t,
+    'in_quad': _in_quad,
+    'out_quad': lambda t: 1 - _in_quad(1 - t),
+    'in_out_quad': _in_out(_in_quad),
+    'in_cubic': _in_cubic,
+    'out_cubic': lambda t: 1 - _in_cubic(1 - t),
+    'in_out_cubic': _in_out(_in_cubic),
+    'in_sine': _in_sine,
+    'out_sine': lambda t: 1 - _in_sine(1 - t),
+    'in_out_sine': _in_out(_in_sine),
+}
+_EASING_IDS = {name: i for i, name in enumerate(EASINGS)}
+_EASING_FUNCS = tuple(EASINGS.values())
+
+
+def _ravel_index(index, shape):
+    '''添字のtupleをflatな位置に直す'''
+    if len(index) != len(shape) or \
+            not all(isinstance(i, int) for i in index):
+        return numpy.ravel_multi_index(index, shape)
+    flat = 0
+    for i, dim in zip(index, shape):
+        if i < 0:
+            i += dim
+        if not 0 <= i < dim:
+            raise IndexError(f"index {index} is out of bounds for {shape}")
+        flat = flat * dim + i
+    return flat
+
+
+class _Group:
+    '''一度のadd()で加えたtweenたち。全て終わったらcallbackを呼ぶ'''
+
+    __slots__ = ('callback', 'remaining', 'slots', )
+
+    def __init__(self, callback, slots):
+        self.callback = callback
+        self.remaining = len(slots)
+        self.slots = slots
+
+
+class TweenEngine:
+    '''動いている全てのtweenを配列で持ち、frame毎にまとめて進める
+
+    start_ticking(tick)はtickをframe毎に呼ぶtoolkitのtimerを開始してその
+    handleを返す関数、stop_ticking(handle)はそれを止める関数。tweenが無い間
+    はtoolkitのtimerは止めておく。durationとnow()の単位は揃える事。
+    '''
+
+    __slots__ = (
+        '_start_ticking', '_stop_ticking', '_now', '_ticking', '_last',
+        '_size', '_free', '_groups', '_targets', '_target_ids',
+        '_target_counts', '_start', '_end', '_elapsed', '_duration',
+        '_easing', '_target', '_index', '_alive',
+    )
+
+    def __init__(self, *, start_ticking, stop_ticking, now=perf_counter,
+                 capacity=64):
+        self._start_ticking = start_ticking
+        self._stop_ticking = stop_ticking
+        self._now = now
+        self._ticking = None
+        self._last = None
+        # 使った事のあるslotの数。配列の[:_size]だけを計算する
+        self._size = 0
+        self._free = []
+        # slot毎の_Group
+        self._groups = []
+        # 書き込み先の配列とその番号。番号はtweenが一つも無くなったら再利用す
+        # る
+        self._targets = {}
+        self._target_ids = {}
+        self._target_counts = {}
+        self._start = numpy.empty(capacity)
+        self._end = numpy.empty(capacity)
+        self._elapsed = numpy.empty(capacity)
+        self._duration = numpy.empty(capacity)
+        self._easing = numpy.empty(capacity, dtype=numpy.intp)
+        self._target = numpy.empty(capacity, dtype=numpy.intp)
+        self._index = numpy.empty(capacity, dtype=numpy.intp)
+        self._alive = numpy.zeros(capacity, dtype=bool)
+
+    def __len__(self):
+        '''動いているtweenの数'''
+        return self._size - len(self._free)
+
+    def add(self, target, index, end, duration, *, easing='linear',
+            start=None, callback=None):
+        '''target(numpyの配列)のindexの位置の値をduration掛けてendまで動かす
+
+        indexは整数か、整数の配列か、添字のtuple。配列なら複数の値を一度に加
+        え、end, duration, startはそれに合わせてbroadcastされる。startを省く
+        と今の値から始める。全て終わったらcallback()を呼ぶ。戻り値は
+        cancel()に渡せるhandle。
+        '''
+        if isinstance(index, tuple):
+            index = _ravel_index(index, target.shape)
+        if isinstance(index, int):
+            # 一つだけの時は配列を作らずに済ませる。何千ものgeneratorが同じ
+            # frameに次のtweenを加えるのでここは速くしておく
+            return self._add_one(target, index, end, duration, easing,
+                                 start, callback)
+        index = numpy.atleast_1d(numpy.asarray(index, dtype=numpy.intp))
+        n = len(index)
+        if not n:
+            raise ValueError("'index' is empty")
+        if start is None:
+            start = target.flat[index]
+        start, end, duration = numpy.broadcast_arrays(
+            numpy.asarray(start, dtype=float),
+            numpy.asarray(end, dtype=float),
+            numpy.asarray(duration, dtype=float),
+        )
+        slots = self._allocate(n)
+        self._start[slots] = numpy.broadcast_to(start, (n, ))
+        self._end[slots] = numpy.broadcast_to(end, (n, ))
+        self._duration[slots] = numpy.broadcast_to(duration, (n, ))
+        self._elapsed[slots] = 0.
+        self._easing[slots] = _EASING_IDS[easing]
+        self._target[slots] = self._register_target(target, n)
+        self._index[slots] = index
+        self._alive[slots] = True
+        slots = slots.tolist()
+        group = _Group(callback, slots)
+        groups = self._groups
+        for slot in slots:
+            groups[slot] = group
+        self._start_if_idle()
+        return group
+
+    def _add_one(self, target, index, end, duration, easing, start,
+                 callback):
+        if start is None:
+            start = target.flat[index]
+        slot = self._free.pop() if self._free else self._extend()
+        self._start[slot] = start
+        self._end[slot] = end
+        self._duration[slot] = duration
+        self._elapsed[slot] = 0.
+        self._easing[slot] = _EASING_IDS[easing]
+        self._target[slot] = self._register_target(target, 1)
+        self._index[slot] = index
+        self._alive[slot] = True
+        self._groups[slot] = group = _Group(callback, [slot])
+        self._start_if_idle()
+        return group
+
+    def _start_if_idle(self):
+        if self._ticking is None:
+            self._last = self._now()
+            self._ticking = self._start_ticking(self.tick)
+
+    def cancel(self, group):
+        '''add()したtweenたちをその場で止める。callbackは呼ばれない'''
+        group.callback = None
+        if not group.remaining:
+            return
+        group.remaining = 0
+        # 終わった分のslotは既に他のtweenに使われているかもしれない
+        groups = self._groups
+        slots = numpy.array(
+            [slot for slot in group.slots if groups[slot] is group],
+            dtype=numpy.intp)
+        self._release(slots)
+        self._stop_if_idle()
+
+    def tick(self, *args):
+        '''toolkitのtimerから呼ばれる。全てのtweenを進めて値を書き戻す'''
+        now = self._now()
+        dt = now - self._last
+        self._last = now
+        n = self._size
+        alive = self._alive[:n]
+        if not alive.any():
+            self._stop_if_idle()
+            return
+        slots = numpy.flatnonzero(alive)
+        elapsed = self._elapsed[slots] + dt
+        self._elapsed[slots] = elapsed
+        duration = self._duration[slots]
+        t = numpy.ones_like(elapsed)
+        numpy.divide(elapsed, duration, out=t, where=duration > 0.)
+        numpy.minimum(t, 1., out=t)
+        # easing毎にまとめて計算する
+        easing = self._easing[slots]
+        progress = t
+        easing_ids = numpy.unique(easing)
+        if len(easing_ids) != 1 or easing_ids[0]:
+            progress = numpy.empty_like(t)
+            for easing_id in easing_ids.tolist():
+                mask = easing == easing_id
+                progress[mask] = _EASING_FUNCS[easing_id](t[mask])
+        start = self._start[slots]
+        values = start + (self._end[slots] - start) * progress
+        # 書き込み先の配列毎にまとめて書き戻す
+        target = self._target[slots]
+        index = self._index[slots]
+        targets = self._targets
+        if len(targets) == 1:
+            targets[target[0]].flat[index] = values
+        else:
+            for target_id in numpy.unique(target).tolist():
+                mask = target == target_id
+                targets[target_id].flat[index[mask]] = values[mask]
+        finished = slots[t >= 1.]
+        if len(finished):
+            self._finish(finished)
+        self._stop_if_idle()
+
+    def _finish(self, slots):
+        groups = self._groups
+        done = []
+        for slot in slots.tolist():
+            group = groups[slot]
+            group.remaining -= 1
+            if not group.remaining:
+                done.append(group)
+        self._release(slots)
+        # 再開したgeneratorが新しいtweenを加えても良いように最後に呼ぶ
+        for group in done:
+            callback = group.callback
+            if callback is not None:
+                group.callback = None
+                callback()
+
+    def _allocate(self, n):
+        free = self._free
+        taken = free[-n:] if n <= len(free) else free[:]
+        del free[len(free) - len(taken):]
+        need = n - len(taken)
+        if need:
+            size = self._size
+            self._grow(size + need)
+            taken.extend(range(size, size + need))
+            self._size = size + need
+            self._groups.extend((None, ) * need)
+        return numpy.array(taken, dtype=numpy.intp)
+
+    def _extend(self):
+        # 新しいslotを一つ使う
+        slot = self._size
+        self._grow(slot + 1)
+        self._size = slot + 1
+        self._groups.append(None)
+        return slot
+
+    def _grow(self, size):
+        capacity = len(self._alive)
+        if size <= capacity:
+            return
+        while capacity < size:
+            capacity *= 2
+        for name in ('_start', '_end', '_elapsed', '_duration', '_easing',
+                     '_target', '_index', '_alive', ):
+            old = getattr(self, name)
+            new = numpy.zeros(capacity, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _release(self, slots):
+        self._alive[slots] = False
+        groups = self._groups
+        target_counts = self._target_counts
+        target_ids, counts = numpy.unique(self._target[slots],
+                                          return_counts=True)
+        for target_id, count in zip(target_ids.tolist(), counts.tolist()):
+            target_counts[target_id] -= count
+            if not target_counts[target_id]:
+                del target_counts[target_id]
+                target = self._targets.pop(target_id)
+                del self._target_ids[id(target)]
+        for slot in slots.tolist():
+            groups[slot] = None
+        self._free.extend(slots.tolist())
+
+    def _register_target(self, target, n):
+        target_id = self._target_ids.get(id(target))
+        if target_id is None:
+            target_id = 0
+            while target_id in self._targets:
+                target_id += 1
+            self._targets[target_id] = target
+            self._target_ids[id(target)] = target_id
+            self._target_counts[target_id] = 0
+        self._target_counts[target_id] += n
+        return target_id
+
+    def _stop_if_idle(self):
+        if len(self) or self._ticking is None:
+            return
+        self._stop_ticking(self._ticking)
+        self._ticking = None
+        # 全て空いたので配列の計算範囲を縮める
+        self._size = 0
+        self._free.clear()
+        self._groups.clear()
+
+
+class Tween(EventBase):
+    '''TweenEngine.add()したtweenが終わるまで待つEvent
+
+    引数はTweenEngine.add()と同じ。取り消されると値はその場で止まる。
+    '''
+
+    __slots__ = ('engine', 'args', 'kwargs', 'group', )
+
+    def __init__(self, engine, target, index, end, duration, **kwargs):
+        super().__init__()
+        self.engine = engine
+        self.args = (target, index, end, duration, )
+        self.kwargs = kwargs
+        self.group = None
+
+    def __call__(self, resume_gen):
+        assert self.group is None  # You can't re-use this instance
+        self.group = self.engine.add(
+            *self.args, callback=resume_gen, **self.kwargs)
+
+    def cancel(self, resume_gen):
+        group = self.group
+        if group is not None:
+            self.engine.cancel(group)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+
+'''GUIライブラリを使わずに仮想的な時間の上でgeneratorを動かす為のmodule
+
+時間は自動では進まず、advance()かrun_until_idle()を呼んだ時にだけ進む。
+なのでsimulationや、実時間を待たずに済むtestに使える。
+Time never passes by itself. It only advances when advance() or
+run_until_idle() is called.
+'''
+
+__all__ = (
+    'VirtualClock', 'clock', 'advance', 'run_until_idle',
+    'Sleep', 'Event', 'EventEmitter',
+)
+
+from heapq import heapify, heappush, heappop
+from itertools import count
+
+from . import EventBase
+
+# timerはheapに入れる [deadline, 通し番号, callback, 登録した時刻] のlist。
+# 通し番号によって同じdeadlineのtimerは登録順に呼ばれる。取り消されたtimerは
+# callbackをNoneにしておき、heapから取り出した時に捨てるか、溜まった所でまと
+# めて取り除く。
+_DEADLINE, _SEQ, _CALLBACK, _SCHEDULED_AT = range(4)
+
+
+class VirtualClock:
+    '''heapで管理されたtimerを持つ仮想時計'''
+
+    __slots__ = ('now', '_timers', '_num_alive', '_seq', )
+
+    def __init__(self):
+        self.now = 0.
+        self._timers = []
+        self._num_alive = 0
+        self._seq = count()
+
+    @property
+    def idle(self):
+        '''実行待ちのtimerが一つも無いか否か'''
+        return not self._num_alive
+
+    def __len__(self):
+        return self._num_alive
+
+    def schedule_once(self, callback, delay=0.):
+        '''delay秒後にcallback(dt)を呼ぶ。dtは実際に経過した時間
+
+        戻り値はcancel()に渡せるhandle。
+        '''
+        now = self.now
+        timer = [now + delay, next(self._seq), callback, now]
+        heappush(self._timers, timer)
+        self._num_alive += 1
+        return timer
+
+    def cancel(self, timer):
+        if timer[_CALLBACK] is None:
+            return
+        timer[_CALLBACK] = None
+        self._num_alive -= 1
+        # 取り消されたtimerが生きている物より多くなったらheapを作り直す。
+        # _run()の最中に呼ばれても良いようにlistはその場で書き換える
+        timers = self._timers
+        num_cancelled = len(timers) - self._num_alive
+        if num_cancelled > 16 and num_cancelled > self._num_alive:
+            timers[:] = [t for t in timers if t[_CALLBACK] is not None]
+            heapify(timers)
+
+    def advance(self, dt):
+        '''時間をdt秒進め、その間にdeadlineを迎えるtimerを順に呼ぶ'''
+        self._run(self.now + dt)
+
+    def run_until_idle(self):
+        '''timerが無くなるまで時間を進める
+
+        Sleepし続けるgeneratorがあると終わらない事に注意。
+        '''
+        self._run(None)
+
+    def _run(self, until):
+        timers = self._timers
+        while timers:
+            timer = timers[0]
+            deadline = timer[_DEADLINE]
+            if until is not None and deadline > until:
+                break
+            heappop(timers)
+            callback = timer[_CALLBACK]
+            if callback is None:
+                continue
+            timer[_CALLBACK] = None
+            self._num_alive -= 1
+            if deadline > self.now:
+                self.now = deadline
+            callback(deadline - timer[_SCHEDULED_AT])
+        if until is not None and until > self.now:
+            self.now = until
+
+
+clock = VirtualClock()
+advance = clock.advance
+run_until_idle = clock.run_until_idle
+
+
+class Sleep(EventBase):
+    '''VirtualClock.schedule_once()用のWrapper'''
+
+    __slots__ = ('seconds', 'clock', 'timer', )
+
+    def __init__(self, seconds, *, clock=clock):
+        super().__init__()
+        self.seconds = seconds
+        self.clock = clock
+        self.timer = None
+
+    def __call__(self, resume_gen):
+        self.timer = self.clock.schedule_once(resume_gen, self.seconds)
+
+    def cancel(self, resume_gen):
+        timer = self.timer
+        if timer is not None:
+            self.timer = None
+            self.clock.cancel(timer)
+
+
+class EventEmitter:
+    '''名前付きのEventを発行する素朴なobject
+
+    bind(name, callback)とunbind(name, callback)を持つobjectであれば、これを
+    継承していなくてもEventで待機できる。
+    '''
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks = {}
+
+    def bind(self, name, callback):
+        # 値を使わないdictを順序付きの集合として使う
+        self._callbacks.setdefault(name, {})[callback] = None
+
+    def unbind(self, name, callback):
+        callbacks = self._callbacks.get(name)
+        if callbacks is not None:
+            callbacks.pop(callback, None)
+
+    def emit(self, name, *args, **kwargs):
+        callbacks = self._callbacks.get(name)
+        if callbacks:
+            for callback in tuple(callbacks):
+                callback(*args, **kwargs)
+
+
+class Event(EventBase):
+    '''EventEmitter(またはbind()とunbind()を持つobject)用のWrapper'''
+
+    __slots__ = ('emitter', 'name', 'resume_gen', 'bound', )
+
+    def __init__(self, emitter, name):
+        super().__init__()
+        self.emitter = emitter
+        self.name = name
+        self.bound = False
+
+    def __call__(self, resume_gen):
+        assert self.bound is False  # You can't re-use this instance
+        self.resume_gen = resume_gen
+        self.bound = True
+        self.emitter.bind(self.name, self.callback)
+
+    def callback(self, *args, **kwargs):
+        # emit()は控えを回すので、同じemitの中で取り消された後にも呼ばれうる
+        if not self.bound:
+            return
+        self.unbind()
+        self.resume_gen(*args, **kwargs)
+
+    def cancel(self, resume_gen):
+        self.unbind()
+
+    def unbind(self):
+        if self.bound:
+            self.bound = None  # Noneにしておく事で再利用も防ぐ
+            self.emitter.unbind(self.name, self.callback)
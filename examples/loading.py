@@ -45,12 +45,11 @@ class Loading(BoxLayout):
     @animation
     def anim_main(self):
         from kivy.animation import Animation as A
-        from callbackgoaway import callbackgoaway, Never
+        from callbackgoaway import Nursery, Never
         from callbackgoaway.kivy import Sleep as S, Event as E
 
         yield S(0)
 
-        @callbackgoaway
         def anim_repeat_falldown(label, *, delay):
             yield S(delay)
             a = (
@@ -74,15 +73,11 @@ class Loading(BoxLayout):
         add_widget = self.add_widget
         for label in labels:
             add_widget(label)
-        gens = [
-            anim_repeat_falldown(label, delay=index * 0.2)
-            for index, label in enumerate(labels)
-        ]
-        try:
+        # このgeneratorが閉じられるとnurseryが全てのanimationを止める
+        with Nursery() as nursery:
+            for index, label in enumerate(labels):
+                nursery.start(anim_repeat_falldown(label, delay=index * 0.2))
             yield Never()
-        finally:
-            for gen in gens:
-                gen.close()
 
 
 if __name__ == '__main__':
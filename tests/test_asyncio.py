@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import asyncio
+from inspect import getgeneratorstate, GEN_CLOSED, GEN_SUSPENDED
+
+import common_setup
+from callbackgoaway import callbackgoaway, Never
+from callbackgoaway.asyncio import Sleep, Event, as_future
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class AsyncioSleepTestCase(unittest.TestCase):
+
+    def test_sleep(self):
+
+        async def main():
+            loop = asyncio.get_running_loop()
+            times = []
+            loser = Sleep(10)
+
+            @callbackgoaway
+            def func():
+                times.append(loop.time())
+                yield Sleep(.05)
+                times.append(loop.time())
+                yield Sleep(.05) | loser
+                times.append(loop.time())
+
+            gen = func()
+            self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+            await asyncio.sleep(.2)
+            self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+            self.assertGreaterEqual(times[1] - times[0], .05)
+            self.assertLess(times[2] - times[0], 1)
+            # 負けたSleepのtimerは取り消されている
+            self.assertIsNone(loser.handle)
+
+        run(main())
+
+    def test_many_generators(self):
+
+        async def main():
+            finished = []
+
+            @callbackgoaway
+            def func(i):
+                for __ in range(3):
+                    yield Sleep(0)
+                finished.append(i)
+
+            for i in range(1000):
+                func(i)
+            await asyncio.sleep(.1)
+            self.assertEqual(len(finished), 1000)
+
+        run(main())
+
+
+class AsyncioEventTestCase(unittest.TestCase):
+
+    def test_asyncio_event(self):
+
+        async def main():
+            event = asyncio.Event()
+
+            @callbackgoaway
+            def func():
+                args, __ = yield Event(event)
+                self.assertIs(args[0], event)
+
+            gen = func()
+            await asyncio.sleep(0)
+            self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+            event.set()
+            await asyncio.sleep(.01)
+            self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+
+        run(main())
+
+    def test_future(self):
+
+        async def main():
+            future = asyncio.get_running_loop().create_future()
+
+            @callbackgoaway
+            def func():
+                args, __ = yield Event(future)
+                self.assertEqual(args[0].result(), 'result')
+
+            gen = func()
+            future.set_result('result')
+            await asyncio.sleep(0)
+            self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+
+        run(main())
+
+    def test_cancel(self):
+
+        async def main():
+            event = asyncio.Event()
+
+            @callbackgoaway
+            def func():
+                yield Event(event) | Sleep(0)
+
+            gen = func()
+            await asyncio.sleep(.01)
+            self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+            # wait()を待っていたTaskも止められている
+            tasks = asyncio.all_tasks() - {asyncio.current_task()}
+            self.assertEqual(tasks, set())
+
+        run(main())
+
+
+class AsFutureTestCase(unittest.TestCase):
+
+    def test_generator(self):
+
+        def func():
+            yield Sleep(.01)
+            return 'result'
+
+        async def main():
+            return await as_future(func())
+
+        self.assertEqual(run(main()), 'result')
+
+    def test_event(self):
+
+        async def main():
+            return await as_future(Sleep(0))
+
+        self.assertEqual(run(main()), ((), {}))
+
+    def test_exception(self):
+
+        def func():
+            yield Sleep(0)
+            raise ValueError()
+
+        async def main():
+            with self.assertRaises(ValueError):
+                await as_future(func())
+
+        run(main())
+
+    def test_cancel(self):
+        closed = []
+
+        def func():
+            try:
+                yield Never()
+            finally:
+                closed.append(True)
+
+        async def main():
+            future = as_future(func())
+            await asyncio.sleep(0)
+            future.cancel()
+            await asyncio.sleep(0)
+            self.assertEqual(closed, [True])
+
+        run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
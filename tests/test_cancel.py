@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from inspect import getgeneratorstate, GEN_CLOSED, GEN_SUSPENDED
+
+import common_setup
+from callbackgoaway import (
+    callbackgoaway, EventBase, Immediate, Never, Wait, And, Or, Generator,
+)
+
+
+class Pending(EventBase):
+    '''外部から起こすまで起きないEvent。cancelされた回数を数える'''
+
+    def __init__(self):
+        super().__init__()
+        self.resume_gen = None
+        self.n_cancelled = 0
+
+    def __call__(self, resume_gen):
+        self.resume_gen = resume_gen
+
+    def cancel(self, resume_gen):
+        assert resume_gen == self.resume_gen
+        self.n_cancelled += 1
+
+    def fire(self, *args, **kwargs):
+        self.resume_gen(*args, **kwargs)
+
+
+class CancelTestCase(unittest.TestCase):
+
+    def test_or_cancels_the_others(self):
+        p1 = Pending()
+        p2 = Pending()
+
+        @callbackgoaway
+        def func():
+            yield Or(p1, Immediate(), p2)
+
+        gen = func()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(p1.n_cancelled, 1)
+        # 条件が満たされた後の子Eventは開始すらされない
+        self.assertIsNone(p2.resume_gen)
+        self.assertEqual(p2.n_cancelled, 0)
+
+    def test_wait_cancels_the_rest(self):
+        pendings = [Pending() for __ in range(3)]
+
+        @callbackgoaway
+        def func():
+            yield Wait(events=pendings, n=2)
+
+        gen = func()
+        self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+        pendings[2].fire()
+        self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+        pendings[0].fire()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual([p.n_cancelled for p in pendings], [0, 1, 0])
+
+    def test_and_cancels_nothing(self):
+        p1 = Pending()
+        p2 = Pending()
+
+        @callbackgoaway
+        def func():
+            yield And(p1, p2)
+
+        gen = func()
+        p2.fire()
+        p1.fire()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual([p1.n_cancelled, p2.n_cancelled], [0, 0])
+
+    def test_nested(self):
+        p1 = Pending()
+        p2 = Pending()
+        p3 = Pending()
+
+        @callbackgoaway
+        def func():
+            yield (p1 & p2) | p3
+
+        gen = func()
+        p1.fire()
+        p3.fire()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(
+            [p1.n_cancelled, p2.n_cancelled, p3.n_cancelled], [0, 1, 0])
+
+    def test_generator(self):
+        p = Pending()
+        closed = []
+
+        def child():
+            try:
+                yield p
+            except GeneratorExit:
+                closed.append(True)
+                raise
+
+        child_gen = child()
+
+        @callbackgoaway
+        def func():
+            yield Generator(child_gen) | Immediate()
+
+        gen = func()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(getgeneratorstate(child_gen), GEN_CLOSED)
+        self.assertEqual(p.n_cancelled, 1)
+        self.assertEqual(closed, [True])
+
+    def test_generator_resolving_its_own_or(self):
+        # Generatorが進んでいる最中にOrが満たされて取り消されても良い
+        p = Pending()
+        closed = []
+
+        def child():
+            try:
+                p.fire()
+                yield Never()
+            finally:
+                closed.append(True)
+
+        child_gen = child()
+
+        @callbackgoaway
+        def func():
+            yield p | Generator(child_gen)
+
+        gen = func()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(getgeneratorstate(child_gen), GEN_CLOSED)
+        self.assertEqual(closed, [True])
+
+    def test_late_child_is_ignored(self):
+        # cancel()を持たないcallableは取り消せないが、遅れて起きても無視される
+        resume_gens = []
+
+        @callbackgoaway
+        def func():
+            yield Or(resume_gens.append, Never())
+            yield Never()
+
+        gen = func()
+        resume_gens[0]()
+        self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+        resume_gens[0]()
+        self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import common_setup
+from callbackgoaway import (
+    start, Signal, Generator, Deadline, DeadlineExceeded, Immediate, Never,
+    TaskState,
+)
+
+
+class DeadlineTestCase(unittest.TestCase):
+
+    def test_finish_before_deadline(self):
+        timer = Signal()
+        event = Signal()
+
+        def body():
+            yield event
+            return 'done'
+
+        def func():
+            param = yield Deadline(timer, body())
+            return param.args[0]
+
+        task = start(func())
+        self.assertEqual(len(timer), 1)
+        event.fire()
+        self.assertEqual(task.result, 'done')
+        # timerは取り消されている
+        self.assertEqual(len(timer), 0)
+
+    def test_finish_synchronously(self):
+        timer = Signal()
+
+        def body():
+            yield Immediate()
+
+        def func():
+            yield Deadline(timer, body())
+            return 'done'
+
+        task = start(func())
+        self.assertEqual(task.result, 'done')
+        # 待機に入らなかったので期限は設けられない
+        self.assertEqual(len(timer), 0)
+
+    def test_expire_nested(self):
+        timer = Signal()
+        event = Signal()
+        log = []
+
+        def inner():
+            try:
+                yield event
+            finally:
+                log.append('inner')
+
+        def outer():
+            try:
+                yield Generator(inner())
+            finally:
+                log.append('outer')
+
+        def func():
+            deadline = Deadline(timer, outer())
+            try:
+                yield deadline
+            except DeadlineExceeded:
+                log.append('timeout')
+            self.assertTrue(deadline.expired)
+
+        task = start(func())
+        timer.fire()
+        self.assertEqual(log, ['inner', 'outer', 'timeout'])
+        self.assertEqual(len(event), 0)
+        self.assertEqual(task.state, TaskState.FINISHED)
+
+    def test_nested_deadline_is_torn_down(self):
+        outer_timer = Signal()
+        inner_timer = Signal()
+        log = []
+
+        def body():
+            try:
+                yield Never()
+            finally:
+                log.append('body')
+
+        def func():
+            try:
+                yield Deadline(outer_timer, middle())
+            except DeadlineExceeded:
+                log.append('timeout')
+
+        def middle():
+            yield Deadline(inner_timer, body())
+
+        start(func())
+        self.assertEqual(len(inner_timer), 1)
+        outer_timer.fire()
+        self.assertEqual(log, ['body', 'timeout'])
+        self.assertEqual(len(inner_timer), 0)
+
+    def test_body_catches_timeout(self):
+        timer = Signal()
+
+        def body():
+            try:
+                yield Never()
+            except DeadlineExceeded:
+                return 'fallback'
+
+        def func():
+            param = yield Deadline(timer, body())
+            return param.args[0]
+
+        task = start(func())
+        timer.fire()
+        self.assertEqual(task.result, 'fallback')
+
+    def test_exception_goes_to_waiter(self):
+        event = Signal()
+
+        def body():
+            yield event
+            raise ValueError()
+
+        def func():
+            try:
+                yield Deadline(Signal(), body())
+            except ValueError:
+                return 'caught'
+
+        task = start(func())
+        event.fire()
+        self.assertEqual(task.result, 'caught')
+
+    def test_cancel(self):
+        timer = Signal()
+        log = []
+
+        def body():
+            try:
+                yield Never()
+            finally:
+                log.append('body')
+
+        def func():
+            yield Deadline(timer, body())
+
+        task = start(func())
+        task.cancel()
+        self.assertEqual(log, ['body'])
+        self.assertEqual(len(timer), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import common_setup
+from callbackgoaway import (
+    start, Nursery, Signal, Never, Deadline, DeadlineExceeded,
+)
+from callbackgoaway.framebudget import FrameBudget
+from callbackgoaway.virtualclock import VirtualClock, Sleep
+
+
+class FrameBudgetTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = clock = VirtualClock()
+        # 再開一回につき1msかかる事にする
+        self.cpu_time = 0
+        self.frame_budget = FrameBudget(
+            3,
+            schedule_drain=lambda drain: clock.schedule_once(drain, 1),
+            now=lambda: self.cpu_time,
+        )
+        self.frame_budget.enable()
+        self.addCleanup(self.frame_budget.disable)
+
+    def sleeper(self, resumed):
+        yield Sleep(1, clock=self.clock)
+        self.cpu_time += 1
+        resumed.append(self.clock.now)
+
+    def test_carry_over(self):
+        resumed = []
+        for __ in range(7):
+            start(self.sleeper(resumed))
+        self.clock.advance(1)
+        # 再開はまだ行われずqueueに溜まっている
+        self.assertEqual(resumed, [])
+        self.assertEqual(len(self.frame_budget), 7)
+        self.clock.run_until_idle()
+        # 1frameあたり3つずつ再開する
+        self.assertEqual(resumed, [2, 2, 2, 3, 3, 3, 4])
+        fb = self.frame_budget
+        self.assertEqual(fb.resumed, 7)
+        self.assertEqual(fb.frames, 3)
+        self.assertEqual(fb.deferred, 4 + 1)
+        self.assertEqual(fb.max_length, 7)
+
+    def test_cancelled_while_queued(self):
+        resumed = []
+        with Nursery() as nursery:
+            for __ in range(2):
+                nursery.start(self.sleeper(resumed))
+            self.clock.advance(1)
+            self.assertEqual(len(self.frame_budget), 2)
+        self.clock.run_until_idle()
+        self.assertEqual(resumed, [])
+        self.assertEqual(self.frame_budget.resumed, 0)
+
+    def test_thrown_into_while_queued(self):
+        # queueに溜まっている間にDeadlineが例外を投げ込み、generatorが別の
+        # Eventを待ち始めたら、溜まっていた再開は捨てる
+        timer = Signal()
+        resumed = []
+
+        def body():
+            try:
+                yield Sleep(1, clock=self.clock)
+            except DeadlineExceeded:
+                yield Never()
+            resumed.append(True)
+
+        def func():
+            yield Deadline(timer, body())
+
+        start(func())
+        self.clock.advance(1)
+        self.assertEqual(len(self.frame_budget), 1)
+        timer.fire()
+        self.clock.run_until_idle()
+        self.assertEqual(resumed, [])
+        self.assertEqual(self.frame_budget.resumed, 0)
+
+    def test_disable_flushes(self):
+        resumed = []
+        for __ in range(5):
+            start(self.sleeper(resumed))
+        self.clock.advance(1)
+        self.frame_budget.disable()
+        self.assertEqual(len(resumed), 5)
+        # 以降はすぐに再開する
+        start(self.sleeper(resumed))
+        self.clock.advance(1)
+        self.assertEqual(len(resumed), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import common_setup
+from callbackgoaway import start, TaskState
+from callbackgoaway.frames import FrameClock, FramesBase
+
+
+class FramesTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.
+        self.ticking = []
+
+        def start_ticking(tick):
+            self.ticking.append(tick)
+            return tick
+
+        clock = self.clock = FrameClock(
+            start_ticking=start_ticking,
+            stop_ticking=self.ticking.remove,
+            now=lambda: self.now,
+        )
+
+        class Frames(FramesBase):
+            __slots__ = ()
+
+            def get_frame_clock(self):
+                return clock
+
+        self.Frames = Frames
+
+    def frame(self, dt=.25):
+        self.now += dt
+        for tick in self.ticking[:]:
+            tick()
+
+    def test_next_frame(self):
+        dts = []
+
+        def func():
+            for __ in range(3):
+                param = yield self.Frames(1)
+                dts.append(param.args[0])
+
+        task = start(func())
+        self.assertEqual(len(self.ticking), 1)
+        self.frame(.5)
+        self.assertEqual(dts, [.5])
+        self.frame(.25)
+        self.frame(.25)
+        self.assertEqual(dts, [.5, .25, .25])
+        self.assertEqual(task.state, TaskState.FINISHED)
+        # 待っているEventが無くなったらtimerを止める
+        self.assertEqual(self.ticking, [])
+
+    def test_frames(self):
+        resumed = []
+
+        def func():
+            param = yield self.Frames(3)
+            resumed.append(param.args[0])
+
+        start(func())
+        self.frame()
+        self.frame()
+        self.assertEqual(resumed, [])
+        self.frame()
+        self.assertEqual(resumed, [.75])
+
+    def test_many_share_one_timer(self):
+        counts = [0]
+
+        def func():
+            while True:
+                yield self.Frames(1)
+                counts[0] += 1
+
+        tasks = [start(func()) for __ in range(100)]
+        self.assertEqual(len(self.ticking), 1)
+        self.assertEqual(len(self.clock), 100)
+        self.frame()
+        self.frame()
+        self.assertEqual(counts, [200])
+        for task in tasks:
+            task.cancel()
+        self.assertEqual(len(self.clock), 0)
+        self.frame()
+        self.assertEqual(counts, [200])
+        self.assertEqual(self.ticking, [])
+
+    def test_cancelled_by_earlier_waiter(self):
+        resumed = []
+        tasks = []
+
+        def first():
+            yield self.Frames(1)
+            tasks[1].cancel()
+
+        def second():
+            yield self.Frames(1)
+            resumed.append(True)
+
+        tasks.append(start(first()))
+        tasks.append(start(second()))
+        self.frame()
+        self.assertEqual(resumed, [])
+        self.assertEqual(tasks[1].state, TaskState.CANCELLED)
+
+    def test_invalid_n(self):
+        with self.assertRaises(ValueError):
+            self.Frames(0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import unittest
+from inspect import getgeneratorstate, GEN_CLOSED, GEN_SUSPENDED
+
+import common_setup
+from callbackgoaway import (
+    start, Immediate, Generator as G, GeneratorFunction as GF,
+)
+from test_cancel import Pending
+
+
+class GeneratorTestCase(unittest.TestCase):
+
+    def test_return_value(self):
+        p = Pending()
+
+        def child(value):
+            param = yield p
+            return value + param.args[0]
+
+        def no_return_value():
+            yield Immediate()
+
+        def parent():
+            param = yield GF(child, 1)
+            self.assertEqual(param.args, (3, ))
+            # 戻り値がNoneなら今まで通り引数無しで再開する
+            param = yield G(no_return_value())
+            self.assertEqual(param.args, ())
+            return 'done'
+
+        task = start(parent())
+        p.fire(2)
+        self.assertEqual(task.result, 'done')
+
+    def test_return_value_in_or(self):
+        def child():
+            yield Immediate()
+            return 'child'
+
+        def parent():
+            params, __ = yield GF(child) | Immediate()
+            return params[0].args
+
+        self.assertEqual(start(parent()).result, ('child', ))
+
+    def test_resumes_reach_innermost(self):
+        p = Pending()
+
+        def nest(depth):
+            if depth == 0:
+                yield p
+                yield p
+                return 0
+            param = yield GF(nest, depth - 1)
+            return param.args[0] + 1
+
+        task = start(nest(100))
+        # Driverは一つだけで、Eventには一番外側のDriverがそのまま渡される
+        self.assertIs(p.resume_gen, task._driver)
+        p.fire()
+        self.assertIs(p.resume_gen, task._driver)
+        p.fire()
+        self.assertEqual(task.result, 100)
+
+    def test_deep_nesting_does_not_grow_stack(self):
+        depth = sys.getrecursionlimit() * 2
+
+        def nest(depth):
+            if depth == 0:
+                yield Immediate()
+                return 0
+            param = yield GF(nest, depth - 1)
+            return param.args[0] + 1
+
+        self.assertEqual(start(nest(depth)).result, depth)
+
+    def test_exception_propagates_to_parent(self):
+        p = Pending()
+
+        def child():
+            yield p
+            raise ZeroDivisionError
+
+        def parent():
+            try:
+                yield GF(child)
+            except ZeroDivisionError:
+                return 'caught'
+
+        task = start(parent())
+        p.fire()
+        self.assertEqual(task.result, 'caught')
+
+    def test_cancel_closes_every_level(self):
+        p = Pending()
+        closed = []
+
+        def nest(depth):
+            try:
+                if depth == 0:
+                    yield p
+                else:
+                    yield GF(nest, depth - 1)
+            finally:
+                closed.append(depth)
+
+        task = start(nest(3))
+        self.assertEqual(getgeneratorstate(task.gen), GEN_SUSPENDED)
+        task.cancel()
+        self.assertEqual(p.n_cancelled, 1)
+        self.assertEqual(closed, [0, 1, 2, 3])
+        self.assertEqual(getgeneratorstate(task.gen), GEN_CLOSED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -67,12 +67,13 @@ class ImmediateCallTestCase(unittest.TestCase):
             self.assertEqual(self.counter, 0)
             yield Wait(events=(Inc(self), Inc(self), ))
             self.assertEqual(self.counter, 2)
+            # 条件が満たされた時点で残りの子Eventは開始されない
             yield Wait(events=(Inc(self), Inc(self), ), n=1)
             self.assertEqual(self.counter, 3)
 
         gen = func()
         self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
-        self.assertEqual(self.counter, 4)
+        self.assertEqual(self.counter, 3)
 
     def test_wait2(self):
 
@@ -110,7 +111,7 @@ class ImmediateCallTestCase(unittest.TestCase):
             self.assertEqual(self.counter, 0)
 
             # orなので片方のincreamentの処理が終わった時点でgeneratorが再開する。
-            # よって 1 しか増加しない。
+            # 残りのincreamentは開始されないので 1 しか増加しない。
             yield Inc(self) | Inc(self)
             self.assertEqual(self.counter, 1)
 
@@ -128,8 +129,7 @@ class ImmediateCallTestCase(unittest.TestCase):
 
         gen = func()
         self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
-        # generatorから戻ってきた時には全てのincreamentが実行されている
-        self.assertEqual(self.counter, 11)
+        self.assertEqual(self.counter, 4)
 
     def test_both_of_opeartors(self):
 
@@ -147,8 +147,60 @@ class ImmediateCallTestCase(unittest.TestCase):
 
         gen = func()
         self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
-        # generatorから戻ってきた時には全てのincreamentが実行されている
-        self.assertEqual(self.counter, 6)
+        # 条件が満たされた後のincreamentは実行されない
+        self.assertEqual(self.counter, 3)
+
+    def test_resume_value(self):
+
+        def with_args(resume_gen):
+            resume_gen(1, 2, a=3)
+
+        @callbackgoaway
+        def func():
+            param = yield Immediate()
+            self.assertEqual(param, ((), {}, ))
+            self.assertIs(param, (yield Immediate()))  # 使い回される
+            args, kwargs = yield with_args
+            self.assertEqual(args, (1, 2, ))
+            self.assertEqual(kwargs, {'a': 3, })
+            self.counter += 1
+
+        func()
+        self.assertEqual(self.counter, 1)
+
+    def test_events_have_no_dict(self):
+        for event in (Immediate(), And(Immediate()), Or(Immediate()),
+                      Generator(iter(())), ):
+            self.assertFalse(hasattr(event, '__dict__'))
+
+    def test_operators_are_flattened(self):
+        a, b, c, d = (Inc(self) for __ in range(4))
+        e = a | b | c | d
+        self.assertIs(type(e), Or)
+        self.assertEqual(e.events, (a, b, c, d, ))
+        e = a & (b & c) & d
+        self.assertIs(type(e), And)
+        self.assertEqual(e.events, (a, b, c, d, ))
+        # 種類の違う演算子は平坦化しない
+        e = (a & b) | c
+        self.assertIs(type(e), Or)
+        self.assertIs(type(e.events[0]), And)
+        self.assertEqual(e.events[1:], (c, ))
+
+    def test_large_fan_in(self):
+
+        @callbackgoaway
+        def func():
+            params, __ = yield And(*(Inc(self) for __ in range(10000)))
+            self.assertEqual(len(params), 10000)
+            params, __ = yield Or(*(Inc(self) for __ in range(10000)))
+            self.assertEqual(len(params), 10000)
+            self.assertIsNotNone(params[0])
+            self.assertIsNone(params[1])
+
+        gen = func()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(self.counter, 10001)
 
     def test_Generator_and_GeneratorFunction(self):
 
@@ -173,7 +225,27 @@ class ImmediateCallTestCase(unittest.TestCase):
 
         gen = func()
         self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
-        self.assertEqual(self.counter, 9)
+        self.assertEqual(self.counter, 8)
+
+    def test_many_synchronous_yields(self):
+        # 同期的に完了するEventを何度yieldしてもstackは伸びない
+        import sys
+        times = sys.getrecursionlimit() * 10
+
+        def create_gen():
+            for __ in range(times):
+                yield Inc(self)
+
+        @callbackgoaway
+        def func():
+            for __ in range(times):
+                yield Immediate()
+            yield GeneratorFunction(create_gen)
+            yield Inc(self) & Immediate()
+
+        gen = func()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(self.counter, times + 1)
 
 
 if __name__ == '__main__':
@@ -1,6 +1,8 @@
 # -*- coding: utf-8 -*-
 
+import gc
 import unittest
+from weakref import ref
 from inspect import getgeneratorstate, GEN_CLOSED, GEN_SUSPENDED
 import textwrap
 from time import time
@@ -155,6 +157,94 @@ class KivyEventTestCase(unittest.TestCase):
         runTouchApp(root)
         self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
 
+    def test_many_waiters(self):
+        root = Factory.Label(
+            text="Test many waiters",
+            font_size='30sp',
+        )
+        num_observers = len(root.get_property_observers('font_size'))
+        finished = []
+
+        @callbackgoaway
+        def waiter(i):
+            yield Event(root, 'font_size')
+            finished.append(i)
+
+        @callbackgoaway
+        def func():
+            for i in range(100):
+                waiter(i)
+            # 何個のgeneratorが待っていてもbindは一つだけ
+            self.assertEqual(
+                len(root.get_property_observers('font_size')),
+                num_observers + 1)
+            Clock.schedule_once(lambda __: setattr(root, 'font_size', 20), .5)
+            yield Event(root, 'font_size')
+            # 待ち始めた順に再開する
+            self.assertEqual(finished, list(range(100)))
+            stopTouchApp()
+
+        gen = func()
+        self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+        runTouchApp(root)
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+
+    def test_handler_bound_later_returns_true(self):
+        from kivy.event import EventDispatcher
+
+        class Dispatcher(EventDispatcher):
+            __events__ = ('on_test', )
+
+            def on_test(self, *args):
+                pass
+
+        ed = Dispatcher()
+        finished = []
+
+        @callbackgoaway
+        def waiter():
+            yield Event(ed, 'on_test')
+            finished.append(True)
+
+        waiter()
+        ed.dispatch('on_test')
+        self.assertEqual(finished, [True])
+        # 後からbindされてTrueを返すcallbackが居ても、誰も待っていない所へ待
+        # ち始める時にbindし直されるので届く
+        ed.fbind('on_test', lambda *args: True)
+        waiter()
+        waiter()
+        ed.dispatch('on_test')
+        self.assertEqual(finished, [True] * 3)
+        # 待っている間にbindされた物には止められる
+        waiter()
+        ed.fbind('on_test', lambda *args: True)
+        ed.dispatch('on_test')
+        self.assertEqual(finished, [True] * 3)
+
+    def test_dispatcher_with_pending_wait_is_collected(self):
+        from kivy.event import EventDispatcher
+
+        class Dispatcher(EventDispatcher):
+            __events__ = ('on_test', )
+
+            def on_test(self, *args):
+                pass
+
+        ed = Dispatcher()
+
+        @callbackgoaway
+        def waiter():
+            yield Event(ed, 'on_test')
+
+        ed_ref = ref(ed)
+        gen_ref = ref(waiter())
+        del ed
+        gc.collect()
+        # 待っている最中でもEventDispatcherとgeneratorは生き残らない
+        self.assertIsNone(ed_ref())
+        self.assertIsNone(gen_ref())
+
     def test_wait_event(self):
 
         root = Builder.load_string(textwrap.dedent('''
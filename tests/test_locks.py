@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import common_setup
+from callbackgoaway import start, TaskState, Generator
+from callbackgoaway.framebudget import FrameBudget
+from callbackgoaway.locks import Lock, Semaphore, CapacityLimiter
+from callbackgoaway.virtualclock import VirtualClock, Sleep
+
+
+def defer_resumes(testcase):
+    '''再開をrun queueに溜め、flush()するまで後回しにする'''
+    frame_budget = FrameBudget(1, schedule_drain=lambda drain: None)
+    frame_budget.enable()
+    testcase.addCleanup(frame_budget.disable)
+    return frame_budget
+
+
+class SemaphoreTestCase(unittest.TestCase):
+
+    def test_limits_concurrency(self):
+        clock = VirtualClock()
+        sem = Semaphore(2)
+        running = []
+        max_running = [0]
+
+        def work(i):
+            yield sem.acquire()
+            try:
+                running.append(i)
+                max_running[0] = max(max_running[0], len(running))
+                yield Sleep(1, clock=clock)
+            finally:
+                running.remove(i)
+                sem.release()
+
+        tasks = [start(work(i)) for i in range(5)]
+        self.assertEqual(running, [0, 1])
+        self.assertEqual(sem.num_waiting, 3)
+        clock.advance(1)
+        # 並んだ順に再開する
+        self.assertEqual(running, [2, 3])
+        clock.run_until_idle()
+        self.assertEqual(clock.now, 3)
+        self.assertEqual(max_running, [2])
+        self.assertTrue(all(t.state is TaskState.FINISHED for t in tasks))
+        self.assertEqual(sem.value, 2)
+
+    def test_cancel_while_waiting(self):
+        clock = VirtualClock()
+        sem = Semaphore(0)
+
+        def waiter():
+            yield sem.acquire() | Sleep(1, clock=clock)
+
+        task = start(waiter())
+        clock.advance(1)
+        self.assertEqual(task.state, TaskState.FINISHED)
+        self.assertEqual(sem.num_waiting, 0)
+        sem.release()
+        # 取り消されたgeneratorには渡らない
+        self.assertEqual(sem.value, 1)
+
+    def test_no_overtaking(self):
+        sem = Semaphore(0)
+        order = []
+
+        def waiter(i):
+            yield sem.acquire()
+            order.append(i)
+
+        start(waiter(0))
+        self.assertFalse(sem.acquire_nowait())
+        sem.release()
+        # 空いた分は待っていたgeneratorに直接渡る
+        self.assertEqual(order, [0])
+        self.assertFalse(sem.acquire_nowait())
+        sem.release()
+        self.assertTrue(sem.acquire_nowait())
+
+
+class LockTestCase(unittest.TestCase):
+
+    def test_lock(self):
+        lock = Lock()
+        order = []
+
+        def work(i):
+            yield lock.acquire()
+            order.append(i)
+
+        start(work(0))
+        self.assertTrue(lock.locked)
+        start(work(1))
+        self.assertEqual(order, [0])
+        lock.release()
+        self.assertEqual(order, [0, 1])
+        lock.release()
+        self.assertFalse(lock.locked)
+        with self.assertRaises(RuntimeError):
+            lock.release()
+
+    def test_cancelled_before_deferred_resume(self):
+        lock = Lock()
+        order = []
+
+        def work(i):
+            yield lock.acquire()
+            order.append(i)
+
+        start(work(0))
+        frame_budget = defer_resumes(self)
+        task = start(work(1))
+        start(work(2))
+        lock.release()
+        # 渡されたが再開はまだ。ここで取り消されたら次に並んでいる物へ渡す
+        task.cancel()
+        frame_budget.flush()
+        self.assertEqual(order, [0, 2])
+        self.assertTrue(lock.locked)
+        lock.release()
+        self.assertFalse(lock.locked)
+
+    def test_granted_then_cancelled_by_child(self):
+        lock = Lock()
+        lock.acquire_nowait()
+        frame_budget = defer_resumes(self)
+
+        def child():
+            yield lock.acquire()
+            task.cancel()
+
+        def work():
+            try:
+                yield Generator(child())
+            finally:
+                lock.release()
+
+        task = start(work())
+        lock.release()
+        frame_budget.flush()
+        # 受け取った後に取り消されても二重には返さない
+        self.assertEqual(task.state, TaskState.CANCELLED)
+        self.assertFalse(lock.locked)
+
+
+class CapacityLimiterTestCase(unittest.TestCase):
+
+    def test_borrowers(self):
+        limiter = CapacityLimiter(1)
+        acquired = []
+
+        def work(borrower):
+            yield limiter.acquire(borrower)
+            acquired.append(borrower)
+
+        start(work('a'))
+        with self.assertRaises(RuntimeError):
+            limiter.acquire('a')
+        start(work('b'))
+        self.assertEqual(acquired, ['a'])
+        self.assertEqual(limiter.borrowed_tokens, 1)
+        with self.assertRaises(RuntimeError):
+            limiter.release('b')
+        limiter.release('a')
+        self.assertEqual(acquired, ['a', 'b'])
+
+    def test_change_total_tokens(self):
+        limiter = CapacityLimiter(1)
+        acquired = []
+
+        def work(borrower):
+            yield limiter.acquire(borrower)
+            acquired.append(borrower)
+
+        for borrower in 'abc':
+            start(work(borrower))
+        self.assertEqual(acquired, ['a'])
+        limiter.total_tokens = 3
+        self.assertEqual(acquired, ['a', 'b', 'c'])
+        limiter.total_tokens = 1
+        limiter.release('a')
+        # 減らした分は返されるまで貸さない
+        self.assertEqual(limiter.available_tokens, 0)
+        self.assertFalse(limiter.acquire_nowait('d'))
+        limiter.release('b')
+        limiter.release('c')
+        self.assertTrue(limiter.acquire_nowait('d'))
+
+    def test_cancelled_before_deferred_resume(self):
+        limiter = CapacityLimiter(1)
+        acquired = []
+
+        def work(borrower):
+            yield limiter.acquire(borrower)
+            acquired.append(borrower)
+
+        start(work('a'))
+        frame_budget = defer_resumes(self)
+        task = start(work('b'))
+        limiter.release('a')
+        task.cancel()
+        frame_budget.flush()
+        # 届かなかったtokenは返される
+        self.assertEqual(acquired, ['a'])
+        self.assertEqual(limiter.borrowed_tokens, 0)
+        self.assertTrue(limiter.acquire_nowait('b'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -61,16 +61,16 @@ class NeverTestCase(unittest.TestCase):
 
         gen = func()
         # この時点で既にA行の"Inc(self)"は実行されている
-        self.assertEqual(self.counter, 4)
+        self.assertEqual(self.counter, 3)
         self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
         # A行の後のGeneratorの進め方はこちらに任されている
-        self.assertEqual(self.counter, 4)
+        self.assertEqual(self.counter, 3)
         self.assertEqual(next(gen), 'TEST')
-        self.assertEqual(self.counter, 5)
+        self.assertEqual(self.counter, 4)
         with self.assertRaises(StopIteration):
             next(gen)
         self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
-        self.assertEqual(self.counter, 6)
+        self.assertEqual(self.counter, 5)
 
     def test_operator_and(self):
 
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from inspect import getgeneratorstate, GEN_SUSPENDED
+
+import common_setup
+from callbackgoaway import start, Nursery, TaskState, Immediate
+from callbackgoaway.virtualclock import VirtualClock, Sleep
+from test_cancel import Pending
+
+
+def wait_for(event):
+    yield event
+
+
+class NurseryTestCase(unittest.TestCase):
+
+    def test_close_cancels_children(self):
+        pendings = [Pending() for __ in range(3)]
+        parent_pending = Pending()
+
+        def parent():
+            with Nursery() as nursery:
+                tasks = [nursery.start(wait_for(p)) for p in pendings]
+                yield parent_pending
+            return tasks
+
+        parent_task = start(parent())
+        parent_pending.fire()
+        tasks = parent_task.result
+        for p, task in zip(pendings, tasks):
+            self.assertEqual(task.state, TaskState.CANCELLED)
+            self.assertEqual(p.n_cancelled, 1)
+
+    def test_closing_parent_cancels_children(self):
+        pendings = [Pending() for __ in range(3)]
+
+        def parent():
+            with Nursery() as nursery:
+                for p in pendings:
+                    nursery.start(wait_for(p))
+                yield nursery.wait_all()
+
+        parent_task = start(parent())
+        self.assertEqual(getgeneratorstate(parent_task.gen), GEN_SUSPENDED)
+        parent_task.cancel()
+        for p in pendings:
+            self.assertEqual(p.n_cancelled, 1)
+
+    def test_child_cancels_its_nursery(self):
+        # 最初に終わった子が残りを止める
+        clock = VirtualClock()
+        finished = []
+
+        def child(seconds):
+            yield Sleep(seconds, clock=clock)
+            finished.append(seconds)
+            nursery.cancel()
+
+        nursery = Nursery()
+        tasks = [nursery.start(child(s)) for s in (1, 2, 3)]
+        clock.advance(5)
+        self.assertEqual(finished, [1])
+        self.assertEqual([t.state for t in tasks], [
+            TaskState.CANCELLED, TaskState.CANCELLED, TaskState.CANCELLED])
+        self.assertEqual(len(nursery), 0)
+        self.assertTrue(clock.idle)
+
+    def test_finished_children_are_forgotten(self):
+        pendings = [Pending() for __ in range(3)]
+        nursery = Nursery()
+        nursery.start(wait_for(Immediate()))
+        self.assertEqual(len(nursery), 0)
+        tasks = [nursery.start(wait_for(p)) for p in pendings]
+        self.assertEqual(len(nursery), 3)
+        pendings[1].fire()
+        self.assertEqual(nursery.children, (tasks[0], tasks[2], ))
+        nursery.close()
+        self.assertEqual(len(nursery), 0)
+        self.assertEqual(pendings[1].n_cancelled, 0)
+        with self.assertRaises(RuntimeError):
+            nursery.start(wait_for(Immediate()))
+
+    def test_wait_all(self):
+        pendings = [Pending() for __ in range(3)]
+
+        def parent():
+            nursery = Nursery()
+            for p in pendings:
+                nursery.start(wait_for(p))
+            yield nursery.wait_all()
+            # 子が居なければすぐに再開する
+            yield nursery.wait_all()
+
+        parent_task = start(parent())
+        pendings[2].fire()
+        pendings[0].fire()
+        self.assertFalse(parent_task.done)
+        pendings[1].fire()
+        self.assertEqual(parent_task.state, TaskState.FINISHED)
+
+    def test_wait_any(self):
+        pendings = [Pending() for __ in range(3)]
+
+        def parent():
+            with Nursery() as nursery:
+                tasks = [nursery.start(wait_for(p)) for p in pendings]
+                param = yield nursery.wait_any()
+            return tasks.index(param.args[0])
+
+        parent_task = start(parent())
+        pendings[1].fire()
+        self.assertEqual(parent_task.result, 1)
+        self.assertEqual(pendings[0].n_cancelled, 1)
+        self.assertEqual(pendings[2].n_cancelled, 1)
+
+    def test_cancel_wait(self):
+        child_pending = Pending()
+        other = Pending()
+        nursery = Nursery()
+        nursery.start(wait_for(child_pending))
+        parent_task = start(wait_for(nursery.wait_all() | other))
+        other.fire()
+        self.assertTrue(parent_task.done)
+        self.assertEqual(len(nursery._waiters), 0)
+        child_pending.fire()
+
+    def test_many_children(self):
+        pendings = [Pending() for __ in range(10000)]
+
+        def parent():
+            with Nursery() as nursery:
+                for p in pendings:
+                    nursery.start(wait_for(p))
+                yield nursery.wait_any()
+
+        start(parent())
+        pendings[0].fire()
+        self.assertEqual(sum(p.n_cancelled for p in pendings), 9999)
+
+
+if __name__ == '__main__':
+    unittest.main()
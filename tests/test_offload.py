@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+import asyncio
+import threading
+
+import common_setup
+from callbackgoaway import start, TaskState
+from callbackgoaway import offload
+from callbackgoaway.asyncio import RunInThread, RunInProcess, Sleep
+
+
+# process poolに渡すのでmoduleの最上位に置く
+def add(a, b=0):
+    return a + b
+
+
+def make_bytes(n):
+    return bytes(range(256)) * (n // 256)
+
+
+def shm_exists(name):
+    from multiprocessing import shared_memory
+    try:
+        shared_memory.SharedMemory(name=name).close()
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+class RunInThreadTestCase(unittest.TestCase):
+
+    def test_result_comes_back_on_loop_thread(self):
+
+        async def main():
+            main_thread = threading.get_ident()
+            resumed_on = []
+
+            def func():
+                param = yield RunInThread(
+                    lambda a, b=0: (threading.get_ident(), a + b), 1, b=2)
+                resumed_on.append(threading.get_ident())
+                return param.args[0].result()
+
+            task = start(func())
+            while not task.done:
+                await asyncio.sleep(.01)
+            worker, value = task.result
+            self.assertEqual(value, 3)
+            self.assertNotEqual(worker, main_thread)
+            self.assertEqual(resumed_on, [main_thread])
+
+        run(main())
+
+    def test_exception(self):
+
+        async def main():
+            def func():
+                param = yield RunInThread(lambda: 1 / 0)
+                try:
+                    param.args[0].result()
+                except ZeroDivisionError:
+                    return 'caught'
+
+            task = start(func())
+            while not task.done:
+                await asyncio.sleep(.01)
+            self.assertEqual(task.result, 'caught')
+
+        run(main())
+
+    def test_cancel(self):
+
+        async def main():
+            event = threading.Event()
+            resumed = []
+
+            def func():
+                yield RunInThread(event.wait) | Sleep(.01)
+                resumed.append(True)
+                yield Sleep(10)
+
+            task = start(func())
+            await asyncio.sleep(.05)
+            event.set()
+            await asyncio.sleep(.05)
+            # 負けたRunInThreadが後から終わっても再開しない
+            self.assertEqual(resumed, [True])
+            self.assertEqual(task.state, TaskState.STARTED)
+            task.cancel()
+
+        run(main())
+
+    def test_stats(self):
+        offload.set_max_workers(2)
+        self.addCleanup(offload.set_max_workers, None)
+
+        async def main():
+            event = threading.Event()
+
+            def func():
+                yield RunInThread(event.wait)
+
+            tasks = [start(func()) for __ in range(5)]
+            await asyncio.sleep(.05)
+            stats = offload.stats()
+            self.assertEqual(stats.max_workers, 2)
+            self.assertEqual(stats.running, 2)
+            self.assertEqual(stats.queued, 3)
+            self.assertGreaterEqual(stats.max_queued, 3)
+            completed = stats.completed
+            event.set()
+            while not all(t.done for t in tasks):
+                await asyncio.sleep(.01)
+            stats = offload.stats()
+            self.assertEqual(stats.running, 0)
+            self.assertEqual(stats.queued, 0)
+            self.assertEqual(stats.completed, completed + 5)
+
+        run(main())
+
+
+class RunInProcessTestCase(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        offload.set_max_processes(1)
+
+    @classmethod
+    def tearDownClass(cls):
+        offload.set_max_processes(None)
+
+    def run_task(self, gen):
+
+        async def main():
+            task = start(gen)
+            while not task.done:
+                await asyncio.sleep(.01)
+            return task.result
+
+        return run(main())
+
+    def test_result(self):
+
+        def func():
+            param = yield RunInProcess(add, 1, b=2)
+            return param.args[0].result()
+
+        self.assertEqual(self.run_task(func()), 3)
+
+    def test_exception(self):
+
+        def func():
+            param = yield RunInProcess(add, 1, 'a')
+            try:
+                param.args[0].result()
+            except TypeError:
+                return 'caught'
+
+        self.assertEqual(self.run_task(func()), 'caught')
+
+    @unittest.skipUnless(offload._can_share, 'needs POSIX shared memory')
+    def test_shared(self):
+
+        def func():
+            param = yield RunInProcess(offload.shared(make_bytes), 1024)
+            with param.args[0].result() as result:
+                self.assertIsInstance(result, offload.SharedResult)
+                self.assertEqual(result.nbytes, 1024)
+                self.assertEqual(result.buf[:3].tolist(), [0, 1, 2])
+                self.assertEqual(result.tobytes(), make_bytes(1024))
+            # with文を抜けたら解放される
+            self.assertFalse(shm_exists(result.name))
+            with self.assertRaises(ValueError):
+                result.buf
+            return True
+
+        self.assertTrue(self.run_task(func()))
+
+    @unittest.skipUnless(offload._can_share, 'needs POSIX shared memory')
+    def test_shared_released_with_generator(self):
+        names = []
+
+        def func():
+            param = yield RunInProcess(offload.shared(make_bytes), 256)
+            result = param.args[0].result()
+            names.append(result.name)
+            self.assertTrue(shm_exists(result.name))
+            yield Sleep(0)
+
+        self.run_task(func())
+        # generatorが終わって結果が捨てられたら解放される
+        self.assertFalse(shm_exists(names[0]))
+
+    def test_shared_non_buffer_result(self):
+
+        def func():
+            param = yield RunInProcess(offload.shared(add), 1, 2)
+            return param.args[0].result()
+
+        self.assertEqual(self.run_task(func()), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import common_setup
+from callbackgoaway import (
+    start, get_hooks, Hooks, GeneratorFunction as GF,
+)
+from callbackgoaway.profiler import Profiler
+from callbackgoaway.registry import Registry
+from callbackgoaway.virtualclock import VirtualClock, Sleep
+
+
+class RecordingHooks(Hooks):
+
+    def __init__(self):
+        super().__init__()
+        self.log = []
+
+    def on_spawn(self, gen):
+        self.log.append(('spawn', gen.__name__))
+
+    def on_resume(self, gen):
+        self.log.append(('resume', gen.__name__))
+
+    def on_suspend(self, gen, event):
+        self.log.append(('suspend', gen.__name__, type(event).__name__))
+
+    def on_finish(self, gen):
+        self.log.append(('finish', gen.__name__))
+
+
+class HooksTestCase(unittest.TestCase):
+
+    def setUp(self):
+        from callbackgoaway import set_hooks
+        self.hooks = RecordingHooks()
+        set_hooks(self.hooks)
+        self.addCleanup(set_hooks, None)
+
+    def test_chained_order(self):
+        log = []
+
+        class TaggedHooks(Hooks):
+            def __init__(self, tag):
+                self.tag = tag
+
+            def on_resume(self, gen):
+                log.append(('resume', self.tag))
+
+            def on_suspend(self, gen, event):
+                log.append(('suspend', self.tag))
+
+        outer = TaggedHooks('outer')
+        inner = TaggedHooks('inner')
+        outer.enable()
+        inner.enable()
+        clock = VirtualClock()
+
+        def func():
+            yield Sleep(1, clock=clock)
+
+        start(func())
+        # 後から加えた方がgeneratorの近くで呼ばれる
+        self.assertEqual(log, [
+            ('resume', 'outer'), ('resume', 'inner'),
+            ('suspend', 'inner'), ('suspend', 'outer'),
+        ])
+        inner.disable()
+        outer.disable()
+        # set_hooks()で設定した物は残る
+        self.assertIs(get_hooks(), self.hooks)
+
+    def test_order(self):
+        clock = VirtualClock()
+
+        def child():
+            yield Sleep(1, clock=clock)
+
+        def parent():
+            yield GF(child)
+
+        start(parent())
+        clock.advance(1)
+        self.assertEqual(self.hooks.log, [
+            ('spawn', 'parent'),
+            ('resume', 'parent'),
+            ('suspend', 'parent', 'GeneratorFunction'),
+            ('spawn', 'child'),
+            ('resume', 'child'),
+            ('suspend', 'child', 'Sleep'),
+            ('resume', 'child'),
+            ('finish', 'child'),
+            ('resume', 'parent'),
+            ('finish', 'parent'),
+        ])
+
+    def test_cancel(self):
+        clock = VirtualClock()
+
+        def func():
+            yield Sleep(1, clock=clock)
+
+        task = start(func())
+        task.cancel()
+        self.assertEqual(self.hooks.log[-1], ('finish', 'func'))
+
+
+class ProfilerTestCase(unittest.TestCase):
+
+    def test_stats(self):
+        clock = VirtualClock()
+        cpu_time = [0.]
+
+        def func():
+            for __ in range(3):
+                cpu_time[0] += 0.5
+                yield Sleep(2, clock=clock)
+
+        profiler = Profiler(cpu_timer=lambda: cpu_time[0],
+                            wall_timer=lambda: clock.now)
+        with profiler:
+            self.assertIs(get_hooks(), profiler)
+            start(func())
+            start(func())
+            clock.run_until_idle()
+        self.assertIsNone(get_hooks())
+
+        stats, = profiler.functions.values()
+        self.assertEqual(
+            stats.name, 'ProfilerTestCase.test_stats.<locals>.func')
+        self.assertEqual(stats.spawned, 2)
+        self.assertEqual(stats.finished, 2)
+        self.assertEqual(stats.steps, 8)
+        self.assertEqual(stats.step_time, 3.)
+        self.assertEqual(stats.max_step_time, .5)
+        self.assertEqual(stats.suspended_time, 12.)
+        event_stats = profiler.events[Sleep]
+        self.assertEqual(event_stats.waits, 6)
+        self.assertEqual(event_stats.suspended_time, 12.)
+        self.assertIn('Sleep', profiler.format_stats())
+
+    def test_generator_started_before_enabling(self):
+        clock = VirtualClock()
+
+        def func():
+            yield Sleep(1, clock=clock)
+            yield Sleep(1, clock=clock)
+
+        start(func())
+        with Profiler() as profiler:
+            clock.run_until_idle()
+        stats, = profiler.functions.values()
+        self.assertEqual(stats.spawned, 0)
+        self.assertEqual(stats.finished, 1)
+        self.assertEqual(stats.steps, 2)
+
+    def test_with_registry(self):
+        clock = VirtualClock()
+
+        def func():
+            yield Sleep(1, clock=clock)
+            yield Sleep(1, clock=clock)
+
+        with Registry() as registry:
+            with Profiler() as profiler:
+                start(func())
+                self.assertEqual(len(registry), 1)
+                clock.run_until_idle()
+                self.assertEqual(len(registry), 0)
+                start(func())
+            # Profilerを外してもRegistryは有効なまま
+            self.assertIs(get_hooks(), registry)
+            self.assertEqual(len(registry), 1)
+            clock.run_until_idle()
+            self.assertEqual(len(registry), 0)
+        self.assertIsNone(get_hooks())
+        stats, = profiler.functions.values()
+        self.assertEqual(stats.spawned, 2)
+        self.assertEqual(stats.finished, 1)
+        self.assertEqual(stats.steps, 4)
+
+    def test_disable_in_any_order(self):
+        registry = Registry()
+        profiler = Profiler()
+        registry.enable()
+        profiler.enable()
+        registry.disable()
+        self.assertIs(get_hooks(), profiler)
+        profiler.disable()
+        self.assertIsNone(get_hooks())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+'''pygletの代役を用いてcallbackgoaway.pygletのEventを試す
+
+代役のEventDispatcherは本物と同じくhandler stackを_event_stackに持ち、上の
+frameから順にhandlerを呼び、EVENT_HANDLEDを返すhandlerが居るとそこで止める。
+bound methodはWeakMethodで包んで保持する。
+'''
+
+import gc
+import sys
+import unittest
+import importlib
+from inspect import ismethod
+from types import ModuleType
+from weakref import WeakMethod, ref
+
+import common_setup
+from callbackgoaway import start, TaskState
+
+EVENT_HANDLED = True
+EVENT_UNHANDLED = None
+
+
+class EventDispatcher:
+    '''pyglet.event.EventDispatcherの代役'''
+
+    _event_stack = ()
+
+    @classmethod
+    def register_event_type(cls, name):
+        pass
+
+    def push_handlers(self, **kwargs):
+        if type(self._event_stack) is tuple:
+            self._event_stack = []
+        self._event_stack.insert(0, {})
+        for name, handler in kwargs.items():
+            self.set_handler(name, handler)
+
+    def pop_handlers(self):
+        del self._event_stack[0]
+
+    def set_handler(self, name, handler):
+        if type(self._event_stack) is tuple:
+            self._event_stack = [{}]
+        if ismethod(handler):
+            handler = WeakMethod(handler)
+        self._event_stack[0][name] = handler
+
+    def remove_handler(self, name, handler):
+        stack = self._event_stack
+        for i, frame in enumerate(stack):
+            if _resolve(frame.get(name)) == handler:
+                del frame[name]
+                if not frame:
+                    del stack[i]
+                break
+
+    def dispatch_event(self, name, *args):
+        for frame in list(self._event_stack):
+            handler = _resolve(frame.get(name))
+            if handler is not None and handler(*args):
+                return EVENT_HANDLED
+        return EVENT_UNHANDLED
+
+
+def _resolve(handler):
+    if isinstance(handler, WeakMethod):
+        return handler()
+    return handler
+
+
+def load_pyglet_backend():
+    pyglet = ModuleType('pyglet')
+    pyglet.clock = pyglet_clock = ModuleType('pyglet.clock')
+    # Eventしか試さないのでclockは読み込むのに要る物だけを用意する
+    for name in ('schedule', 'schedule_once', 'schedule_interval',
+                 'unschedule', ):
+        setattr(pyglet_clock, name, lambda *args: None)
+    pyglet.event = pyglet_event = ModuleType('pyglet.event')
+    pyglet_event.EVENT_HANDLED = EVENT_HANDLED
+    pyglet_event.EVENT_UNHANDLED = EVENT_UNHANDLED
+    pyglet_event.EventDispatcher = EventDispatcher
+    modules = {
+        'pyglet': pyglet, 'pyglet.clock': pyglet_clock,
+        'pyglet.event': pyglet_event,
+    }
+    names = tuple(modules) + ('callbackgoaway.pyglet', )
+    saved = {name: sys.modules.pop(name, None) for name in names}
+    sys.modules.update(modules)
+    try:
+        return importlib.import_module('callbackgoaway.pyglet')
+    finally:
+        for name in names:
+            sys.modules.pop(name, None)
+            if saved[name] is not None:
+                sys.modules[name] = saved[name]
+
+
+backend = load_pyglet_backend()
+Event = backend.Event
+
+
+class Window(EventDispatcher):
+    pass
+
+
+class ScanCountingList(list):
+    '''走査された回数を数えるlist'''
+
+    scans = 0
+
+    def __iter__(self):
+        self.scans += 1
+        return super().__iter__()
+
+
+Window.register_event_type('on_key_press')
+
+
+class PygletEventTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.window = Window()
+
+    def wait(self, resumed, key=None):
+        return self.wait_on(self.window, resumed, key)
+
+    def wait_on(self, window, resumed, key=None):
+        def func():
+            param = yield Event(window, 'on_key_press')
+            resumed.append(param.args if key is None else key)
+        return start(func())
+
+    def test_one_handler_for_many_waiters(self):
+        resumed = []
+        tasks = [self.wait(resumed) for __ in range(100)]
+        self.assertEqual(len(self.window._event_stack), 1)
+        self.window.dispatch_event('on_key_press', 'A', 0)
+        self.assertEqual(resumed, [('A', 0)] * 100)
+        for task in tasks:
+            self.assertEqual(task.state, TaskState.FINISHED)
+        # 再び待ってもhandlerは増えない
+        self.wait(resumed)
+        self.assertEqual(len(self.window._event_stack), 1)
+
+    def test_fifo(self):
+        resumed = []
+        for i in range(5):
+            self.wait(resumed, i)
+        self.window.dispatch_event('on_key_press', 'A', 0)
+        self.assertEqual(resumed, [0, 1, 2, 3, 4])
+
+    def test_cancel(self):
+        resumed = []
+        tasks = [self.wait(resumed, i) for i in range(3)]
+        stack = [dict(frame) for frame in self.window._event_stack]
+        tasks[1].cancel()
+        # 取り消してもhandler stackは触らない
+        self.assertEqual(self.window._event_stack, stack)
+        self.window.dispatch_event('on_key_press', 'A', 0)
+        self.assertEqual(resumed, [0, 2])
+        self.assertEqual(tasks[1].state, TaskState.CANCELLED)
+
+    def test_returns_unhandled(self):
+        received = []
+        self.window.push_handlers(
+            on_key_press=lambda *args: received.append(args))
+        resumed = []
+        self.wait(resumed)
+        result = self.window.dispatch_event('on_key_press', 'A', 0)
+        # 下のhandlerにもEventが伝わる
+        self.assertIs(result, EVENT_UNHANDLED)
+        self.assertEqual(resumed, [('A', 0)])
+        self.assertEqual(received, [('A', 0)])
+
+    def test_moved_to_top_when_waiting_again(self):
+        resumed = []
+        self.wait(resumed, 0)
+        self.window.dispatch_event('on_key_press', 'A', 0)
+        # 後からpushされたhandlerがEventを握りつぶしても、待ち始める時に共有
+        # のhandlerがその上へ積み直される
+        self.window.push_handlers(on_key_press=lambda *args: EVENT_HANDLED)
+        self.wait(resumed, 1)
+        self.window.dispatch_event('on_key_press', 'A', 0)
+        self.assertEqual(resumed, [0, 1])
+        self.assertEqual(len(self.window._event_stack), 2)
+
+    def test_repushed_after_pop_handlers(self):
+        resumed = []
+        task = self.wait(resumed, 0)
+        self.window.pop_handlers()
+        self.window.dispatch_event('on_key_press', 'A', 0)
+        self.assertEqual(resumed, [])
+        # 待っている物が居なくなった後に待ち始める時に積み直される
+        task.cancel()
+        self.wait(resumed, 1)
+        self.assertEqual(len(self.window._event_stack), 1)
+        self.window.dispatch_event('on_key_press', 'A', 0)
+        self.assertEqual(resumed, [1])
+
+    def test_repushed_after_set_handler(self):
+        received = []
+        resumed = []
+        self.wait(resumed, 0)
+        self.window.dispatch_event('on_key_press', 'A', 0)
+        # 共有のhandlerのframeが一番上にある時にset_handler()すると上書きされ
+        # る
+        self.window.set_handler('on_key_press',
+                                lambda *args: received.append(args))
+        self.wait(resumed, 1)
+        self.window.dispatch_event('on_key_press', 'B', 0)
+        self.assertEqual(resumed, [0, 1])
+        # 上書きしたhandlerは取り除かれない
+        self.assertEqual(received, [('B', 0)])
+        self.assertEqual(len(self.window._event_stack), 2)
+
+    def test_waiting_does_not_scan_the_stack(self):
+        # 積み直すか否かを調べるのは待っている物が居ない時だけ
+        resumed = []
+        self.wait(resumed, 0)
+        stack = self.window._event_stack = ScanCountingList(
+            self.window._event_stack)
+        for i in range(1, 10):
+            self.wait(resumed, i)
+        self.assertEqual(stack.scans, 0)
+
+    def test_dispatcher_with_pending_wait_is_collected(self):
+        window = self.window
+        del self.window
+        task = self.wait_on(window, [])
+        window_ref = ref(window)
+        gen_ref = ref(task.gen)
+        del window, task
+        gc.collect()
+        # 待っている最中でもEventDispatcherとgeneratorは生き残らない
+        self.assertIsNone(window_ref())
+        self.assertIsNone(gen_ref())
+
+if __name__ == '__main__':
+    unittest.main()
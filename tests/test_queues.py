@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import common_setup
+from callbackgoaway import start, TaskState
+from callbackgoaway.framebudget import FrameBudget
+from callbackgoaway.queues import Queue, QueueEmpty, QueueFull
+from callbackgoaway.virtualclock import VirtualClock, Sleep
+
+
+def defer_resumes(testcase):
+    '''再開をrun queueに溜め、flush()するまで後回しにする'''
+    frame_budget = FrameBudget(1, schedule_drain=lambda drain: None)
+    frame_budget.enable()
+    testcase.addCleanup(frame_budget.disable)
+    return frame_budget
+
+
+class QueueTestCase(unittest.TestCase):
+
+    def test_consumer_waits_for_item(self):
+        queue = Queue()
+        got = []
+
+        def consumer():
+            while True:
+                param = yield queue.get()
+                got.append(param.args[0])
+
+        start(consumer())
+        self.assertEqual(got, [])
+        queue.put_nowait(1)
+        self.assertEqual(got, [1])
+        self.assertEqual(len(queue), 0)
+        queue.put_nowait(2)
+        self.assertEqual(got, [1, 2])
+
+    def test_backpressure(self):
+        queue = Queue(capacity=2)
+        put = []
+
+        def producer():
+            for i in range(5):
+                yield queue.put(i)
+                put.append(i)
+
+        task = start(producer())
+        self.assertEqual(put, [0, 1])
+        self.assertTrue(queue.full)
+        with self.assertRaises(QueueFull):
+            queue.put_nowait(-1)
+        self.assertEqual(queue.get_nowait(), 0)
+        # 空きが出来たので待っていたproducerが再開する
+        self.assertEqual(put, [0, 1, 2])
+        self.assertEqual([queue.get_nowait() for __ in range(2)], [1, 2])
+        self.assertEqual(put, [0, 1, 2, 3, 4])
+        self.assertEqual(task.state, TaskState.FINISHED)
+        self.assertEqual(list(queue._items), [3, 4])
+
+    def test_producer_and_consumer(self):
+        clock = VirtualClock()
+        queue = Queue(capacity=3)
+        got = []
+
+        def producer():
+            for i in range(10):
+                yield queue.put(i)
+
+        def consumer():
+            while True:
+                param = yield queue.get()
+                got.append(param.args[0])
+                yield Sleep(1, clock=clock)
+
+        start(producer())
+        start(consumer())
+        clock.run_until_idle()
+        self.assertEqual(got, list(range(10)))
+        # Sleep(0)で様子を見るような事はしないので、一つ受け取る毎に1秒
+        self.assertEqual(clock.now, 10)
+
+    def test_get_many(self):
+        queue = Queue(capacity=4)
+        got = []
+
+        def consumer():
+            while True:
+                param = yield queue.get_many(3)
+                got.append(param.args[0])
+
+        for i in range(4):
+            queue.put_nowait(i)
+        start(consumer())
+        # 一度目で3つ、二度目で残りの1つを受け取り、三度目で待つ
+        self.assertEqual(got, [[0, 1, 2], [3]])
+        queue.put_nowait(4)
+        self.assertEqual(got, [[0, 1, 2], [3], [4]])
+
+    def test_get_many_accepts_waiting_putters(self):
+        queue = Queue(capacity=2)
+
+        def producer():
+            for i in range(4):
+                yield queue.put(i)
+
+        task = start(producer())
+
+        def consumer():
+            param = yield queue.get_many()
+            return param.args[0]
+
+        self.assertEqual(start(consumer()).result, [0, 1])
+        self.assertEqual(task.state, TaskState.FINISHED)
+        self.assertEqual(list(queue._items), [2, 3])
+
+    def test_cancel(self):
+        clock = VirtualClock()
+        queue = Queue(capacity=1)
+        queue.put_nowait('a')
+
+        def putter():
+            yield queue.put('b') | Sleep(1, clock=clock)
+
+        task = start(putter())
+        clock.advance(1)
+        self.assertEqual(task.state, TaskState.FINISHED)
+        # 取り消されたputterの値は入らない
+        self.assertEqual(queue.get_nowait(), 'a')
+        with self.assertRaises(QueueEmpty):
+            queue.get_nowait()
+
+    def test_getter_cancelled_before_deferred_resume(self):
+        queue = Queue()
+        got = []
+
+        def consumer():
+            param = yield queue.get()
+            got.append(param.args[0])
+
+        frame_budget = defer_resumes(self)
+        task = start(consumer())
+        start(consumer())
+        queue.put_nowait('a')
+        # 'a'は渡されたが再開はまだ。ここで取り消されたら次のgetterへ渡す
+        task.cancel()
+        frame_budget.flush()
+        self.assertEqual(got, ['a'])
+        self.assertTrue(queue.empty)
+
+    def test_getter_cancelled_puts_item_back_to_front(self):
+        queue = Queue()
+
+        def consumer():
+            yield queue.get()
+
+        frame_budget = defer_resumes(self)
+        task = start(consumer())
+        queue.put_nowait('a')
+        queue.put_nowait('b')
+        task.cancel()
+        frame_budget.flush()
+        self.assertEqual(list(queue._items), ['a', 'b'])
+
+    def test_putter_cancelled_before_deferred_resume(self):
+        queue = Queue(capacity=1)
+        queue.put_nowait('a')
+        put = []
+
+        def producer(item):
+            yield queue.put(item)
+            put.append(item)
+
+        frame_budget = defer_resumes(self)
+        task = start(producer('b'))
+        start(producer('c'))
+        self.assertEqual(queue.get_nowait(), 'a')
+        # 'b'は受け入れられたが再開はまだ。取り消されたら取り除いて次を入れる
+        task.cancel()
+        frame_budget.flush()
+        self.assertEqual(put, ['c'])
+        self.assertEqual(list(queue._items), ['c'])
+
+    def test_many_cancelled_getters_do_not_pile_up(self):
+        clock = VirtualClock()
+        queue = Queue()
+
+        def poller():
+            for __ in range(1000):
+                yield queue.get() | Sleep(1, clock=clock)
+
+        start(poller())
+        clock.run_until_idle()
+        self.assertLess(len(queue._getters._deque), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+import gc
+import unittest
+import weakref
+
+import common_setup
+from callbackgoaway import start, get_hooks, Never
+from callbackgoaway.registry import Registry
+from callbackgoaway.virtualclock import (
+    VirtualClock, Sleep, Event, EventEmitter,
+)
+
+
+class RegistryTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = clock = VirtualClock()
+        self.registry = Registry(clock=lambda: clock.now)
+        self.registry.enable()
+        self.addCleanup(self.registry.disable)
+
+    def test_snapshot(self):
+        clock = self.clock
+
+        def sleeper():
+            yield Sleep(10, clock=clock)
+
+        def forever(event):
+            yield event
+
+        start(sleeper())
+        never = Never()
+        task = start(forever(never))
+        clock.advance(3)
+        snapshot = self.registry.snapshot()
+        self.assertEqual(len(snapshot), 2)
+        first, second = sorted(snapshot, key=lambda c: c.serial)
+        self.assertEqual(first.name, 'RegistryTestCase.test_snapshot'
+                                     '.<locals>.sleeper')
+        self.assertIs(first.event_type, Sleep)
+        # Sleepは弱参照を作れない
+        self.assertIsNone(first.event)
+        self.assertEqual(first.waiting_for, 3)
+        self.assertGreater(first.retained_size, 0)
+        self.assertIs(second.event_type, Never)
+        self.assertIs(second.gen_ref(), task.gen)
+        clock.run_until_idle()
+        self.assertEqual(len(self.registry.snapshot()), 1)
+        task.cancel()
+        self.assertEqual(len(self.registry.snapshot()), 0)
+
+    def test_diff(self):
+        def forever():
+            yield Never()
+
+        start(forever())
+        before = self.registry.snapshot()
+        tasks = [start(forever()) for __ in range(3)]
+        tasks[0].cancel()
+        leaked = self.registry.snapshot().diff(before)
+        self.assertEqual([c.gen_ref() for c in leaked],
+                         [t.gen for t in tasks[1:]])
+        self.assertEqual(
+            self.registry.snapshot().by_name(),
+            {'RegistryTestCase.test_diff.<locals>.forever': 3})
+
+    def test_does_not_keep_generators_alive(self):
+        def forever():
+            yield Never()
+
+        task = start(forever())
+        self.assertEqual(len(self.registry), 1)
+        del task
+        gc.collect()
+        self.assertEqual(len(self.registry), 0)
+
+    def test_weakly_referable_event(self):
+        class WeakNever(Never):
+            __slots__ = ('__weakref__', )
+
+        def forever(event):
+            yield event
+
+        event = WeakNever()
+        start(forever(event))
+        coro, = self.registry.snapshot()
+        self.assertIs(coro.event_type, WeakNever)
+        self.assertIs(coro.event, event)
+
+    def test_does_not_keep_waiting_generators_alive(self):
+        # Eventはresume_genを通してgeneratorを強参照するので、registryが
+        # Eventを強参照するとgeneratorが生き残ってしまう
+        # registryの時計とは別の時計を使い、捨てられるようにする
+        clock = VirtualClock()
+        emitter = EventEmitter()
+
+        def sleeper():
+            yield Sleep(10, clock=clock)
+
+        def waiter():
+            yield Event(emitter, 'go')
+
+        sleeper_ref = weakref.ref(start(sleeper()).gen)
+        waiter_ref = weakref.ref(start(waiter()).gen)
+        self.assertEqual(len(self.registry), 2)
+        del clock, emitter
+        gc.collect()
+        self.assertIsNone(sleeper_ref())
+        self.assertIsNone(waiter_ref())
+        self.assertEqual(len(self.registry), 0)
+
+    def test_disable(self):
+        self.assertIs(get_hooks(), self.registry)
+        self.registry.disable()
+        self.assertIsNone(get_hooks())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import common_setup
+from callbackgoaway import start, Signal, Immediate, TaskState
+
+
+class SignalTestCase(unittest.TestCase):
+
+    def test_fire(self):
+        signal = Signal()
+        resumed = []
+
+        def waiter(i):
+            param = yield signal
+            resumed.append((i, param.args, param.kwargs))
+
+        for i in range(3):
+            start(waiter(i))
+        self.assertEqual(len(signal), 3)
+        signal.fire(1, a=2)
+        self.assertEqual(resumed, [(i, (1, ), {'a': 2}) for i in range(3)])
+        self.assertEqual(len(signal), 0)
+        signal.fire()  # 誰も待っていなくても良い
+
+    def test_rewait_waits_for_next_fire(self):
+        signal = Signal()
+        counts = [0]
+
+        def waiter():
+            while True:
+                yield signal
+                counts[0] += 1
+
+        start(waiter())
+        signal.fire()
+        self.assertEqual(counts, [1])
+        signal.fire()
+        self.assertEqual(counts, [2])
+
+    def test_cancel(self):
+        signal = Signal()
+
+        def func():
+            yield signal | Immediate()
+
+        task = start(func())
+        self.assertEqual(task.state, TaskState.FINISHED)
+        self.assertEqual(len(signal), 0)
+
+    def test_cancel_during_fire(self):
+        # 先に再開したgeneratorが後のgeneratorの待機を取り消す
+        signal = Signal()
+        tasks = []
+
+        def first():
+            yield signal
+            tasks[1].cancel()
+
+        def second():
+            yield signal
+
+        tasks.append(start(first()))
+        tasks.append(start(second()))
+        signal.fire()
+        self.assertEqual(tasks[0].state, TaskState.FINISHED)
+        self.assertEqual(tasks[1].state, TaskState.CANCELLED)
+
+    def test_many_waiters(self):
+        signal = Signal()
+
+        def waiter():
+            yield signal
+
+        tasks = [start(waiter()) for __ in range(10000)]
+        for task in tasks[::2]:
+            task.cancel()
+        signal.fire()
+        self.assertTrue(all(t.state is TaskState.FINISHED
+                            for t in tasks[1::2]))
+
+    def test_has_no_dict(self):
+        self.assertFalse(hasattr(Signal(), '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
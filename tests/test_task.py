@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from inspect import getgeneratorstate, GEN_CLOSED, GEN_SUSPENDED
+
+import common_setup
+from callbackgoaway import (
+    start, Task, TaskState, InvalidStateError, Immediate, Never, Or,
+)
+from test_cancel import Pending
+
+
+def wait_for(event):
+    yield event
+
+
+class TaskTestCase(unittest.TestCase):
+
+    def test_result(self):
+        p = Pending()
+
+        def func():
+            yield p
+            return 'result'
+
+        task = start(func())
+        self.assertIsInstance(task, Task)
+        self.assertEqual(task.state, TaskState.STARTED)
+        self.assertFalse(task.done)
+        with self.assertRaises(InvalidStateError):
+            task.result
+        p.fire()
+        self.assertEqual(task.state, TaskState.FINISHED)
+        self.assertTrue(task.done)
+        self.assertEqual(task.result, 'result')
+        self.assertIsNone(task.exception)
+
+    def test_exception(self):
+        p = Pending()
+
+        def func():
+            yield p
+            raise ZeroDivisionError
+
+        task = start(func())
+        # 例外は今まで通りgeneratorを再開させた側にも伝わる
+        with self.assertRaises(ZeroDivisionError):
+            p.fire()
+        self.assertEqual(task.state, TaskState.FAILED)
+        self.assertIsInstance(task.exception, ZeroDivisionError)
+        with self.assertRaises(ZeroDivisionError):
+            task.result
+
+    def test_cancel(self):
+        p = Pending()
+
+        def func():
+            yield p
+
+        task = start(func())
+        task.cancel()
+        self.assertEqual(task.state, TaskState.CANCELLED)
+        self.assertTrue(task.cancelled)
+        self.assertEqual(p.n_cancelled, 1)
+        self.assertEqual(getgeneratorstate(task.gen), GEN_CLOSED)
+        with self.assertRaises(InvalidStateError):
+            task.result
+        task.cancel()  # 二度目は何もしない
+        self.assertEqual(p.n_cancelled, 1)
+
+    def test_cancel_itself(self):
+        p = Pending()
+        tasks = []
+        closed = []
+
+        def func():
+            try:
+                yield p
+                tasks[0].cancel()
+                yield Never()
+            finally:
+                closed.append(True)
+
+        tasks.append(start(func()))
+        p.fire()
+        self.assertEqual(tasks[0].state, TaskState.CANCELLED)
+        self.assertEqual(closed, [True])
+
+    def test_cancel_itself_and_return(self):
+        p = Pending()
+        tasks = []
+
+        def func():
+            yield p
+            tasks[0].cancel()
+            return 'result'
+
+        tasks.append(start(func()))
+        p.fire()
+        self.assertEqual(tasks[0].state, TaskState.CANCELLED)
+
+    def test_done_callback(self):
+        p = Pending()
+        called = []
+
+        def func():
+            yield p
+
+        task = start(func())
+        task.add_done_callback(called.append)
+        self.assertEqual(called, [])
+        p.fire()
+        self.assertEqual(called, [task])
+        # 既に終わっていればすぐに呼ばれる
+        task.add_done_callback(called.append)
+        self.assertEqual(called, [task, task])
+
+    def test_done_callback_on_cancel(self):
+        called = []
+        task = start(wait_for(Never()))
+        task.add_done_callback(called.append)
+        task.remove_done_callback(called.append)
+        task.add_done_callback(lambda t: called.append(t.state))
+        task.cancel()
+        self.assertEqual(called, [TaskState.CANCELLED])
+
+    def test_synchronous_finish(self):
+        def func():
+            yield Immediate()
+            return 1
+
+        task = start(func())
+        self.assertEqual(task.result, 1)
+
+    def test_wait_for_task(self):
+        p = Pending()
+
+        def child():
+            yield p
+            return 'child'
+
+        def parent(task):
+            param = yield task
+            return param.args[0].result
+
+        child_task = start(child())
+        parent_task = start(parent(child_task))
+        self.assertFalse(parent_task.done)
+        p.fire()
+        self.assertEqual(parent_task.result, 'child')
+
+    def test_wait_for_finished_task(self):
+        def parent(task):
+            yield task
+            return 'parent'
+
+        task = start(wait_for(Immediate()))
+        self.assertTrue(task.done)
+        self.assertEqual(start(parent(task)).result, 'parent')
+
+    def test_losing_or_does_not_stop_task(self):
+        p1 = Pending()
+        p2 = Pending()
+
+        def child():
+            yield p1
+
+        def parent(task):
+            yield task | p2
+
+        child_task = start(child())
+        parent_task = start(parent(child_task))
+        p2.fire()
+        self.assertTrue(parent_task.done)
+        self.assertFalse(child_task.done)
+        self.assertEqual(getgeneratorstate(child_task.gen), GEN_SUSPENDED)
+        # 待つのを止めたgeneratorは再開されない
+        p1.fire()
+        self.assertEqual(child_task.state, TaskState.FINISHED)
+
+    def test_has_no_dict(self):
+        task = start(wait_for(Never()))
+        self.assertFalse(hasattr(task, '__dict__'))
+
+
+if __name__ == '__main__':
+    unittest.main()
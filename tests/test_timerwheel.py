@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from inspect import getgeneratorstate, GEN_CLOSED
+
+import common_setup
+from callbackgoaway import callbackgoaway, EventBase
+from callbackgoaway.timerwheel import TimerWheel
+
+
+class TimerWheelTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.
+        self.ticking = []
+        self.wheel = TimerWheel(
+            1.,
+            start_ticking=self.start_ticking,
+            stop_ticking=self.stop_ticking,
+            now=lambda: self.now,
+            slots_per_level=4,
+            num_levels=3,
+        )
+
+    def start_ticking(self, tick):
+        self.ticking.append(tick)
+        return tick
+
+    def stop_ticking(self, tick):
+        self.ticking.remove(tick)
+
+    def advance(self, seconds):
+        '''1秒毎にtickを呼びながら時間を進める'''
+        for __ in range(int(seconds)):
+            self.now += 1.
+            for tick in self.ticking[:]:
+                tick()
+
+    def test_order_and_elapsed(self):
+        called = []
+        wheel = self.wheel
+        for delay in (3, 1, 2, 1):
+            wheel.add(delay, lambda dt, d=delay: called.append((d, dt)))
+        self.assertEqual(len(self.ticking), 1)
+        self.advance(1)
+        self.assertEqual(called, [(1, 1), (1, 1), ])
+        self.advance(2)
+        self.assertEqual(called, [(1, 1), (1, 1), (2, 2), (3, 3), ])
+        # timerが無くなったらtoolkitのtimerは止まる
+        self.assertEqual(self.ticking, [])
+        self.assertEqual(len(wheel), 0)
+
+    def test_long_delays(self):
+        # slots_per_level ** num_levels (= 64) tickを超えるものも含む
+        called = []
+        delays = (1, 3, 4, 5, 15, 16, 17, 63, 64, 65, 100, 200, )
+        for delay in reversed(delays):
+            self.wheel.add(delay, lambda dt, d=delay: called.append(d))
+        for delay in delays:
+            self.advance(delay - self.now - 1)
+            self.assertNotIn(delay, called)
+            self.advance(1)
+            self.assertEqual(called[-1], delay)
+        self.assertEqual(called, list(delays))
+
+    def test_cancel(self):
+        called = []
+        wheel = self.wheel
+        timer = wheel.add(2, called.append)
+        wheel.add(2, called.append).cancel()
+        timer.cancel()
+        timer.cancel()
+        self.assertEqual(len(wheel), 0)
+        self.advance(3)
+        self.assertEqual(called, [])
+        self.assertEqual(self.ticking, [])
+
+    def test_late_tick(self):
+        # toolkitのtimerが遅れても期限の過ぎたtimerはまとめて呼ばれる
+        called = []
+        for delay in (1, 2, 3, 9, ):
+            self.wheel.add(delay, lambda dt, d=delay: called.append(d))
+        self.now = 5.
+        self.ticking[0]()
+        self.assertEqual(called, [1, 2, 3, ])
+
+    def test_restart(self):
+        called = []
+        self.wheel.add(1, called.append)
+        self.advance(1)
+        self.assertEqual(self.ticking, [])
+        self.now += 100.5
+        self.wheel.add(1, lambda dt: called.append('second'))
+        self.advance(1)
+        self.assertEqual(called[-1], 'second')
+
+    def test_cancelled_within_a_batch(self):
+        wheel = self.wheel
+
+        class Sleep(EventBase):
+            __slots__ = ('seconds', 'timer', )
+
+            def __init__(self, seconds):
+                self.seconds = seconds
+
+            def __call__(self, resume_gen):
+                self.timer = wheel.add(self.seconds, resume_gen)
+
+            def cancel(self, resume_gen):
+                self.timer.cancel()
+
+        @callbackgoaway
+        def func():
+            yield Sleep(1) | Sleep(1)
+            yield Sleep(1)
+
+        gen = func()
+        self.advance(2)
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(len(wheel), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
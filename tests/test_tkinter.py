@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+'''tkinterのwidgetの代役を用いてcallbackgoaway.tkinterのEventを試す
+
+代役のwidgetは本物と同じくsequence毎のbinding scriptを持ち、'+'付きの
+bind()はscriptに一行足し、'+'無しのbind()とunbind()はscriptを丸ごと置き換え
+る(patch_unbind()を当てる前の本物のunbind()と同じ)。
+'''
+
+import gc
+import unittest
+from itertools import count
+from weakref import ref
+
+import common_setup
+from callbackgoaway import start, TaskState
+from callbackgoaway.tkinter import Event
+
+
+class UnweakrefableWidget:
+    '''bind(), unbind(), deletecommand()の代役。弱参照を作れない'''
+
+    __slots__ = ('scripts', 'commands', 'calls', )
+
+    _ids = count()
+
+    def __init__(self):
+        # {sequence: [funcid, ...]}
+        self.scripts = {}
+        # {funcid: func}
+        self.commands = {}
+        self.calls = []
+
+    def bind(self, sequence, func=None, add=None):
+        self.calls.append('bind')
+        if func is None:
+            return ''.join(
+                f'if {{"[{funcid} %#]" == "break"}} break\n'
+                for funcid in self.scripts.get(sequence, ()))
+        funcid = f'{next(self._ids)}{func.__name__}'
+        self.commands[funcid] = func
+        funcids = self.scripts.get(sequence, []) if add else []
+        self.scripts[sequence] = funcids + [funcid]
+        return funcid
+
+    def unbind(self, sequence, funcid=None):
+        self.calls.append('unbind')
+        self.scripts[sequence] = []
+        if funcid:
+            self.deletecommand(funcid)
+
+    def deletecommand(self, funcid):
+        del self.commands[funcid]
+
+    def event_generate(self, sequence, event):
+        for funcid in self.scripts.get(sequence, [])[:]:
+            self.commands[funcid](event)
+
+
+class Widget(UnweakrefableWidget):
+    __slots__ = ('__weakref__', )
+
+
+class TkinterEventTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.widget = Widget()
+
+    def wait(self, resumed, key, widget=None):
+        widget = self.widget if widget is None else widget
+
+        def func():
+            param = yield Event(widget, '<Button-1>')
+            resumed.append((key, param.args[0]))
+        return start(func())
+
+    def test_one_bind_for_many_waiters(self):
+        resumed = []
+        tasks = [self.wait(resumed, i) for i in range(100)]
+        self.assertEqual(len(self.widget.scripts['<Button-1>']), 1)
+        self.assertEqual(len(self.widget.commands), 1)
+        self.widget.event_generate('<Button-1>', 'e')
+        self.assertEqual(resumed, [(i, 'e') for i in range(100)])
+        for task in tasks:
+            self.assertEqual(task.state, TaskState.FINISHED)
+        self.wait(resumed, 100)
+        self.assertEqual(len(self.widget.scripts['<Button-1>']), 1)
+
+    def test_fifo(self):
+        resumed = []
+        for i in range(5):
+            self.wait(resumed, i)
+        self.widget.event_generate('<Button-1>', 'e')
+        self.assertEqual([key for key, __ in resumed], [0, 1, 2, 3, 4])
+
+    def test_cancel_without_touching_tcl(self):
+        resumed = []
+        tasks = [self.wait(resumed, i) for i in range(3)]
+        calls = self.widget.calls[:]
+        tasks[1].cancel()
+        self.assertEqual(self.widget.calls, calls)
+        self.widget.event_generate('<Button-1>', 'e')
+        self.assertEqual([key for key, __ in resumed], [0, 2])
+        self.assertEqual(tasks[1].state, TaskState.CANCELLED)
+
+    def test_unweakrefable_widget(self):
+        # 共有のcallbackを使えないので待つ度にbindし、終わればunbindする
+        widget = UnweakrefableWidget()
+        resumed = []
+        self.wait(resumed, 0, widget)
+        self.assertEqual(len(widget.commands), 1)
+        widget.event_generate('<Button-1>', 'e')
+        self.assertEqual(resumed, [(0, 'e')])
+        self.assertEqual(widget.commands, {})
+        task = self.wait(resumed, 1, widget)
+        self.assertEqual(len(widget.commands), 1)
+        task.cancel()
+        self.assertEqual(widget.commands, {})
+        self.assertEqual(widget.calls, ['bind', 'unbind'] * 2)
+
+    def test_rebound_after_unbind(self):
+        other = self.widget.bind('<Button-1>', lambda event: None, '+')
+        resumed = []
+        self.wait(resumed, 0)
+        self.widget.event_generate('<Button-1>', 'e')
+        # 代役のunbind()はpatchを当てる前の本物と同じくsequence全体を外す
+        self.widget.unbind('<Button-1>', other)
+        # 次に待ち始める時にbindし直す
+        self.wait(resumed, 1)
+        self.assertEqual(len(self.widget.scripts['<Button-1>']), 1)
+        # 外れたbindingのcommandは消される
+        self.assertEqual(len(self.widget.commands), 1)
+        self.widget.event_generate('<Button-1>', 'f')
+        self.assertEqual(resumed, [(0, 'e'), (1, 'f')])
+
+    def test_binding_checked_only_at_round_start(self):
+        resumed = []
+        self.wait(resumed, 0)
+        self.assertEqual(self.widget.calls, ['bind'])
+        for i in range(1, 10):
+            self.wait(resumed, i)
+        self.assertEqual(self.widget.calls, ['bind'])
+        self.widget.event_generate('<Button-1>', 'e')
+        # 次の回の最初の一つはbindingが残っているかを調べる
+        self.wait(resumed, 10)
+        self.wait(resumed, 11)
+        self.assertEqual(self.widget.calls, ['bind', 'bind'])
+
+    def test_unbind_patched(self):
+        import tkinter
+        from callbackgoaway.tkinter import _new_unbind
+        self.wait([], 0)
+        self.assertIs(tkinter.Misc.unbind, _new_unbind)
+
+    def test_widget_with_pending_wait_is_collected(self):
+        widget = Widget()
+        task = self.wait([], 0, widget)
+        widget_ref = ref(widget)
+        gen_ref = ref(task.gen)
+        del widget, task
+        gc.collect()
+        # 待っている最中でもwidgetとgeneratorは生き残らない
+        self.assertIsNone(widget_ref())
+        self.assertIsNone(gen_ref())
+
+    def test_rebound_after_bind_without_add(self):
+        received = []
+        resumed = []
+        self.wait(resumed, 0)
+        self.widget.event_generate('<Button-1>', 'e')
+        self.widget.bind('<Button-1>', received.append)
+        self.wait(resumed, 1)
+        self.widget.event_generate('<Button-1>', 'f')
+        self.assertEqual(resumed, [(0, 'e'), (1, 'f')])
+        self.assertEqual(received, ['f'])
+
+
+if __name__ == '__main__':
+    unittest.main()
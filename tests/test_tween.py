@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+
+import common_setup
+from callbackgoaway import start, TaskState
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+else:
+    from callbackgoaway.tween import TweenEngine, Tween
+
+
+@unittest.skipIf(numpy is None, 'numpy is not installed')
+class TweenEngineTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0.
+        self.ticking = []
+
+        def start_ticking(tick):
+            self.ticking.append(tick)
+            return tick
+
+        self.engine = TweenEngine(
+            start_ticking=start_ticking,
+            stop_ticking=self.ticking.remove,
+            now=lambda: self.now,
+            capacity=2,
+        )
+
+    def advance(self, dt):
+        self.now += dt
+        for tick in self.ticking[:]:
+            tick()
+
+    def test_linear(self):
+        values = numpy.zeros(3)
+
+        def func():
+            yield Tween(self.engine, values, 1, 10., 1.)
+            return 'done'
+
+        task = start(func())
+        self.assertEqual(len(self.ticking), 1)
+        self.advance(.25)
+        self.assertEqual(values.tolist(), [0., 2.5, 0.])
+        self.advance(.25)
+        self.assertEqual(values.tolist(), [0., 5., 0.])
+        self.assertEqual(task.state, TaskState.STARTED)
+        self.advance(1.)
+        # 行き過ぎずに終了値で止まる
+        self.assertEqual(values.tolist(), [0., 10., 0.])
+        self.assertEqual(task.result, 'done')
+        self.assertEqual(len(self.engine), 0)
+        self.assertEqual(self.ticking, [])
+
+    def test_easing(self):
+        values = numpy.zeros(2)
+        self.engine.add(values, 0, 1., 1., easing='in_quad')
+        self.engine.add(values, 1, 1., 1., easing='out_quad')
+        self.advance(.5)
+        self.assertAlmostEqual(values[0], .25)
+        self.assertAlmostEqual(values[1], .75)
+
+    def test_many_at_once(self):
+        # 容量を超えて加えても良い
+        positions = numpy.zeros((4, 2))
+
+        def func():
+            yield Tween(self.engine, positions, [0, 2, 4, 6], 8., 1.,
+                        start=[0., 2., 4., 6.])
+
+        task = start(func())
+        self.assertEqual(len(self.engine), 4)
+        self.advance(.5)
+        self.assertEqual(positions[:, 0].tolist(), [4., 5., 6., 7.])
+        self.advance(.5)
+        self.assertEqual(positions[:, 0].tolist(), [8.] * 4)
+        self.assertEqual(task.state, TaskState.FINISHED)
+
+    def test_tuple_index_and_several_targets(self):
+        a = numpy.zeros((2, 2))
+        b = numpy.full(2, 10.)
+        self.engine.add(a, (1, 0), 4., 2.)
+        self.engine.add(b, -1, 0., 2.)
+        self.advance(1.)
+        self.assertEqual(a.tolist(), [[0., 0.], [2., 0.]])
+        self.assertEqual(b.tolist(), [10., 5.])
+
+    def test_cancel(self):
+        values = numpy.zeros(2)
+        resumed = []
+
+        def func():
+            yield Tween(self.engine, values, 0, 10., 1.)
+            resumed.append(True)
+
+        task = start(func())
+        self.engine.add(values, 1, 10., 1.)
+        self.advance(.5)
+        task.cancel()
+        self.advance(.5)
+        # 取り消された値はその場で止まり、他は進み続ける
+        self.assertEqual(values.tolist(), [5., 10.])
+        self.assertEqual(resumed, [])
+        self.assertEqual(len(self.engine), 0)
+
+    def test_chain_reuses_slots(self):
+        values = numpy.zeros(1)
+
+        def func():
+            for end in (1., 2., 3.):
+                yield Tween(self.engine, values, 0, end, 1.)
+
+        task = start(func())
+        for __ in range(3):
+            self.advance(1.)
+        self.assertEqual(values.tolist(), [3.])
+        self.assertEqual(task.state, TaskState.FINISHED)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+import unittest
+from inspect import getgeneratorstate, GEN_CLOSED, GEN_SUSPENDED
+
+import common_setup
+from callbackgoaway import (
+    callbackgoaway, Wait, start, Deadline, DeadlineExceeded,
+)
+from callbackgoaway.virtualclock import (
+    VirtualClock, Sleep, Event, EventEmitter,
+)
+
+
+class VirtualClockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock()
+
+    def test_order(self):
+        clock = self.clock
+        called = []
+        clock.schedule_once(lambda dt: called.append(('b', dt)), 2)
+        clock.schedule_once(lambda dt: called.append(('a', dt)), 1)
+        clock.schedule_once(lambda dt: called.append(('c', dt)), 2)
+        clock.advance(1.5)
+        self.assertEqual(called, [('a', 1), ])
+        self.assertEqual(clock.now, 1.5)
+        clock.advance(1)
+        self.assertEqual(called, [('a', 1), ('b', 2), ('c', 2), ])
+        self.assertEqual(clock.now, 2.5)
+        self.assertTrue(clock.idle)
+
+    def test_cancel(self):
+        clock = self.clock
+        called = []
+        timer = clock.schedule_once(called.append, 1)
+        self.assertEqual(len(clock), 1)
+        clock.cancel(timer)
+        clock.cancel(timer)
+        self.assertEqual(len(clock), 0)
+        clock.run_until_idle()
+        self.assertEqual(called, [])
+
+    def test_compact_cancelled_timers(self):
+        clock = self.clock
+        called = []
+        timers = [clock.schedule_once(called.append, 1) for __ in range(100)]
+        for timer in timers[:60]:
+            clock.cancel(timer)
+        # 取り消された物が生きている物より多くなった所で取り除かれる
+        self.assertLess(len(clock._timers), 100)
+        self.assertEqual(len(clock), 40)
+        clock.run_until_idle()
+        self.assertEqual(len(called), 40)
+
+    def test_compact_during_advance(self):
+        clock = self.clock
+        called = []
+        timers = []
+
+        def cancel_all(dt):
+            called.append('cancel_all')
+            for timer in timers:
+                clock.cancel(timer)
+
+        clock.schedule_once(cancel_all, 1)
+        timers.extend(clock.schedule_once(called.append, 2)
+                      for __ in range(100))
+        clock.schedule_once(lambda dt: called.append('last'), 3)
+        clock.advance(5)
+        self.assertEqual(called, ['cancel_all', 'last'])
+        self.assertEqual(clock._timers, [])
+        self.assertTrue(clock.idle)
+
+    def test_timer_scheduled_during_advance(self):
+        clock = self.clock
+        called = []
+
+        def callback(dt):
+            called.append(clock.now)
+            clock.schedule_once(lambda dt: called.append(clock.now), 1)
+
+        clock.schedule_once(callback, 1)
+        clock.advance(5)
+        self.assertEqual(called, [1, 2, ])
+        self.assertEqual(clock.now, 5)
+
+
+class VirtualClockSleepTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock()
+
+    def S(self, seconds):
+        return Sleep(seconds, clock=self.clock)
+
+    def test_single_sleep(self):
+        clock = self.clock
+        S = self.S
+
+        @callbackgoaway
+        def func():
+            yield S(.5)
+            self.assertEqual(clock.now, .5)
+            dt, = (yield S(1)).args
+            self.assertEqual(dt, 1)
+            self.assertEqual(clock.now, 1.5)
+
+        gen = func()
+        clock.advance(.4)
+        self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+        clock.run_until_idle()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+
+    def test_wait_sleep(self):
+        clock = self.clock
+        S = self.S
+
+        @callbackgoaway
+        def func():
+            yield Wait(events=(S(.5), S(1), ))
+            self.assertEqual(clock.now, 1)
+            yield Wait(events=(S(.5), S(1), S(1.5)), n=2)
+            self.assertEqual(clock.now, 2)
+
+        gen = func()
+        clock.run_until_idle()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(clock.now, 2)
+
+    def test_or_sleep(self):
+        clock = self.clock
+        S = self.S
+
+        @callbackgoaway
+        def func():
+            yield S(.5) | S(1)
+            self.assertEqual(clock.now, .5)
+            # 負けた方のtimerは取り消されている
+            self.assertTrue(clock.idle)
+            yield S(2) | S(1)
+            self.assertEqual(clock.now, 1.5)
+
+        gen = func()
+        clock.run_until_idle()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(clock.now, 1.5)
+
+    def test_and_sleep(self):
+        clock = self.clock
+        S = self.S
+
+        @callbackgoaway
+        def func():
+            yield S(.5) & S(1)
+            self.assertEqual(clock.now, 1)
+
+        gen = func()
+        clock.run_until_idle()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+
+    def test_many_sleeps(self):
+        clock = self.clock
+        S = self.S
+        finished = []
+
+        @callbackgoaway
+        def func(i):
+            for __ in range(10):
+                yield S(i % 7 + 1)
+            finished.append(i)
+
+        for i in range(1000):
+            func(i)
+        clock.advance(10)
+        self.assertEqual(len(finished), 1000 // 7 + 1)
+        clock.run_until_idle()
+        self.assertEqual(len(finished), 1000)
+        self.assertEqual(clock.now, 70)
+
+
+class VirtualClockEventTestCase(unittest.TestCase):
+
+    def test_event(self):
+        emitter = EventEmitter()
+
+        @callbackgoaway
+        def func():
+            args, kwargs = yield Event(emitter, 'on_foo')
+            self.assertEqual(args, (1, ))
+            self.assertEqual(kwargs, {'bar': 2, })
+
+        gen = func()
+        emitter.emit('on_other')
+        self.assertEqual(getgeneratorstate(gen), GEN_SUSPENDED)
+        emitter.emit('on_foo', 1, bar=2)
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        self.assertEqual(emitter._callbacks['on_foo'], {})
+
+    def test_or_event(self):
+        clock = VirtualClock()
+        emitter = EventEmitter()
+
+        @callbackgoaway
+        def func():
+            yield Event(emitter, 'on_foo') | Sleep(1, clock=clock)
+            self.assertEqual(clock.now, 1)
+
+        gen = func()
+        clock.run_until_idle()
+        self.assertEqual(getgeneratorstate(gen), GEN_CLOSED)
+        # 負けた方のbindは外されている
+        self.assertEqual(emitter._callbacks['on_foo'], {})
+
+    def test_cancelled_during_same_emit(self):
+        emitter = EventEmitter()
+        steps = []
+
+        def inner():
+            # 期限より後にbindする
+            yield Event(emitter, 'on_start')
+            try:
+                yield Event(emitter, 'on_foo')
+                steps.append('on_foo')
+            except DeadlineExceeded:
+                steps.append('expired')
+                yield Event(emitter, 'on_bar')
+                steps.append('on_bar')
+
+        def outer():
+            yield Deadline(Event(emitter, 'on_foo'), inner())
+
+        task = start(outer())
+        emitter.emit('on_start')
+        # 先にbindされた期限が起き、innerが待っていたEventを取り消す。取り消
+        # されたEventのcallbackは同じemitの中でも呼ばれない
+        emitter.emit('on_foo')
+        self.assertEqual(steps, ['expired'])
+        self.assertFalse(task.done)
+        emitter.emit('on_bar')
+        self.assertEqual(steps, ['expired', 'on_bar'])
+        self.assertTrue(task.done)
+
+
+if __name__ == '__main__':
+    unittest.main()